@@ -58,6 +58,9 @@ def pre_fork(server, worker):
 
 def post_fork(server, worker):
     server.log.info("Worker spawned (pid: %s)", worker.pid)
+    # preload_app shares the master's memory; give each worker its own HRMS connection pool
+    from marketing_app.hrms_rbac import reset_transport
+    reset_transport()
 
 def post_worker_init(worker):
     worker.log.info("Worker initialized (pid: %s)", worker.pid)
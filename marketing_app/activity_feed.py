@@ -0,0 +1,301 @@
+"""
+Append-only activity feed
+
+Creating a Customer, Lead, Quotation, PurchaseOrder, Visit or Manufacturing
+row, or changing its status, appends an ActivityEvent with its title and
+description already rendered. Feed pages read the newest events with one
+keyset-paginated query on (created_at, id) instead of querying every source
+model and sorting in Python.
+"""
+import base64
+import logging
+from datetime import datetime
+from django.db.models import Q
+from django.db.models.signals import post_init, post_save
+from .models import ActivityEvent, Customer, Lead, Quotation, PurchaseOrder, Visit, Manufacturing
+
+logger = logging.getLogger(__name__)
+
+FEED_PAGE_SIZE = 20
+
+# Feed page filters -> object types
+ACTIVITY_FILTERS = {
+    'sales': ('customer', 'lead', 'quotation', 'purchase_order'),
+    'production': ('manufacturing',),
+    'visits': ('visit',),
+}
+
+
+class ActivityType:
+    """How one model's writes are rendered into feed events"""
+    __slots__ = ('model', 'render', 'status_field', 'related')
+
+    def __init__(self, model, render, status_field='status', related=()):
+        self.model = model
+        self.render = render
+        self.status_field = status_field
+        self.related = related
+
+
+_activity_types = {}
+
+OBJECT_TYPES = {PurchaseOrder: 'purchase_order'}
+
+
+def register_activity(model, render, status_field='status', related=()):
+    """
+    Append feed events when rows of ``model`` are created or change status
+
+    Args:
+        model: Model class to follow
+        render (callable): render(instance, created) -> dict of ActivityEvent
+            fields (event_type, title, description, status, icon, color,
+            user_id, user_name), or None to skip the write
+        status_field (str): Field whose changes produce an event
+        related (tuple): select_related paths ``render`` follows, used by backfills
+    """
+    _activity_types[model] = ActivityType(model, render, status_field, related)
+    uid = f'activity_feed:{model._meta.label}'
+    post_init.connect(_remember_status, sender=model, dispatch_uid=uid)
+    post_save.connect(_record_saved, sender=model, dispatch_uid=uid)
+
+
+def _remember_status(sender, instance, **kwargs):
+    # Read from __dict__ so deferred fields are not loaded
+    instance._activity_status = instance.__dict__.get(_activity_types[sender].status_field)
+
+
+def _record_saved(sender, instance, created=False, raw=False, **kwargs):
+    if raw:
+        return
+    activity = _activity_types[sender]
+    status = getattr(instance, activity.status_field)
+    previous = getattr(instance, '_activity_status', None)
+    instance._activity_status = status
+    if not created and status == previous:
+        return
+    event = build_event(instance, created)
+    if event is not None:
+        event.save()
+
+
+def build_event(instance, created, created_at=None):
+    """
+    Render the feed event for a write to ``instance``
+
+    Returns:
+        ActivityEvent: Unsaved event, or None if the write is not shown in feeds
+    """
+    fields = _activity_types[type(instance)].render(instance, created)
+    if fields is None:
+        return None
+    event = ActivityEvent(
+        object_type=OBJECT_TYPES.get(type(instance), instance._meta.model_name),
+        object_id=instance.pk,
+        **fields,
+    )
+    if created_at is not None:
+        event.created_at = created_at
+    event.title = event.title[:255]
+    event.description = event.description[:500]
+    return event
+
+
+def encode_cursor(event):
+    raw = f'{event.created_at.isoformat()}|{event.id}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Returns:
+        tuple: (created_at, id), or None for a missing or malformed cursor
+    """
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        created_at, event_id = raw.rsplit('|', 1)
+        return datetime.fromisoformat(created_at), int(event_id)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def read_feed(limit=FEED_PAGE_SIZE, cursor=None, user_id=None, since=None, until=None, types=None):
+    """
+    One page of the activity feed, newest first, in a single query
+
+    Args:
+        limit (int): Page size
+        cursor (str): next_cursor from the previous page
+        user_id (int): Only events belonging to this HRMS user
+        since (datetime): Only events at or after this time
+        until (datetime): Only events before this time
+        types (iterable): Only these object types, e.g. ['visit', 'lead']
+
+    Returns:
+        tuple: (list of ActivityEvent, next_cursor or None on the last page)
+
+    Usage:
+        events, next_cursor = read_feed(limit=10, since=day_start(today))
+    """
+    events = ActivityEvent.objects.all()
+    if user_id is not None:
+        events = events.filter(user_id=user_id)
+    if since is not None:
+        events = events.filter(created_at__gte=since)
+    if until is not None:
+        events = events.filter(created_at__lt=until)
+    if types:
+        events = events.filter(object_type__in=list(types))
+    position = decode_cursor(cursor)
+    if position is not None:
+        created_at, event_id = position
+        events = events.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=event_id))
+
+    # Fetch one extra row to learn whether there is a next page
+    page = list(events.order_by('-created_at', '-id')[:limit + 1])
+    next_cursor = encode_cursor(page[limit - 1]) if len(page) > limit else None
+    return page[:limit], next_cursor
+
+
+def backfill_events(since=None):
+    """
+    Append creation events for rows that predate the feed
+
+    Args:
+        since (date): Only rows created on or after this day
+
+    Returns:
+        int: Number of events written
+    """
+    from .kpi_builder import date_range
+
+    written = 0
+    for model, activity in _activity_types.items():
+        object_type = OBJECT_TYPES.get(model, model._meta.model_name)
+        existing = ActivityEvent.objects.filter(object_type=object_type).values('object_id')
+        rows = model._default_manager.select_related(*activity.related).exclude(pk__in=existing)
+        if since is not None:
+            rows = rows.filter(date_range(model, 'created_at', since))
+        batch = []
+        for instance in rows.iterator(chunk_size=500):
+            event = build_event(instance, True, created_at=instance.created_at)
+            if event is not None:
+                batch.append(event)
+        ActivityEvent.objects.bulk_create(batch, batch_size=500)
+        written += len(batch)
+    logger.info(f"Backfilled {written} activity event(s)")
+    return written
+
+
+def _user_name(instance, prefix):
+    legacy = getattr(instance, f'{prefix}_id', None) and getattr(instance, prefix)
+    return (getattr(instance, f'{prefix}_full_name', '') or getattr(instance, f'{prefix}_username', '')
+            or (legacy.get_full_name() or legacy.username if legacy else ''))
+
+
+def _render_customer(customer, created):
+    if created:
+        title = f'New Customer: {customer.name}'
+        added_by = _user_name(customer, 'created_by') or 'System'
+        description = f'Added by {added_by}'
+    else:
+        title = f'Customer Updated: {customer.name}'
+        description = f'Now {customer.get_customer_type_display()}'
+    return {
+        'event_type': f"customer.{'created' if created else customer.customer_type}",
+        'title': title,
+        'description': description,
+        'status': customer.get_customer_type_display(),
+        'icon': 'users',
+        'color': 'blue',
+        'user_id': customer.created_by_user_id,
+        'user_name': _user_name(customer, 'created_by'),
+    }
+
+
+def _render_lead(lead, created):
+    return {
+        'event_type': f"lead.{'created' if created else lead.status}",
+        'title': f'New Lead: {lead.full_name}' if created else f'Lead {lead.get_status_display()}: {lead.full_name}',
+        'description': f'From {lead.company} - {lead.get_source_display()}',
+        'status': lead.get_status_display(),
+        'icon': 'user-plus',
+        'color': 'green',
+        'user_id': lead.assigned_to_user_id,
+        'user_name': _user_name(lead, 'assigned_to'),
+    }
+
+
+def _render_quotation(quotation, created):
+    prefix = 'New Quotation' if created else f'Quotation {quotation.get_status_display()}'
+    return {
+        'event_type': f"quotation.{'created' if created else quotation.status}",
+        'title': f'{prefix}: {quotation.quotation_number}',
+        'description': f'For {quotation.customer.name} - ₹{quotation.total_amount}',
+        'status': quotation.get_status_display(),
+        'icon': 'file-text',
+        'color': 'yellow',
+        'user_id': quotation.created_by_user_id,
+        'user_name': _user_name(quotation, 'created_by'),
+    }
+
+
+def _render_purchase_order(po, created):
+    return {
+        'event_type': f"purchase_order.{'created' if created else po.status}",
+        'title': (f'PO Received from {po.customer.name}' if created
+                  else f'PO {po.get_status_display()} - {po.customer.name}'),
+        'description': f'Purchase Order #{po.po_number} for ₹{po.total_amount}',
+        'status': 'Completed' if created else po.get_status_display(),
+        'icon': 'check-circle',
+        'color': 'green',
+    }
+
+
+def _render_visit(visit, created):
+    if created:
+        # Views may create visits straight from the POSTed date string
+        scheduled = Visit._meta.get_field('scheduled_date').to_python(visit.scheduled_date)
+        title = f'Visit Scheduled - {visit.customer.name}'
+        description = f'{visit.get_visit_type_display()} on {scheduled:%d %b %Y}'
+    else:
+        title = f'Visit {visit.get_status_display()} - {visit.customer.name}'
+        description = f'{visit.get_visit_type_display()} {visit.get_status_display().lower()}'
+    return {
+        'event_type': f"visit.{'created' if created else visit.status}",
+        'title': title,
+        'description': description,
+        'status': visit.get_status_display(),
+        'icon': 'map-pin',
+        'color': 'blue',
+        'user_id': visit.assigned_to_user_id,
+        'user_name': _user_name(visit, 'assigned_to'),
+    }
+
+
+def _render_manufacturing(batch, created):
+    work_order = batch.work_order
+    customer = work_order.purchase_order.customer
+    return {
+        'event_type': f"manufacturing.{'created' if created else batch.status}",
+        'title': (f'Production Started - Batch #{batch.batch_number}' if created
+                  else f'Production Update - Batch #{batch.batch_number}'),
+        'description': (f'Manufacturing started for {customer.name}' if created
+                        else f'Moved to {batch.get_status_display()} for {customer.name}'),
+        'status': batch.get_status_display(),
+        'icon': 'factory',
+        'color': 'orange',
+        'user_id': work_order.allocated_to_user_id,
+        'user_name': _user_name(work_order, 'allocated_to'),
+    }
+
+
+register_activity(Customer, _render_customer, status_field='customer_type', related=('created_by',))
+register_activity(Lead, _render_lead, related=('assigned_to',))
+register_activity(Quotation, _render_quotation, related=('customer', 'created_by'))
+register_activity(PurchaseOrder, _render_purchase_order, related=('customer',))
+register_activity(Visit, _render_visit, related=('customer', 'assigned_to'))
+register_activity(Manufacturing, _render_manufacturing,
+                  related=('work_order__purchase_order__customer', 'work_order__allocated_to'))
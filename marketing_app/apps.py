@@ -5,3 +5,8 @@ class MarketingAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'marketing_app'
     verbose_name = 'Marketing Module'
+
+    def ready(self):
+        # Hook the KPI counters, daily facts, activity feed, search index and
+        # report/typeahead cache invalidation to their models' save/delete signals
+        from . import activity_feed, daily_facts, kpi_counters, rollups, search_index, typeahead  # noqa: F401
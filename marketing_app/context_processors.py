@@ -1,18 +1,23 @@
 """
 Context processors to make permissions available in all templates
 """
-from marketing_app.permissions import check_permission, get_user_permissions
+from marketing_app.permissions import get_request_permissions
 
 
 class PermissionChecker:
     """
     Wrapper class to make permission checking callable in templates
+    
+    Checks share the request-scoped permission object, so nothing is
+    fetched from HRMS unless a template actually asks.
     """
     def __init__(self, request):
         self.request = request
     
     def __call__(self, permission_code):
-        return check_permission(self.request, permission_code)
+        if self.request is None:
+            return False
+        return get_request_permissions(self.request).has(permission_code)
 
 
 def permissions(request):
@@ -30,10 +35,7 @@ def permissions(request):
             'has_permission': PermissionChecker(None),
         }
     
-    user_perms = get_user_permissions(request)
-    
     return {
-        'user_permissions': user_perms,
+        'user_permissions': get_request_permissions(request),
         'has_permission': PermissionChecker(request),
     }
-
@@ -0,0 +1,309 @@
+"""
+Daily fact tables for long-range analytics
+
+Quotation, Manufacturing, Visit and Lead rows are rolled up into DailyFact
+rows keyed by (source, date, region, HRMS user, status) holding a row count
+and an amount. Signals keep the facts current on every save and delete, so
+analytics pages aggregate a few rows per day instead of scanning the source
+tables; a one-year range costs about the same as a month.
+
+Rows that only carry the legacy Django User FK are attributed to the HRMS
+user with the same username, as the per-user rollups merge them; a legacy
+user no HRMS-stamped row has named yet is counted under NO_USER.
+
+Bulk updates, raw SQL, fixture loads and changes to a customer's region
+bypass the signals; run the ``backfill_daily_facts`` command nightly to
+rebuild recent days. Run it once with ``--all`` after deploying.
+"""
+import logging
+from django.db import IntegrityError, models, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.utils import timezone
+from .kpi_builder import _resolve_field, date_range
+from .models import DailyFact, Quotation, Manufacturing, Visit, Lead
+
+logger = logging.getLogger(__name__)
+
+
+class FactSource:
+    """How one model's rows map onto DailyFact dimensions"""
+    __slots__ = ('name', 'model', 'date_field', 'region_path', 'user_field', 'amount_field', 'is_datetime',
+                 'username_field', 'legacy_username')
+
+    def __init__(self, name, model, date_field, region_path=None, user_field=None, amount_field=None):
+        self.name = name
+        self.model = model
+        self.date_field = date_field
+        self.region_path = region_path
+        self.user_field = user_field
+        self.amount_field = amount_field
+        self.is_datetime = isinstance(_resolve_field(model, date_field), models.DateTimeField)
+        # '<prefix>_user_id' is stamped with '<prefix>_username'; older rows only have the '<prefix>' User FK
+        prefix = user_field[:-len('_user_id')] if user_field else None
+        self.username_field = f'{prefix}_username' if prefix else None
+        self.legacy_username = f'{prefix}__username' if prefix else None
+
+    @property
+    def columns(self):
+        return [name for name in (self.date_field, self.region_path, self.user_field, self.legacy_username,
+                                  'status', self.amount_field) if name]
+
+    def state(self, row):
+        """
+        Args:
+            row (dict): Source row from .values(*self.columns)
+
+        Returns:
+            tuple: (date, region id, user id, status, amount) the row counts
+            towards, or None if it has no date
+        """
+        value = row[self.date_field]
+        if value is None:
+            return None
+        if self.is_datetime:
+            value = timezone.localdate(value) if timezone.is_aware(value) else value.date()
+        region_id = row[self.region_path] if self.region_path else None
+        user_id = self.user_id(row, {})
+        if self.user_field and user_id is None and row[self.legacy_username]:
+            user_id = hrms_user_ids([row[self.legacy_username]]).get(row[self.legacy_username])
+        amount = row[self.amount_field] if self.amount_field else None
+        return (
+            value,
+            region_id or DailyFact.NO_REGION,
+            user_id or DailyFact.NO_USER,
+            row['status'] or '',
+            amount or 0,
+        )
+
+    def user_id(self, row, by_username):
+        """HRMS user id of a source row, falling back to its legacy user's username"""
+        if not self.user_field:
+            return None
+        return row[self.user_field] or by_username.get(row[self.legacy_username])
+
+    def read_state(self, pk):
+        row = self.model._default_manager.filter(pk=pk).values(*self.columns).first()
+        return self.state(row) if row is not None else None
+
+    def grouped(self, start_date=None, end_date=None):
+        """
+        Fact rows computed from scratch with one GROUP BY query
+
+        Returns:
+            list: Dicts with date, region_id, user_id, status, row_count and amount
+        """
+        queryset = self.model._default_manager.all()
+        if start_date is not None or end_date is not None:
+            queryset = queryset.filter(date_range(self.model, self.date_field, start_date, end_date))
+        day = TruncDate(self.date_field) if self.is_datetime else F(self.date_field)
+        dimensions = [name for name in (self.region_path, self.user_field, self.legacy_username) if name]
+        aggregates = {'n': Count('pk')}
+        if self.amount_field:
+            aggregates['total'] = Sum(self.amount_field)
+        rows = list(queryset
+                    .filter(**{f'{self.date_field}__isnull': False})
+                    .annotate(_day=day)
+                    .values('_day', 'status', *dimensions)
+                    .annotate(**aggregates)
+                    .order_by())
+
+        by_username = {}
+        if self.user_field:
+            by_username = hrms_user_ids({row[self.legacy_username] for row in rows if not row[self.user_field]})
+        facts = {}
+        for row in rows:
+            key = (
+                row['_day'],
+                (row[self.region_path] if self.region_path else None) or DailyFact.NO_REGION,
+                self.user_id(row, by_username) or DailyFact.NO_USER,
+                row['status'] or '',
+            )
+            # Legacy and HRMS-stamped rows of one user land on the same fact
+            fact = facts.setdefault(key, {'row_count': 0, 'amount': 0})
+            fact['row_count'] += row['n']
+            fact['amount'] += row.get('total') or 0
+        return [dict(zip(('date', 'region_id', 'user_id', 'status'), key), **fact) for key, fact in facts.items()]
+
+
+_sources = {}
+_sources_by_model = {}
+
+
+def register_fact_source(name, model, date_field, region_path=None, user_field=None, amount_field=None):
+    """
+    Register a model as a DailyFact source and hook it to its save/delete signals
+
+    Args:
+        name (str): DailyFact.source value
+        model: Model class whose rows are rolled up
+        date_field (str): Date or datetime column that places a row on a day
+        region_path (str): Optional lookup path to the row's Region id
+        user_field (str): Optional HRMS user id column
+        amount_field (str): Optional column summed into DailyFact.amount
+
+    Returns:
+        FactSource: The registered source
+    """
+    source = FactSource(name, model, date_field, region_path, user_field, amount_field)
+    _sources[name] = source
+    _sources_by_model[model] = source
+    uid = f'daily_facts:{model._meta.label}'
+    pre_save.connect(_remember_previous_state, sender=model, dispatch_uid=uid)
+    post_save.connect(_apply_saved, sender=model, dispatch_uid=uid)
+    pre_delete.connect(_remember_previous_state, sender=model, dispatch_uid=uid)
+    post_delete.connect(_apply_deleted, sender=model, dispatch_uid=uid)
+    return source
+
+
+def hrms_user_ids(usernames):
+    """
+    HRMS user ids for legacy usernames, read from the HRMS-stamped source rows
+
+    Returns:
+        dict: {username: HRMS user id} for the usernames any source row names
+    """
+    wanted = {name for name in usernames if name}
+    found = {}
+    for source in _sources.values():
+        if not wanted or not source.user_field:
+            continue
+        pairs = (source.model._default_manager
+                 .filter(**{f'{source.username_field}__in': wanted, f'{source.user_field}__isnull': False})
+                 .values_list(source.username_field, source.user_field)
+                 .distinct())
+        for username, user_id in pairs:
+            found.setdefault(username, user_id)
+        wanted -= set(found)
+    return found
+
+
+def get_fact_sources(names=None):
+    if names is None:
+        return list(_sources.values())
+    return [_sources[name] for name in names]
+
+
+def _apply(source, state, delta):
+    if state is None:
+        return
+    day, region_id, user_id, status, amount = state
+    key = {'source': source.name, 'date': day, 'region_id': region_id, 'user_id': user_id, 'status': status}
+    amount_delta = amount * delta
+    updated = DailyFact.objects.filter(**key).update(
+        row_count=F('row_count') + delta, amount=F('amount') + amount_delta
+    )
+    if updated or delta < 0:
+        return
+    try:
+        with transaction.atomic():
+            DailyFact.objects.create(**key, row_count=delta, amount=amount_delta)
+    except IntegrityError:
+        # Created concurrently by another request
+        DailyFact.objects.filter(**key).update(
+            row_count=F('row_count') + delta, amount=F('amount') + amount_delta
+        )
+
+
+def _remember_previous_state(sender, instance, raw=False, **kwargs):
+    instance._fact_previous = None
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    source = _sources_by_model.get(sender)
+    if source is not None:
+        instance._fact_previous = source.read_state(instance.pk)
+
+
+def _apply_saved(sender, instance, created=False, raw=False, **kwargs):
+    if raw:
+        return
+    source = _sources_by_model.get(sender)
+    previous = getattr(instance, '_fact_previous', None)
+    instance._fact_previous = None
+    if source is None:
+        return
+    # Re-read the row so region paths through related models are resolved
+    current = source.read_state(instance.pk)
+    if not created and previous == current:
+        return
+    _apply(source, previous, -1)
+    _apply(source, current, 1)
+
+
+def _apply_deleted(sender, instance, **kwargs):
+    source = _sources_by_model.get(sender)
+    previous = getattr(instance, '_fact_previous', None)
+    instance._fact_previous = None
+    if source is not None:
+        _apply(source, previous, -1)
+
+
+def rebuild_facts(names=None, start_date=None, end_date=None):
+    """
+    Recompute daily facts from the source tables
+
+    Args:
+        names (list): Source names to rebuild (default: all registered)
+        start_date (date): First day rebuilt (default: earliest row)
+        end_date (date): Last day rebuilt (default: latest row)
+
+    Returns:
+        dict: {source name: number of fact rows written}
+    """
+    written = {}
+    for source in get_fact_sources(names):
+        facts = [DailyFact(source=source.name, **row) for row in source.grouped(start_date, end_date)]
+
+        existing = DailyFact.objects.filter(source=source.name)
+        if start_date is not None:
+            existing = existing.filter(date__gte=start_date)
+        if end_date is not None:
+            existing = existing.filter(date__lte=end_date)
+        with transaction.atomic():
+            existing.delete()
+            DailyFact.objects.bulk_create(facts, batch_size=500)
+        written[source.name] = len(facts)
+    logger.info(f"Rebuilt daily facts {start_date or 'start'}..{end_date or 'end'}: {written}")
+    return written
+
+
+def fact_count(status=None):
+    """Aggregate summing fact row counts, optionally for one status"""
+    return Sum('row_count', filter=Q(status=status) if status is not None else None, default=0)
+
+
+def fact_amount(status=None):
+    """Aggregate summing fact amounts, optionally for one status"""
+    return Sum('amount', filter=Q(status=status) if status is not None else None, default=0)
+
+
+def read_facts(source, start_date, end_date, group_by=('date',), **aggregates):
+    """
+    Aggregate one source's daily facts over a date range
+
+    Args:
+        source (str): Source name, e.g. 'quotation'
+        start_date (date): First day included
+        end_date (date): Last day included
+        group_by (tuple): DailyFact columns to group on
+        **aggregates: Aggregates over the facts, e.g. total=fact_count()
+
+    Returns:
+        QuerySet: One dict per group, ordered by the group columns
+
+    Usage:
+        read_facts('visit', start, end, total=fact_count(), completed=fact_count('completed'))
+    """
+    return (DailyFact.objects
+            .filter(source=source, date__gte=start_date, date__lte=end_date)
+            .values(*group_by)
+            .annotate(**aggregates)
+            .order_by(*group_by))
+
+
+register_fact_source('quotation', Quotation, 'created_at', 'customer__region_id', 'created_by_user_id', 'total_amount')
+register_fact_source('manufacturing', Manufacturing, 'created_at',
+                     'work_order__purchase_order__customer__region_id', 'work_order__allocated_to_user_id')
+register_fact_source('visit', Visit, 'scheduled_date', 'customer__region_id', 'assigned_to_user_id')
+register_fact_source('lead', Lead, 'created_at', user_field='assigned_to_user_id')
@@ -3,8 +3,17 @@ Authentication views for HRMS RBAC integration
 """
 from django.shortcuts import render, redirect
 from django.contrib import messages
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
-from .hrms_rbac import HRMSRBACClient
+from .hrms_rbac import HRMSRBACClient, PermissionSnapshot, get_hrms_health
+from .hrms_cache import permission_cache
+from .hrms_principal import HRMSPrincipal, PRINCIPAL_SESSION_KEY
+from .permissions import store_permission_snapshot, get_cached_user_info
+from .hrms_middleware import mark_session_refreshed
+import json
 import logging
 
 logger = logging.getLogger(__name__)
@@ -31,10 +40,19 @@ def hrms_login(request):
             # Store token and user info in session
             token = result.get('token')
             if token:
-                # Store session data
+                # Store session data: the token plus a compact principal record.
+                # The full response (roles, permissions, employee) goes to the
+                # shared cache instead of being re-serialized into the session.
+                principal = HRMSPrincipal.from_login(result, username)
                 request.session['hrms_rbac_token'] = token
-                request.session['hrms_user_info'] = result
-                request.session['username'] = username
+                request.session[PRINCIPAL_SESSION_KEY] = principal.to_record() if principal else None
+                mark_session_refreshed(request.session)
+                permission_cache.set_user_info(token, result)
+                # Snapshot permissions now so later checks are answered locally
+                store_permission_snapshot(
+                    request, PermissionSnapshot.from_user_info(result),
+                    user_id=(result.get('user') or {}).get('id')
+                )
                 
                 # Mark session as modified and save
                 request.session.modified = True
@@ -90,6 +108,7 @@ def hrms_logout(request):
         client = HRMSRBACClient()
         client.token = token
         client.logout()
+        permission_cache.invalidate_token(token)
     
     # Clear session
     request.session.flush()
@@ -109,9 +128,7 @@ def user_profile(request):
         messages.error(request, 'Please login first')
         return redirect('hrms_login')
     
-    client = HRMSRBACClient()
-    client.token = token
-    user_info = client.get_user_info()
+    user_info = get_cached_user_info(request)
     
     if not user_info or not user_info.get('success'):
         messages.error(request, 'Failed to fetch user information')
@@ -126,3 +143,47 @@ def user_profile(request):
     }
     
     return render(request, 'marketing_app/user_profile.html', context)
+
+
+def _has_webhook_secret(request):
+    secret = getattr(settings, 'HRMS_RBAC_WEBHOOK_SECRET', '')
+    return bool(secret) and constant_time_compare(request.headers.get('X-HRMS-Webhook-Secret', ''), secret)
+
+
+@require_http_methods(["GET"])
+def hrms_health(request):
+    """
+    Monitoring endpoint - HRMS circuit breaker and connection pool state
+    
+    Anonymous callers only get the status code (503 while the breaker is
+    open); the state itself needs the X-HRMS-Webhook-Secret header.
+    """
+    health = get_hrms_health()
+    status = 503 if health['circuit_breaker']['state'] == 'open' else 200
+    if not _has_webhook_secret(request):
+        return HttpResponse(status=status)
+    return JsonResponse(health, status=status)
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def hrms_role_changed_webhook(request):
+    """
+    Webhook called by HRMS when a user's roles or permissions change
+    
+    Expects JSON {"user_id": <HRMS user id>} and the shared secret in the
+    X-HRMS-Webhook-Secret header; drops every cached session of that user.
+    """
+    if not _has_webhook_secret(request):
+        logger.warning("Rejected HRMS role-change webhook with missing or invalid secret")
+        return JsonResponse({'success': False, 'error': 'Forbidden'}, status=403)
+    
+    try:
+        user_id = json.loads(request.body or b'{}').get('user_id')
+    except (ValueError, AttributeError):
+        user_id = None
+    if user_id is None:
+        return JsonResponse({'success': False, 'error': 'user_id is required'}, status=400)
+    
+    invalidated = permission_cache.invalidate_user(user_id)
+    return JsonResponse({'success': True, 'invalidated': invalidated})
@@ -0,0 +1,159 @@
+"""
+Shared HRMS permission and user-info cache
+
+Entries live in Django's cache framework (the HRMS_RBAC_CACHE_ALIAS cache)
+so every gunicorn worker, including freshly recycled ones, shares one warm
+copy. Keys are derived from a hash of the HRMS token, never the token itself.
+"""
+import hashlib
+import logging
+import threading
+from django.conf import settings
+from django.core.cache import caches
+from .hrms_rbac import PermissionSnapshot
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'hrms_rbac'
+
+
+def token_hash(token):
+    """Stable, non-reversible cache identifier for an HRMS token"""
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()[:32]
+
+
+class HRMSPermissionCache:
+    """
+    Permission snapshots and user info keyed by token hash
+
+    A per-user index of token hashes lets the role-change webhook drop
+    every cached session of a user without knowing their tokens.
+    """
+    def __init__(self, alias=None):
+        self._alias = alias
+        # Hit/miss counts are kept per process and flushed to the shared
+        # cache in batches, so a permission check costs no cache write
+        self._counts_lock = threading.Lock()
+        self._counts = {'hits': 0, 'misses': 0}
+
+    @property
+    def cache(self):
+        return caches[self._alias or getattr(settings, 'HRMS_RBAC_CACHE_ALIAS', 'default')]
+
+    @property
+    def timeout(self):
+        # Keep entries long enough for the stale-snapshot grace period
+        ttl = getattr(settings, 'HRMS_RBAC_PERMISSION_TTL', 300)
+        grace = getattr(settings, 'HRMS_RBAC_STALE_GRACE', 900)
+        return ttl + grace
+
+    def _key(self, kind, value):
+        return f'{KEY_PREFIX}:{kind}:{value}'
+
+    def _count(self, outcome):
+        with self._counts_lock:
+            self._counts[outcome] += 1
+            if sum(self._counts.values()) < getattr(settings, 'HRMS_RBAC_STATS_FLUSH_EVERY', 100):
+                return
+            counts, self._counts = self._counts, {'hits': 0, 'misses': 0}
+        self._flush_counts(counts)
+
+    def _flush_counts(self, counts):
+        for outcome, count in counts.items():
+            if not count:
+                continue
+            key = self._key('stats', outcome)
+            try:
+                self.cache.incr(key, count)
+            except ValueError:
+                if not self.cache.add(key, count, timeout=None):
+                    self.cache.incr(key, count)
+
+    def get_snapshot(self, token):
+        """
+        Returns:
+            PermissionSnapshot: Cached snapshot (possibly stale), or None
+        """
+        entry = self.cache.get(self._key('perms', token_hash(token)))
+        self._count('hits' if entry else 'misses')
+        if not entry:
+            return None
+        return PermissionSnapshot.from_dict(entry)
+
+    def set_snapshot(self, token, snapshot, user_id=None):
+        if snapshot is None:
+            return
+        digest = token_hash(token)
+        self.cache.set(self._key('perms', digest), snapshot.to_dict(), timeout=self.timeout)
+        if user_id is not None:
+            self._remember_token(user_id, digest)
+
+    def get_user_info(self, token):
+        entry = self.cache.get(self._key('info', token_hash(token)))
+        self._count('hits' if entry else 'misses')
+        return entry
+
+    def set_user_info(self, token, user_info):
+        if not user_info:
+            return
+        digest = token_hash(token)
+        self.cache.set(self._key('info', digest), user_info, timeout=self.timeout)
+        user_id = (user_info.get('user') or {}).get('id')
+        if user_id is not None:
+            self._remember_token(user_id, digest)
+
+    def _remember_token(self, user_id, digest):
+        index_key = self._key('user', user_id)
+        digests = [d for d in self.cache.get(index_key) or [] if d != digest]
+        # Re-set on every write so the index outlives the entries it points to;
+        # only the most recent sessions matter, older entries expire anyway
+        digests = (digests + [digest])[-20:]
+        self.cache.set(index_key, digests, timeout=self.timeout)
+
+    def _delete_digest(self, digest):
+        self.cache.delete_many([self._key('perms', digest), self._key('info', digest)])
+
+    def invalidate_token(self, token):
+        """Drop everything cached for one token (logout)"""
+        self._delete_digest(token_hash(token))
+
+    def invalidate_user(self, user_id):
+        """
+        Drop everything cached for a user (role change)
+
+        Returns:
+            int: Number of cached sessions invalidated
+        """
+        index_key = self._key('user', user_id)
+        digests = self.cache.get(index_key) or []
+        for digest in digests:
+            self._delete_digest(digest)
+        self.cache.delete(index_key)
+        logger.info(f"Invalidated {len(digests)} cached HRMS session(s) for user {user_id}")
+        return len(digests)
+
+    def stats(self):
+        """
+        Hit/miss counters shared by all workers
+
+        Counts other workers have not flushed yet are not included.
+
+        Returns:
+            dict: Hits, misses and hit ratio
+        """
+        with self._counts_lock:
+            counts, self._counts = self._counts, {'hits': 0, 'misses': 0}
+        self._flush_counts(counts)
+        shared = self.cache.get_many([self._key('stats', 'hits'), self._key('stats', 'misses')])
+        hits = shared.get(self._key('stats', 'hits'), 0)
+        misses = shared.get(self._key('stats', 'misses'), 0)
+        total = hits + misses
+        return {
+            'alias': self._alias or getattr(settings, 'HRMS_RBAC_CACHE_ALIAS', 'default'),
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': round(hits / total, 3) if total else None,
+        }
+
+
+permission_cache = HRMSPermissionCache()
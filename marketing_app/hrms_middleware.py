@@ -1,30 +1,98 @@
 """
 Middleware for HRMS RBAC authentication
 """
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
 from django.shortcuts import redirect
 from django.urls import reverse
 from django.conf import settings
+from .hrms_principal import get_principal, PRINCIPAL_SESSION_KEY
+from .permissions import get_request_permissions
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
+SESSION_REFRESHED_KEY = 'hrms_refreshed_at'
+
+
+def mark_session_refreshed(session):
+    """Record that the session expiry was just (re)set"""
+    session[SESSION_REFRESHED_KEY] = int(time.time())
+
+
+def refresh_session(session, principal):
+    """
+    Slide the session expiry without writing on every request
+    
+    The session is only marked modified when it still carries the legacy
+    full login response, or when HRMS_SESSION_REFRESH_INTERVAL seconds have
+    passed since the expiry was last pushed forward.
+    
+    Returns:
+        bool: True if the session will be saved
+    """
+    if 'hrms_user_info' in session:
+        # Upgrade sessions created before the compact principal record
+        session[PRINCIPAL_SESSION_KEY] = principal.to_record()
+        session.pop('hrms_user_info', None)
+        session.pop('username', None)
+        mark_session_refreshed(session)
+        return True
+    
+    interval = getattr(settings, 'HRMS_SESSION_REFRESH_INTERVAL', 900)
+    refreshed_at = session.get(SESSION_REFRESHED_KEY, 0)
+    if time.time() - refreshed_at < interval:
+        return False
+    mark_session_refreshed(session)
+    return True
+
 
 class HRMSRBACMiddleware:
     """
     Middleware to check HRMS RBAC authentication for protected views
+    
+    Sync and async capable: under ASGI the session lookup runs in a
+    thread and the rest of the stack stays on the event loop.
     """
+    sync_capable = True
+    async_capable = True
+    
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
         # URLs that don't require authentication
         self.exempt_urls = getattr(settings, 'HRMS_RBAC_EXEMPT_URLS', [
             '/hrms-login/',
             '/hrms-logout/',
+            '/hrms-health/',
+            '/hrms-webhook/',
             '/static/',
             '/media/',
             '/admin/',
         ])
     
     def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.authenticate(request)
+        if response is None:
+            response = self.get_response(request)
+        return response
+    
+    async def __acall__(self, request):
+        response = await sync_to_async(self.authenticate)(request)
+        if response is None:
+            response = await self.get_response(request)
+        return response
+    
+    def authenticate(self, request):
+        """
+        Attach the HRMS user to the request
+        
+        Returns:
+            HttpResponse: Login redirect if the request must be rejected, else None
+        """
         # Check if URL is exempt
         path = request.path
         is_exempt = any(path.startswith(url) for url in self.exempt_urls)
@@ -32,61 +100,31 @@ class HRMSRBACMiddleware:
         # Check if user has HRMS token
         token = request.session.get('hrms_rbac_token')
         
-        # Helper function to create HRMSUser
-        def create_hrms_user(user_data, employee_data=None):
-            class HRMSUser:
-                def __init__(self, user_data, employee_data=None):
-                    self.id = user_data.get('id')
-                    self.username = user_data.get('username', '')
-                    self.first_name = user_data.get('first_name', '')
-                    self.last_name = user_data.get('last_name', '')
-                    self.email = user_data.get('email', '')
-                    self.is_authenticated = True
-                    self.is_active = user_data.get('is_active', True)
-                    self.is_staff = user_data.get('is_staff', False)
-                    self.is_superuser = user_data.get('is_superuser', False)
-                    self.employee_data = employee_data
-                    
-                def get_full_name(self):
-                    name = f"{self.first_name} {self.last_name}".strip()
-                    return name if name else self.username
-                
-                def __str__(self):
-                    return self.username
-            return HRMSUser(user_data, employee_data)
-        
         if not is_exempt:
             # Protected URL - require authentication
             if not token:
                 logger.debug(f"No HRMS token found for {path}, redirecting to login. Session keys: {list(request.session.keys())}")
                 return redirect(f"{reverse('hrms_login')}?next={path}")
-            else:
-                # Token exists - set request.user
-                user_info = request.session.get('hrms_user_info', {})
-                if user_info:
-                    user_data = user_info.get('user', {})
-                    employee_data = user_info.get('employee')
-                    if user_data:
-                        request.user = create_hrms_user(user_data, employee_data)
-                        request.hrms_authenticated = True
-                        logger.debug(f"Set request.user for {path}: {request.user.username}, authenticated: {request.user.is_authenticated}")
-                    else:
-                        # If no user data, redirect to login
-                        logger.warning(f"Token exists but no user data for {path}")
-                        return redirect(f"{reverse('hrms_login')}?next={path}")
-                else:
-                    # Token exists but no user info - might be stale
-                    logger.warning(f"Token exists but no user info for {path}. Session keys: {list(request.session.keys())}")
-                    return redirect(f"{reverse('hrms_login')}?next={path}")
+            
+            # Token exists - set request.user
+            principal = get_principal(request)
+            if principal is None:
+                # Token exists but no user info - might be stale
+                logger.warning(f"Token exists but no user info for {path}. Session keys: {list(request.session.keys())}")
+                return redirect(f"{reverse('hrms_login')}?next={path}")
+            request.user = principal
+            request.hrms_authenticated = True
+            refresh_session(request.session, principal)
+            logger.debug(f"Set request.user for {path}: {principal.username}")
         elif token and path not in ['/hrms-login/', '/hrms-logout/']:
             # Exempt URL but user is authenticated - set request.user anyway
-            user_info = request.session.get('hrms_user_info', {})
-            if user_info:
-                user_data = user_info.get('user', {})
-                employee_data = user_info.get('employee')
-                if user_data:
-                    request.user = create_hrms_user(user_data, employee_data)
-                    request.hrms_authenticated = True
+            principal = get_principal(request)
+            if principal is not None:
+                request.user = principal
+                request.hrms_authenticated = True
         
-        response = self.get_response(request)
-        return response
+        if token:
+            # Lazily resolved; costs nothing unless the view checks a permission
+            request.perms = get_request_permissions(request)
+        
+        return None
@@ -0,0 +1,162 @@
+"""
+Per-request HRMS principal
+
+One HRMSPrincipal is built per request from the session and reused by the
+middleware (as request.user), user_utils, user_helpers and user_fields.
+The session only holds a small versioned record of it (PRINCIPAL_SESSION_KEY);
+roles, permissions and employee data live in the shared permission cache.
+"""
+from django.contrib.auth import get_user_model
+
+_UNSET = object()
+
+PRINCIPAL_SESSION_KEY = 'hrms_principal'
+# Bump when the record layout changes; older records are rebuilt from HRMS data
+PRINCIPAL_RECORD_VERSION = 1
+
+
+class HRMSPrincipal:
+    """
+    The authenticated HRMS user for one request
+
+    Mimics the parts of django.contrib.auth's User that templates and views
+    use. ``id`` is the HRMS user id stored in the ``*_user_id`` columns.
+    """
+    __slots__ = (
+        'id', 'username', 'first_name', 'last_name', 'email',
+        'is_active', 'is_staff', 'is_superuser', '_django_user',
+    )
+
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, user_data):
+        self.id = user_data.get('id')
+        self.username = user_data.get('username', '')
+        self.first_name = user_data.get('first_name', '')
+        self.last_name = user_data.get('last_name', '')
+        self.email = user_data.get('email', '')
+        self.is_active = user_data.get('is_active', True)
+        self.is_staff = user_data.get('is_staff', False)
+        self.is_superuser = user_data.get('is_superuser', False)
+        self._django_user = _UNSET
+
+    @classmethod
+    def from_login(cls, login_result, username=''):
+        """
+        Build a principal from an HRMS login (or user-info) response
+
+        Falls back to the employee record when HRMS returned no user block.
+
+        Returns:
+            HRMSPrincipal: Principal, or None if the response has no user
+        """
+        user_data = login_result.get('user') or {}
+        if user_data:
+            return cls(user_data)
+        employee_data = login_result.get('employee') or {}
+        if employee_data:
+            return cls({
+                'id': employee_data.get('id'),
+                'username': username,
+                'email': employee_data.get('email', ''),
+                'first_name': employee_data.get('first_name', ''),
+                'last_name': employee_data.get('last_name', ''),
+            })
+        return None
+
+    @classmethod
+    def from_session(cls, session):
+        """
+        Build a principal from the compact session record
+
+        Sessions created before the record existed still carry the full
+        login response under 'hrms_user_info' and are read from that.
+
+        Returns:
+            HRMSPrincipal: Principal, or None if the session holds no HRMS user
+        """
+        record = session.get(PRINCIPAL_SESSION_KEY)
+        if record and record.get('v') == PRINCIPAL_RECORD_VERSION:
+            return cls(record)
+        legacy = session.get('hrms_user_info')
+        if legacy:
+            return cls.from_login(legacy, session.get('username', ''))
+        return None
+
+    def to_record(self):
+        """Compact, versioned session record for this principal"""
+        record = {'v': PRINCIPAL_RECORD_VERSION, 'id': self.id, 'username': self.username}
+        for field in ('first_name', 'last_name', 'email'):
+            value = getattr(self, field)
+            if value:
+                record[field] = value
+        # Only store flags that differ from the defaults
+        if not self.is_active:
+            record['is_active'] = False
+        if self.is_staff:
+            record['is_staff'] = True
+        if self.is_superuser:
+            record['is_superuser'] = True
+        return record
+
+    @property
+    def pk(self):
+        return self.id
+
+    @property
+    def full_name(self):
+        return f"{self.first_name} {self.last_name}".strip()
+
+    def get_full_name(self):
+        return self.full_name or self.username
+
+    def get_short_name(self):
+        return self.first_name or self.username
+
+    @property
+    def django_user(self):
+        """Matching Django User row (legacy FKs), looked up once per request"""
+        if self._django_user is _UNSET:
+            self._django_user = None
+            if self.username:
+                User = get_user_model()
+                self._django_user = User.objects.filter(username=self.username).first()
+        return self._django_user
+
+    def as_dict(self):
+        """User info in the shape used by user_fields/user_helpers"""
+        return {
+            'id': self.id,
+            'username': self.username,
+            'email': self.email,
+            'first_name': self.first_name,
+            'last_name': self.last_name,
+        }
+
+    def __str__(self):
+        return self.username
+
+    def __repr__(self):
+        return f"<HRMSPrincipal {self.id}:{self.username}>"
+
+
+def get_principal(request):
+    """
+    Get the HRMS principal for the request, building it at most once
+
+    Returns:
+        HRMSPrincipal: Principal, or None if the request has no HRMS session
+    """
+    user = getattr(request, 'user', None)
+    if isinstance(user, HRMSPrincipal):
+        return user
+
+    principal = getattr(request, '_hrms_principal', _UNSET)
+    if principal is _UNSET:
+        session = getattr(request, 'session', None)
+        principal = None
+        if session is not None and session.get('hrms_rbac_token'):
+            principal = HRMSPrincipal.from_session(session)
+        request._hrms_principal = principal
+    return principal
@@ -4,13 +4,337 @@ Provides authentication and permission checking via HRMS RBAC API
 """
 import requests
 import logging
+import os
+import random
+import threading
+import time
 from functools import wraps
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from requests.adapters import HTTPAdapter
 from django.http import JsonResponse
 from django.conf import settings
 
 logger = logging.getLogger(__name__)
 
 
+class HRMSUnavailable(requests.exceptions.ConnectionError):
+    """
+    Raised without contacting HRMS while the circuit breaker is open
+
+    Subclasses ConnectionError so existing handlers treat it as an outage.
+    """
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker for HRMS calls
+
+    After HRMS_RBAC_BREAKER_THRESHOLD consecutive failures the breaker
+    opens and calls fail fast for HRMS_RBAC_BREAKER_COOLDOWN seconds.
+    It then lets a single probe through (half-open); success closes it,
+    failure opens it again.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=None, reset_timeout=None):
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._opened_at = None
+        self._probe_in_flight = False
+        self.consecutive_failures = 0
+        self.trips = 0
+        self.rejected = 0
+
+    @property
+    def failure_threshold(self):
+        return self._failure_threshold or getattr(settings, 'HRMS_RBAC_BREAKER_THRESHOLD', 5)
+
+    @property
+    def reset_timeout(self):
+        return self._reset_timeout or getattr(settings, 'HRMS_RBAC_BREAKER_COOLDOWN', 30)
+
+    @property
+    def state(self):
+        if self._state == self.OPEN and time.time() - self._opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self._state
+
+    @property
+    def is_degraded(self):
+        """True while HRMS is failing, even before the breaker trips"""
+        return self.state != self.CLOSED or self.consecutive_failures > 0
+
+    def allow_request(self):
+        with self._lock:
+            state = self.state
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._probe_in_flight:
+                self._state = self.HALF_OPEN
+                self._probe_in_flight = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self._state != self.CLOSED:
+                logger.info("HRMS circuit breaker closed; HRMS is reachable again")
+            self._state = self.CLOSED
+            self._opened_at = None
+            self._probe_in_flight = False
+            self.consecutive_failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            self._probe_in_flight = False
+            if self._state == self.HALF_OPEN or (
+                self._state == self.CLOSED and self.consecutive_failures >= self.failure_threshold
+            ):
+                self._state = self.OPEN
+                self._opened_at = time.time()
+                self.trips += 1
+                logger.warning(
+                    f"HRMS circuit breaker opened after {self.consecutive_failures} consecutive failures; "
+                    f"failing fast for {self.reset_timeout}s"
+                )
+
+    def stats(self):
+        """
+        Breaker state for monitoring
+
+        Returns:
+            dict: State, failure counts, trips and rejected calls
+        """
+        state = self.state
+        retry_in = None
+        if state == self.OPEN:
+            retry_in = max(0, round(self.reset_timeout - (time.time() - self._opened_at), 1))
+        return {
+            'state': state,
+            'consecutive_failures': self.consecutive_failures,
+            'failure_threshold': self.failure_threshold,
+            'trips': self.trips,
+            'rejected': self.rejected,
+            'retry_in': retry_in,
+        }
+
+
+hrms_circuit_breaker = CircuitBreaker()
+
+
+class HRMSTransport:
+    """
+    Pooled keep-alive HTTP transport shared by all HRMS RBAC calls in a worker
+
+    Wraps a requests.Session with a bounded connection pool so repeated
+    calls reuse TCP/TLS connections. Idempotent calls are retried with
+    jittered exponential backoff on connection errors, timeouts and
+    502/503/504 responses.
+    """
+    RETRY_STATUS_CODES = (502, 503, 504)
+
+    def __init__(self, pool_connections=None, pool_maxsize=None, connect_timeout=None,
+                 read_timeout=None, max_retries=None, retry_backoff=None, breaker=None):
+        self.pool_connections = pool_connections or getattr(settings, 'HRMS_RBAC_POOL_CONNECTIONS', 2)
+        self.pool_maxsize = pool_maxsize or getattr(settings, 'HRMS_RBAC_POOL_MAXSIZE', 10)
+        self.connect_timeout = connect_timeout or getattr(settings, 'HRMS_RBAC_CONNECT_TIMEOUT', 3.05)
+        self.read_timeout = read_timeout or getattr(settings, 'HRMS_RBAC_READ_TIMEOUT', 10)
+        self.max_retries = max_retries if max_retries is not None else getattr(settings, 'HRMS_RBAC_MAX_RETRIES', 2)
+        self.retry_backoff = retry_backoff if retry_backoff is not None else getattr(settings, 'HRMS_RBAC_RETRY_BACKOFF', 0.2)
+        self.breaker = breaker or hrms_circuit_breaker
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            pool_block=False,
+            max_retries=0,  # Retries are handled in request() so only idempotent calls retry
+        )
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.requests_sent = 0
+        self.retries = 0
+
+    @property
+    def timeout(self):
+        return (self.connect_timeout, self.read_timeout)
+
+    def request(self, method, url, idempotent=False, **kwargs):
+        """
+        Send a request over the pooled session
+
+        Args:
+            method (str): HTTP method
+            url (str): Absolute URL
+            idempotent (bool): Whether the call is safe to retry
+
+        Returns:
+            requests.Response: Response of the last attempt
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        kwargs.setdefault('verify', True)  # Verify SSL certificate
+        attempts = 1 + (self.max_retries if idempotent else 0)
+
+        for attempt in range(attempts):
+            last_attempt = attempt == attempts - 1
+            if not self.breaker.allow_request():
+                raise HRMSUnavailable(f"HRMS circuit breaker is open; not calling {url}")
+            self.requests_sent += 1
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                self.breaker.record_failure()
+                if last_attempt:
+                    raise
+            except requests.exceptions.RequestException:
+                # Not worth retrying, but must still release a half-open probe
+                self.breaker.record_failure()
+                raise
+            else:
+                if response.status_code in self.RETRY_STATUS_CODES:
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.record_success()
+                if last_attempt or response.status_code not in self.RETRY_STATUS_CODES:
+                    return response
+            self.retries += 1
+            # Full jitter keeps workers from retrying in lockstep
+            time.sleep(random.uniform(0, self.retry_backoff * (2 ** attempt)))
+
+    def stats(self):
+        """
+        Connection pool statistics for monitoring
+
+        Returns:
+            dict: Requests sent, connections opened, pool hits and retries
+        """
+        connections_opened = 0
+        for adapter in set(self.session.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in list(pools.keys()):
+                pool = pools.get(key)
+                if pool is not None:
+                    connections_opened += pool.num_connections
+        return {
+            'requests': self.requests_sent,
+            'connections_opened': connections_opened,
+            'pool_hits': max(self.requests_sent - connections_opened, 0),
+            'retries': self.retries,
+            'pool_maxsize': self.pool_maxsize,
+        }
+
+    def close(self):
+        self.session.close()
+
+
+_transport = None
+_transport_pid = None
+_transport_lock = threading.Lock()
+
+
+def get_transport():
+    """
+    Get the HRMS transport for the current worker process
+
+    The transport is created lazily and re-created if the process has
+    forked since, so pooled sockets are never shared between workers.
+    """
+    global _transport, _transport_pid
+    pid = os.getpid()
+    if _transport is None or _transport_pid != pid:
+        with _transport_lock:
+            if _transport is None or _transport_pid != pid:
+                _transport = HRMSTransport()
+                _transport_pid = pid
+    return _transport
+
+
+def reset_transport():
+    """
+    Drop the current transport so the next call builds a fresh pool
+
+    Called from gunicorn's post_fork hook (preload_app = True).
+    """
+    global _transport, _transport_pid
+    with _transport_lock:
+        if _transport is not None and _transport_pid == os.getpid():
+            _transport.close()
+        _transport = None
+        _transport_pid = None
+
+
+class PermissionSnapshot:
+    """
+    Compact, time-limited copy of a user's HRMS permission codes
+
+    Built once from the login / user-info response so permission checks
+    can be answered locally instead of calling /check-permission/.
+    """
+    __slots__ = ('codes', 'fetched_at')
+
+    def __init__(self, codes, fetched_at=None):
+        self.codes = frozenset(codes)
+        self.fetched_at = fetched_at if fetched_at is not None else time.time()
+
+    @classmethod
+    def from_user_info(cls, user_info):
+        """
+        Build a snapshot from an HRMS login or user-info response
+
+        Returns:
+            PermissionSnapshot: Snapshot, or None if the response has no permissions
+        """
+        if not user_info or 'permissions' not in user_info:
+            return None
+        codes = []
+        for perm in user_info.get('permissions') or []:
+            code = perm.get('code') if isinstance(perm, dict) else perm
+            if code:
+                codes.append(code)
+        return cls(codes)
+
+    @classmethod
+    def from_dict(cls, data):
+        """Restore a snapshot stored with to_dict()"""
+        if not data:
+            return None
+        try:
+            return cls(data['codes'], data['fetched_at'])
+        except (KeyError, TypeError):
+            return None
+
+    def to_dict(self):
+        """Serialize to a compact, JSON-safe dict"""
+        return {'codes': sorted(self.codes), 'fetched_at': int(self.fetched_at)}
+
+    @property
+    def age(self):
+        return time.time() - self.fetched_at
+
+    def is_fresh(self, ttl=None):
+        if ttl is None:
+            ttl = getattr(settings, 'HRMS_RBAC_PERMISSION_TTL', 300)
+        return self.age < ttl
+
+    def is_usable_stale(self):
+        """True while a stale snapshot may still stand in during an HRMS outage"""
+        ttl = getattr(settings, 'HRMS_RBAC_PERMISSION_TTL', 300)
+        grace = getattr(settings, 'HRMS_RBAC_STALE_GRACE', 900)
+        return self.age < ttl + grace
+
+    def has(self, permission_code):
+        return permission_code in self.codes
+
+    def check_many(self, permission_codes):
+        return {perm: perm in self.codes for perm in permission_codes}
+
+
 class HRMSRBACClient:
     """
     Client for interacting with HRMS RBAC API
@@ -20,6 +344,13 @@ class HRMSRBACClient:
         self.token = None
         self.user_info = None
     
+    def _auth_headers(self):
+        return {
+            'Authorization': f'Token {self.token}',
+            'Content-Type': 'application/json',
+            'Accept': 'application/json'
+        }
+    
     def login(self, username, password):
         """
         Authenticate user via HRMS RBAC API
@@ -28,12 +359,11 @@ class HRMSRBACClient:
             dict: User info, roles, and permissions
         """
         try:
-            response = requests.post(
+            response = get_transport().request(
+                'POST',
                 f'{self.base_url}/login/',
                 json={'username': username, 'password': password},
                 headers={'Content-Type': 'application/json', 'Accept': 'application/json'},
-                timeout=10,
-                verify=True  # Verify SSL certificate
             )
             
             # Try to parse JSON response regardless of status code
@@ -120,16 +450,12 @@ class HRMSRBACClient:
             return False
         
         try:
-            response = requests.post(
+            response = get_transport().request(
+                'POST',
                 f'{self.base_url}/check-permission/',
-                headers={
-                    'Authorization': f'Token {self.token}',
-                    'Content-Type': 'application/json',
-                    'Accept': 'application/json'
-                },
+                headers=self._auth_headers(),
                 json={'permission': permission_code},
-                timeout=10,
-                verify=True  # Verify SSL certificate
+                idempotent=True,
             )
             response.raise_for_status()
             data = response.json()
@@ -161,16 +487,12 @@ class HRMSRBACClient:
             return {perm: False for perm in permissions}
         
         try:
-            response = requests.post(
+            response = get_transport().request(
+                'POST',
                 f'{self.base_url}/check-permissions/',
-                headers={
-                    'Authorization': f'Token {self.token}',
-                    'Content-Type': 'application/json',
-                    'Accept': 'application/json'
-                },
+                headers=self._auth_headers(),
                 json={'permissions': permissions},
-                timeout=10,
-                verify=True  # Verify SSL certificate
+                idempotent=True,
             )
             response.raise_for_status()
             data = response.json()
@@ -193,15 +515,11 @@ class HRMSRBACClient:
             return None
         
         try:
-            response = requests.get(
+            response = get_transport().request(
+                'GET',
                 f'{self.base_url}/user/info/',
-                headers={
-                    'Authorization': f'Token {self.token}',
-                    'Content-Type': 'application/json',
-                    'Accept': 'application/json'
-                },
-                timeout=10,
-                verify=True  # Verify SSL certificate
+                headers=self._auth_headers(),
+                idempotent=True,
             )
             response.raise_for_status()
             data = response.json()
@@ -221,6 +539,15 @@ class HRMSRBACClient:
             logger.error(f"Get user info error: {str(e)}")
             return None
     
+    def get_permission_snapshot(self):
+        """
+        Fetch the user's full permission set in a single call
+        
+        Returns:
+            PermissionSnapshot: Snapshot of permission codes, or None on failure
+        """
+        return PermissionSnapshot.from_user_info(self.get_user_info())
+    
     def logout(self):
         """
         Logout and invalidate token
@@ -229,15 +556,10 @@ class HRMSRBACClient:
             return True
         
         try:
-            response = requests.post(
+            response = get_transport().request(
+                'POST',
                 f'{self.base_url}/logout/',
-                headers={
-                    'Authorization': f'Token {self.token}',
-                    'Content-Type': 'application/json',
-                    'Accept': 'application/json'
-                },
-                timeout=10,
-                verify=True  # Verify SSL certificate
+                headers=self._auth_headers(),
             )
             response.raise_for_status()
             self.token = None
@@ -256,6 +578,67 @@ class HRMSRBACClient:
             return True
 
 
+class AsyncHRMSRBACClient:
+    """
+    Async counterpart of HRMSRBACClient for the ASGI entry point
+
+    Calls run the pooled sync client in a worker thread outside Django's
+    thread-sensitive executor, so a slow HRMS response parks only the
+    awaiting coroutine, and the circuit breaker and connection pool are
+    shared with sync callers.
+    """
+    def __init__(self, base_url=None):
+        self._client = HRMSRBACClient(base_url)
+
+    @property
+    def token(self):
+        return self._client.token
+
+    @token.setter
+    def token(self, value):
+        self._client.token = value
+
+    @property
+    def user_info(self):
+        return self._client.user_info
+
+    async def _run(self, func, *args):
+        return await sync_to_async(func, thread_sensitive=False)(*args)
+
+    async def login(self, username, password):
+        return await self._run(self._client.login, username, password)
+
+    async def check_permission(self, permission_code):
+        return await self._run(self._client.check_permission, permission_code)
+
+    async def check_multiple_permissions(self, permissions):
+        return await self._run(self._client.check_multiple_permissions, permissions)
+
+    async def get_user_info(self):
+        return await self._run(self._client.get_user_info)
+
+    async def get_permission_snapshot(self):
+        return await self._run(self._client.get_permission_snapshot)
+
+    async def logout(self):
+        return await self._run(self._client.logout)
+
+
+def get_hrms_health():
+    """
+    Current HRMS client health for monitoring
+
+    Returns:
+        dict: Circuit breaker state, transport pool and permission cache statistics
+    """
+    from .hrms_cache import permission_cache
+    return {
+        'circuit_breaker': hrms_circuit_breaker.stats(),
+        'transport': get_transport().stats(),
+        'permission_cache': permission_cache.stats(),
+    }
+
+
 def hrms_login_required(view_func):
     """
     Decorator to require HRMS authentication for a view
@@ -264,15 +647,29 @@ def hrms_login_required(view_func):
         @hrms_login_required
         def my_view(request):
             pass
+    
+    Also accepts async views.
     """
+    def login_redirect(request):
+        from django.shortcuts import redirect
+        from django.urls import reverse
+        return redirect(f"{reverse('hrms_login')}?next={request.path}")
+    
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def async_wrapper(request, *args, **kwargs):
+            token = await sync_to_async(request.session.get)('hrms_rbac_token')
+            if not token:
+                return login_redirect(request)
+            return await view_func(request, *args, **kwargs)
+        return async_wrapper
+    
     @wraps(view_func)
     def wrapper(request, *args, **kwargs):
         # Check if user has HRMS token
         token = request.session.get('hrms_rbac_token')
         if not token:
-            from django.shortcuts import redirect
-            from django.urls import reverse
-            return redirect(f"{reverse('hrms_login')}?next={request.path}")
+            return login_redirect(request)
         
         return view_func(request, *args, **kwargs)
     return wrapper
@@ -297,11 +694,10 @@ def require_hrms_permission(permission_code):
                 from django.urls import reverse
                 return redirect(f"{reverse('hrms_login')}?next={request.path}")
             
-            # Check permission
-            client = HRMSRBACClient()
-            client.token = token
+            # Check permission against the session permission snapshot
+            from marketing_app.permissions import check_permission
             
-            if not client.check_permission(permission_code):
+            if not check_permission(request, permission_code):
                 logger.warning(
                     f"Permission denied: User tried to access "
                     f"{view_func.__name__} without {permission_code}"
@@ -332,5 +728,7 @@ def get_rbac_client(request):
     token = request.session.get('hrms_rbac_token')
     if token:
         client.token = token
-        client.user_info = request.session.get('hrms_user_info')
+        # User info lives in the shared permission cache, not the session
+        from .hrms_cache import permission_cache
+        client.user_info = permission_cache.get_user_info(token)
     return client
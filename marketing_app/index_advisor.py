@@ -0,0 +1,358 @@
+"""
+Index advisor: find full table scans behind the marketing pages
+
+Replays every parameterless GET URL in marketing_app.urls with the test
+client (as a logged-in HRMS user, inside a rolled-back transaction), runs
+EXPLAIN on each SELECT it issued and collects the tables read with a full
+scan. For each scan a composite index is proposed from the SQL itself:
+
+    equality columns, then ORDER BY / GROUP BY columns, then range columns
+
+Each proposal is tried by creating the index inside a transaction that is
+rolled back, so the report shows the plan and timing before and after and
+indexes are chosen from evidence. Used by the ``advise_indexes`` command.
+"""
+import logging
+import re
+import secrets
+import time
+from django.apps import apps
+from django.db import connection, models, transaction
+from django.db.migrations import AddIndex, Migration
+from django.db.migrations.loader import MigrationLoader
+from django.db.migrations.writer import MigrationWriter
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, reverse
+from .hrms_cache import permission_cache
+from .hrms_middleware import mark_session_refreshed
+from .hrms_principal import HRMSPrincipal, PRINCIPAL_SESSION_KEY
+from .hrms_rbac import PermissionSnapshot
+
+logger = logging.getLogger(__name__)
+
+MAX_INDEX_COLUMNS = 3
+
+# "table"."column" or alias."column" as Django writes them
+COLUMN_REF = re.compile(r'(?:"(\w+)"|\b([A-Z]\d+))\."(\w+)"')
+EQUALITY = re.compile(r'\s*(?:=|IN \(|IS NULL)')
+
+
+class ScannedQuery:
+    """One distinct SELECT that read a table with a full scan"""
+    __slots__ = ('sql', 'urls', 'plan', 'scans')
+
+    def __init__(self, sql, plan, scans):
+        self.sql = sql
+        self.urls = set()
+        self.plan = plan
+        self.scans = scans
+
+
+class IndexProposal:
+    """A composite index for one model, with the queries it is meant to serve"""
+    __slots__ = ('model', 'columns', 'queries', 'before', 'after')
+
+    def __init__(self, model, columns):
+        self.model = model
+        self.columns = tuple(columns)
+        self.queries = []
+        self.before = []
+        self.after = []
+
+    @property
+    def fields(self):
+        by_column = {field.column: field.name for field in self.model._meta.concrete_fields}
+        return [by_column[column] for column in self.columns]
+
+    def index(self):
+        index = models.Index(fields=self.fields)
+        index.set_name_with_model(self.model)
+        return index
+
+    @property
+    def removes_scan(self):
+        """True if the index turned a full scan into an index search for any query"""
+        table = self.model._meta.db_table
+        return any(table in before_scans and table not in after_scans
+                   for (_, _, before_scans), (_, _, after_scans) in zip(self.before, self.after))
+
+
+def replay_urls(urlconf_patterns, prefix='marketing'):
+    """
+    URLs that can be replayed without arguments
+
+    Returns:
+        tuple: (list of (url name, path), list of skipped url names)
+    """
+    urls, skipped, seen = [], [], set()
+    for pattern in urlconf_patterns:
+        if isinstance(pattern, URLResolver) or not isinstance(pattern, URLPattern) or not pattern.name:
+            continue
+        if pattern.pattern.converters:
+            skipped.append(pattern.name)
+            continue
+        path = reverse(f'{prefix}:{pattern.name}')
+        if path not in seen:
+            seen.add(path)
+            urls.append((pattern.name, path))
+    return urls, skipped
+
+
+def replay_client(user_id, username, codes):
+    """
+    Test client logged in as an HRMS user with the given permission codes
+
+    Returns:
+        tuple: (client, token); pass the token to end_replay() when done
+    """
+    client = Client(raise_request_exception=False)
+    token = f'index-advisor-{secrets.token_hex(8)}'
+    session = client.session
+    session['hrms_rbac_token'] = token
+    session[PRINCIPAL_SESSION_KEY] = HRMSPrincipal({'id': user_id, 'username': username}).to_record()
+    mark_session_refreshed(session)
+    session.save()
+    permission_cache.set_snapshot(token, PermissionSnapshot(codes), user_id=user_id)
+    return client, token
+
+
+def end_replay(client, token):
+    permission_cache.invalidate_token(token)
+    client.session.delete()
+
+
+def capture_selects(client, urls):
+    """
+    Replay ``urls`` and capture their SELECT statements
+
+    Writes made by the views are rolled back.
+
+    Returns:
+        tuple: ({sql: set of url names}, {url name: (status, query count, ms)})
+    """
+    selects, responses = {}, {}
+    # Failing pages are reported by status; keep their tracebacks out of the report
+    request_logger = logging.getLogger('django.request')
+    level = request_logger.level
+    request_logger.setLevel(logging.CRITICAL)
+    try:
+        for name, path in urls:
+            with transaction.atomic():
+                with CaptureQueriesContext(connection) as captured:
+                    started = time.perf_counter()
+                    response = client.get(path)
+                    elapsed = (time.perf_counter() - started) * 1000
+                transaction.set_rollback(True)
+            responses[name] = (response.status_code, len(captured.captured_queries), elapsed)
+            for query in captured.captured_queries:
+                sql = query['sql']
+                if sql.lstrip().upper().startswith('SELECT'):
+                    selects.setdefault(sql, set()).add(name)
+    finally:
+        request_logger.setLevel(level)
+    return selects, responses
+
+
+def explain(sql):
+    """
+    Query plan lines for ``sql``
+
+    Returns:
+        list: Plan lines, or None if the statement cannot be explained
+    """
+    vendor = connection.vendor
+    if vendor == 'sqlite':
+        statement = f'EXPLAIN QUERY PLAN {sql}'
+    elif vendor == 'postgresql':
+        statement = f'EXPLAIN {sql}'
+    else:
+        raise NotImplementedError(f"EXPLAIN is not supported on {vendor}")
+    try:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(statement)
+            rows = cursor.fetchall()
+    except Exception as e:
+        logger.debug(f"Could not explain query: {e}")
+        return None
+    return [row[-1] if vendor == 'sqlite' else row[0] for row in rows]
+
+
+def _aliases(sql):
+    return {alias: table for table, alias in re.findall(r'"(\w+)" ([A-Z]\d+)\b', sql)}
+
+
+def full_scans(sql, plan):
+    """
+    Tables read with a full scan, as {table: name used in the SQL}
+
+    The name is the table itself or the alias of a subquery.
+    """
+    aliases = _aliases(sql)
+    scans = {}
+    for line in plan or ():
+        if connection.vendor == 'sqlite':
+            # "SCAN t" reads every row; "SCAN t USING INDEX i" walks an index in order
+            match = re.match(r'\s*SCAN (\w+)$', line)
+            if match:
+                name = match.group(1)
+                scans.setdefault(aliases.get(name, name), name)
+        else:
+            match = re.search(r'Seq Scan on (\w+)(?: (\w+))?', line)
+            if match:
+                scans.setdefault(match.group(1), match.group(2) or match.group(1))
+    return scans
+
+
+def candidate_columns(sql, qualifier):
+    """
+    Index columns for the table ``qualifier`` names in ``sql``
+
+    Returns:
+        list: Equality columns, then sort columns, then range columns
+    """
+    body = sql[sql.find(' FROM '):]
+    head, _, order_by = body.rpartition(' ORDER BY ')
+    if not head:
+        head, order_by = body, ''
+    # Join conditions are served by the foreign key indexes
+    if ' WHERE ' in head:
+        head = head[head.find(' WHERE '):]
+    elif ' GROUP BY ' in head:
+        head = head[head.rfind(' GROUP BY '):]
+    else:
+        head = ''
+    group_by = head.rpartition(' GROUP BY ')[2] if ' GROUP BY ' in head else ''
+
+    equality, sort, ranges = [], [], []
+    # PostgreSQL reports unquoted aliases in lower case
+    qualifier = qualifier.lower()
+    for match in COLUMN_REF.finditer(head):
+        if (match.group(1) or match.group(2)).lower() != qualifier:
+            continue
+        column = match.group(3)
+        if match.start() >= len(head) - len(group_by):
+            sort.append(column)
+        elif EQUALITY.match(head, match.end()):
+            equality.append(column)
+        else:
+            ranges.append(column)
+    for match in COLUMN_REF.finditer(order_by):
+        if (match.group(1) or match.group(2)).lower() == qualifier:
+            sort.append(match.group(3))
+
+    columns = []
+    for column in equality + sort + ranges:
+        if column not in columns:
+            columns.append(column)
+    if columns[1:] and columns[-1] == 'id':
+        columns.pop()
+    return columns[:MAX_INDEX_COLUMNS]
+
+
+def existing_indexes(table):
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(cursor, table)
+    return [tuple(info['columns']) for info in constraints.values() if info['index'] or info['unique']]
+
+
+def _app_models():
+    return {model._meta.db_table: model for model in apps.get_app_config('marketing_app').get_models()}
+
+
+def propose_indexes(selects):
+    """
+    Explain captured SELECTs and propose one index per scan pattern
+
+    Args:
+        selects (dict): {sql: set of url names} from capture_selects()
+
+    Returns:
+        tuple: (list of IndexProposal, list of ScannedQuery)
+    """
+    by_table = _app_models()
+    proposals, scanned = {}, []
+    for sql, urls in selects.items():
+        plan = explain(sql)
+        scans = full_scans(sql, plan)
+        if not scans:
+            continue
+        query = ScannedQuery(sql, plan, scans)
+        query.urls |= urls
+        scanned.append(query)
+        for table, qualifier in scans.items():
+            model = by_table.get(table)
+            columns = candidate_columns(sql, qualifier)
+            if model is None or not columns or columns == ['id']:
+                continue
+            if any(index[:len(columns)] == tuple(columns) for index in existing_indexes(table)):
+                continue
+            proposal = proposals.setdefault((table, tuple(columns)), IndexProposal(model, columns))
+            proposal.queries.append(query)
+
+    # An index also serves every query whose columns are a prefix of its own
+    for (table, columns), proposal in list(proposals.items()):
+        wider = [other for (other_table, other_columns), other in proposals.items()
+                 if other_table == table and len(other_columns) > len(columns)
+                 and other_columns[:len(columns)] == columns]
+        if wider:
+            wider[0].queries.extend(query for query in proposal.queries if query not in wider[0].queries)
+            del proposals[(table, columns)]
+    return list(proposals.values()), scanned
+
+
+def time_query(sql, repeat=5):
+    """Best of ``repeat`` runs of ``sql``, in milliseconds"""
+    best = None
+    with connection.cursor() as cursor:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            cursor.execute(sql)
+            cursor.fetchall()
+            elapsed = (time.perf_counter() - started) * 1000
+            best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def _measure(query, repeat):
+    plan = explain(query.sql)
+    return plan, time_query(query.sql, repeat), set(full_scans(query.sql, plan))
+
+
+def evaluate(proposal, repeat=5):
+    """
+    Record plans and timings with and without the proposed index
+
+    The index is created inside a transaction that is rolled back.
+    """
+    proposal.before = [_measure(query, repeat) for query in proposal.queries]
+    index = proposal.index()
+    # Only render the DDL: entering a SQLite schema editor is not allowed inside atomic()
+    statement = str(index.create_sql(proposal.model, connection.schema_editor(collect_sql=True)))
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(statement)
+        proposal.after = [_measure(query, repeat) for query in proposal.queries]
+        transaction.set_rollback(True)
+    return proposal
+
+
+def write_migration(proposals, app_label='marketing_app', name='advised_indexes'):
+    """
+    Write a migration adding the proposed indexes
+
+    Returns:
+        str: Path of the new migration file
+    """
+    loader = MigrationLoader(None, ignore_no_migrations=True)
+    leaf = loader.graph.leaf_nodes(app_label)[0]
+    number = int(leaf[1].split('_', 1)[0]) + 1
+    migration = Migration(f'{number:04d}_{name}', app_label)
+    migration.dependencies = [leaf]
+    migration.operations = [
+        AddIndex(model_name=proposal.model._meta.model_name, index=proposal.index()) for proposal in proposals
+    ]
+    writer = MigrationWriter(migration)
+    with open(writer.path, 'w', encoding='utf-8') as f:
+        f.write(writer.as_string())
+    return writer.path
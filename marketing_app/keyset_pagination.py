@@ -0,0 +1,210 @@
+"""
+Keyset (seek) pagination for list views
+
+KeysetPaginator pages a queryset by its ordering keys instead of OFFSET:
+the "next" link carries an opaque cursor holding the last row's key values
+and the next page is ``WHERE (keys) after (cursor) LIMIT per_page + 1``.
+Every page costs the same however deep the user goes, and no COUNT(*) is
+needed to know whether there is a next page.
+
+Pages are drop-in replacements for django.core.paginator.Page in templates:
+``page_obj.next_page_number`` / ``previous_page_number`` return cursors, so
+the existing ``?page={{ page_obj.next_page_number }}`` links seek. Plain
+page numbers (from page_range links or bookmarks) still work through OFFSET.
+``paginator.count`` is a COUNT capped at KEYSET_COUNT_LIMIT rows; templates
+check ``paginator.count_is_exact`` before showing it (or num_pages) as a total.
+"""
+from collections.abc import Sequence
+from django.conf import settings
+from django.core import signing
+from django.db.models import F, Q
+
+CURSOR_SALT = 'marketing_app.keyset_pagination'
+
+
+class KeysetPage(Sequence):
+    """One page of rows, with the Page API the list templates use"""
+
+    def __init__(self, object_list, number, paginator, has_next, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.number = number
+        self.paginator = paginator
+        self._has_next = has_next
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f'<Keyset page {self.number}>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self.number > 1
+
+    def has_other_pages(self):
+        return self.has_previous() or self.has_next()
+
+    def next_page_number(self):
+        return self.next_cursor
+
+    def previous_page_number(self):
+        return self.previous_cursor if self.number > 2 else 1
+
+    def start_index(self):
+        if not self.object_list:
+            return 0
+        return (self.number - 1) * self.paginator.per_page + 1
+
+    def end_index(self):
+        return (self.number - 1) * self.paginator.per_page + len(self.object_list)
+
+
+class KeysetPaginator:
+    """
+    Seek paginator over a queryset's ordering
+
+    The ordering is the queryset's order_by (or the model's Meta.ordering)
+    with the primary key appended as a tie-breaker. Only concrete fields of
+    the model itself can be ordering keys; NULLs sort last in both directions.
+
+    Usage:
+        paginator = KeysetPaginator(InquiryLog.objects.filter(...), 20)
+        page_obj = paginator.get_page(request.GET.get('page'))
+    """
+
+    def __init__(self, queryset, per_page, count_limit=None):
+        self.per_page = int(per_page)
+        self.count_limit = count_limit or getattr(settings, 'KEYSET_COUNT_LIMIT', 1000)
+        self.model = queryset.model
+        self.keys = self._ordering_keys(queryset)
+        self.queryset = queryset.order_by(*self._order_by(reverse=False))
+        self._count = None
+
+    def _ordering_keys(self, queryset):
+        ordering = list(queryset.query.order_by or self.model._meta.ordering or ())
+        keys = []
+        for item in ordering:
+            if not isinstance(item, str):
+                raise ValueError(f"Keyset pagination needs field name ordering, got {item!r}")
+            descending = item.startswith('-')
+            name = item.lstrip('-')
+            field = self.model._meta.pk if name == 'pk' else self.model._meta.get_field(name)
+            keys.append((field, descending))
+        pk = self.model._meta.pk
+        if not any(field == pk for field, _ in keys):
+            # Unordered querysets page newest first
+            keys.append((pk, keys[0][1] if keys else True))
+        return keys
+
+    def _order_by(self, reverse):
+        expressions = []
+        for field, descending in self.keys:
+            # NULLS FIRST/LAST only where it matters, so the ordering can use plain indexes
+            nulls = {'nulls_first': True} if reverse else {'nulls_last': True}
+            column = F(field.attname)
+            expression = column.desc if descending != reverse else column.asc
+            expressions.append(expression(**nulls) if field.null else expression())
+        return expressions
+
+    def _seek(self, values, forward):
+        """Rows strictly after (forward) or before the row with key ``values``"""
+        condition = Q()
+        ties = Q()
+        for (field, descending), value in zip(self.keys, values):
+            name = field.attname
+            if value is None:
+                # NULLs sort last: nothing non-NULL comes after, everything before
+                beyond = Q() if forward else Q(**{f'{name}__isnull': False})
+                tie = Q(**{f'{name}__isnull': True})
+            else:
+                lookup = 'lt' if descending == forward else 'gt'
+                beyond = Q(**{f'{name}__{lookup}': value})
+                if forward and field.null:
+                    beyond |= Q(**{f'{name}__isnull': True})
+                tie = Q(**{name: value})
+            if beyond:
+                condition |= ties & beyond
+            ties &= tie
+        # A redundant bound on the leading key lets the database range-scan
+        # an index on the ordering instead of OR-ing index lookups
+        (field, descending), value = self.keys[0], values[0]
+        if value is not None and not field.null:
+            lookup = 'lte' if descending == forward else 'gte'
+            condition &= Q(**{f'{field.attname}__{lookup}': value})
+        return condition
+
+    def _encode(self, number, forward, obj):
+        values = [None if getattr(obj, field.attname) is None else field.value_to_string(obj)
+                  for field, _ in self.keys]
+        return signing.dumps([number, forward, values], salt=CURSOR_SALT, compress=True)
+
+    def _decode(self, token):
+        try:
+            number, forward, values = signing.loads(token, salt=CURSOR_SALT)
+        except (signing.BadSignature, TypeError, ValueError):
+            return None
+        if len(values) != len(self.keys):
+            return None
+        values = [None if value is None else field.to_python(value)
+                  for (field, _), value in zip(self.keys, values)]
+        return int(number), bool(forward), values
+
+    @property
+    def count(self):
+        """Number of rows, counted up to ``count_limit``"""
+        if self._count is None:
+            self._count = self.queryset.order_by()[:self.count_limit].count()
+        return self._count
+
+    @property
+    def count_is_exact(self):
+        return self.count < self.count_limit
+
+    @property
+    def num_pages(self):
+        return max(1, -(-self.count // self.per_page))
+
+    @property
+    def page_range(self):
+        return range(1, self.num_pages + 1)
+
+    def get_page(self, token=None):
+        """
+        Args:
+            token: Cursor from next/previous_page_number, a page number, or None
+
+        Returns:
+            KeysetPage: The requested page (the first page for a bad token)
+        """
+        position = self._decode(token) if token and not str(token).isdigit() else None
+        if position is None:
+            number = int(token) if token and str(token).isdigit() and int(token) > 0 else 1
+            offset = (number - 1) * self.per_page
+            rows = list(self.queryset[offset:offset + self.per_page + 1])
+            if not rows and number > 1:
+                return self.get_page(None)
+            return self._page(rows[:self.per_page], number, len(rows) > self.per_page)
+
+        number, forward, values = position
+        if forward:
+            rows = list(self.queryset.filter(self._seek(values, True))[:self.per_page + 1])
+            return self._page(rows[:self.per_page], number, len(rows) > self.per_page)
+
+        backward = self.queryset.filter(self._seek(values, False)).order_by(*self._order_by(reverse=True))
+        rows = list(backward[:self.per_page])
+        rows.reverse()
+        if not rows:
+            return self.get_page(None)
+        return self._page(rows, max(number, 1), True)
+
+    def _page(self, rows, number, has_next):
+        next_cursor = self._encode(number + 1, True, rows[-1]) if has_next and rows else None
+        previous_cursor = self._encode(number - 1, False, rows[0]) if number > 1 and rows else None
+        return KeysetPage(rows, number, self, has_next, next_cursor, previous_cursor)
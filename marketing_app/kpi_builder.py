@@ -0,0 +1,129 @@
+"""
+Conditional-aggregation KPI queries for date-range dashboards
+
+KPIQuery folds every per-status COUNT and SUM over one model into a single
+SELECT using filtered aggregates. Date windows are applied as sargable,
+half-open ranges (``col >= start AND col < end``) rather than ``__date``
+lookups, which wrap the column in a function and defeat its index.
+"""
+import calendar
+from datetime import date, datetime, time, timedelta
+from django.db import models
+from django.db.models import Count, Q, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+
+def day_start(day):
+    """Aware datetime for midnight at the start of ``day`` in the current time zone"""
+    value = datetime.combine(day, time.min)
+    if timezone.is_naive(value) and timezone.is_aware(timezone.now()):
+        value = timezone.make_aware(value)
+    return value
+
+
+def month_bounds(year, month):
+    """
+    Returns:
+        tuple: (first day, last day) of the month as dates
+    """
+    return date(year, month, 1), date(year, month, calendar.monthrange(year, month)[1])
+
+
+def months_back(day, months):
+    """First day of the calendar month ``months`` before the month of ``day``"""
+    year, month = divmod(day.year * 12 + day.month - 1 - months, 12)
+    return date(year, month + 1, 1)
+
+
+def _resolve_field(model, path):
+    """Model field at the end of a ``relation__field`` lookup path"""
+    *relations, name = path.split('__')
+    for relation in relations:
+        model = model._meta.get_field(relation).related_model
+    return model._meta.get_field(name)
+
+
+def date_range(model, field, start_date=None, end_date=None):
+    """
+    Half-open range filter covering whole days ``start_date``..``end_date``
+
+    Works for both DateField and DateTimeField columns; either bound may be
+    omitted. Equivalent to ``{field}__date__range`` but index friendly.
+
+    Args:
+        model: Model class the filter is applied to
+        field (str): Date or datetime column, or a ``relation__column`` path
+        start_date (date): First day included
+        end_date (date): Last day included
+
+    Returns:
+        Q: Filter on the bare column
+
+    Usage:
+        Quotation.objects.filter(date_range(Quotation, 'created_at', start, end))
+    """
+    is_datetime = isinstance(_resolve_field(model, field), models.DateTimeField)
+    bound = day_start if is_datetime else (lambda day: day)
+    query = Q()
+    if start_date is not None:
+        query &= Q(**{f'{field}__gte': bound(start_date)})
+    if end_date is not None:
+        query &= Q(**{f'{field}__lt': bound(end_date + timedelta(days=1))})
+    return query
+
+
+class KPIQuery:
+    """
+    Several filtered counts and sums over one model, in one query
+
+    Usage:
+        stats = (KPIQuery(Quotation, 'created_at', start_date, end_date)
+                 .count('total')
+                 .count('accepted', status='accepted')
+                 .sum('value', 'total_amount', status='accepted')
+                 .run())
+        # {'total': 12, 'accepted': 3, 'value': Decimal('...')}
+    """
+    def __init__(self, model_or_queryset, date_field=None, start_date=None, end_date=None):
+        if isinstance(model_or_queryset, models.QuerySet):
+            self.queryset = model_or_queryset
+        else:
+            self.queryset = model_or_queryset._default_manager.all()
+        self.model = self.queryset.model
+        if date_field and (start_date is not None or end_date is not None):
+            self.queryset = self.queryset.filter(date_range(self.model, date_field, start_date, end_date))
+        self.aggregates = {}
+
+    def _filter(self, q, lookups):
+        query = q if q is not None else Q()
+        if lookups:
+            query &= Q(**lookups)
+        return query if query else None
+
+    def count(self, name, q=None, **lookups):
+        """Count rows, optionally only those matching ``q`` / ``lookups``"""
+        self.aggregates[name] = Count('pk', filter=self._filter(q, lookups))
+        return self
+
+    def sum(self, name, field, q=None, **lookups):
+        """Sum ``field`` (0 when nothing matches), optionally filtered"""
+        output_field = self.model._meta.get_field(field).clone()
+        self.aggregates[name] = Coalesce(
+            Sum(field, filter=self._filter(q, lookups)), Value(0), output_field=output_field
+        )
+        return self
+
+    def run(self):
+        """
+        Returns:
+            dict: Aggregate name -> value
+        """
+        if not self.aggregates:
+            return {}
+        return self.queryset.aggregate(**self.aggregates)
+
+
+def percentage(part, whole):
+    """``part`` as a percentage of ``whole``, rounded to 2 places (0 when whole is 0)"""
+    return round(part / whole * 100, 2) if whole else 0
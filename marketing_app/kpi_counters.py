@@ -0,0 +1,298 @@
+"""
+Signal-maintained dashboard counters
+
+Each registered counter counts the rows of one model that match an optional
+``field in values`` condition, overall (KPICounter.ALL_USERS) and per HRMS
+user through an owner column. post_save / post_delete apply +1/-1 deltas so
+dashboards read their numbers from KPICounter instead of running COUNT(*).
+
+Bulk updates, raw SQL and fixture loads bypass the signals; run the
+``rebuild_kpi_counters`` command periodically (e.g. hourly from cron) to
+reconcile any drift.
+"""
+import logging
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.utils import timezone
+from .models import (
+    KPICounter, Customer, Lead, Quotation, Manufacturing,
+    FollowUpStatus, ProjectToday, OrderExpectedNextMonth, MISPurchaseOrder, NewData,
+    NewDataDetails, ODPlan, InquiryLog, ODPlanVisitReport, ODPlanRemarks, PODetails,
+    POStatus, WorkOrderFormat, WeeklySummary, CallingDetails, HotOrders,
+    PendingPayment2024, PendingPayment2025, OrderLoss, DSR,
+)
+
+logger = logging.getLogger(__name__)
+
+ALL_USERS = KPICounter.ALL_USERS
+
+ACTIVE_LEAD_STATUSES = ('new', 'contacted', 'qualified')
+IN_PRODUCTION_STATUSES = ('started', 'in_progress', 'qc_started')
+
+
+class CounterDefinition:
+    """How one counter key is derived from a model's rows"""
+    __slots__ = ('key', 'model', 'field', 'values', 'owner_field')
+
+    def __init__(self, key, model, field=None, values=None, owner_field=None):
+        self.key = key
+        self.model = model
+        self.field = field
+        self.values = tuple(values or ())
+        self.owner_field = owner_field
+
+    def state(self, obj):
+        """
+        Args:
+            obj: Model instance, or a dict from .values()
+
+        Returns:
+            tuple: (owner user id or None, whether the row is counted)
+        """
+        get = obj.get if isinstance(obj, dict) else lambda name: getattr(obj, name)
+        owner = get(self.owner_field) if self.owner_field else None
+        matched = self.field is None or get(self.field) in self.values
+        return owner, matched
+
+    def queryset(self):
+        queryset = self.model._default_manager.all()
+        if self.field:
+            queryset = queryset.filter(**{f'{self.field}__in': self.values})
+        return queryset
+
+    def compute(self):
+        """
+        Count from scratch
+
+        Returns:
+            dict: {user_id: count}, always including ALL_USERS
+        """
+        queryset = self.queryset()
+        counts = {ALL_USERS: queryset.count()}
+        if self.owner_field:
+            rows = (queryset.filter(**{f'{self.owner_field}__isnull': False})
+                    .values(self.owner_field).annotate(n=Count('pk')).order_by())
+            for row in rows:
+                counts[row[self.owner_field]] = row['n']
+        return counts
+
+
+_counters = {}
+_counters_by_model = {}
+
+
+def register_counter(key, model, field=None, values=None, owner_field=None):
+    """
+    Register a counter and hook it to the model's save/delete signals
+
+    Args:
+        key (str): Counter key stored in KPICounter.key
+        model: Model class whose rows are counted
+        field (str): Optional field the row must match
+        values (iterable): Values of ``field`` that are counted
+        owner_field (str): Optional HRMS user id column for per-user counts
+
+    Returns:
+        CounterDefinition: The registered definition
+    """
+    definition = CounterDefinition(key, model, field, values, owner_field)
+    _counters[key] = definition
+    _counters_by_model.setdefault(model, []).append(definition)
+    uid = f'kpi_counters:{model._meta.label}'
+    pre_save.connect(_remember_previous_state, sender=model, dispatch_uid=uid)
+    post_save.connect(_apply_saved, sender=model, dispatch_uid=uid)
+    post_delete.connect(_apply_deleted, sender=model, dispatch_uid=uid)
+    return definition
+
+
+def rows_key(model, value=None):
+    """Counter key for all rows of a model, or those with one status value"""
+    key = f'rows.{model._meta.model_name}'
+    return f'{key}.{value}' if value is not None else key
+
+
+def register_row_counter(model, field=None, values=None, owner_field='created_by_user_id'):
+    """
+    Count a model's rows, overall and per creating HRMS user
+
+    With ``field`` one counter is registered per value, keyed rows_key(model, value).
+    """
+    if field is None:
+        return [register_counter(rows_key(model), model, owner_field=owner_field)]
+    return [
+        register_counter(rows_key(model, value), model, field, (value,), owner_field=owner_field)
+        for value in values
+    ]
+
+
+def get_counter_definitions(keys=None):
+    if keys is None:
+        return list(_counters.values())
+    return [_counters[key] for key in keys]
+
+
+def _bump(key, user_id, delta):
+    """Add delta to one counter row; returns False if the row does not exist"""
+    updated = KPICounter.objects.filter(key=key, user_id=user_id).update(
+        value=F('value') + delta, updated_at=timezone.now()
+    )
+    return bool(updated)
+
+
+def _apply(definition, state, delta):
+    owner, matched = state
+    if not matched:
+        return
+    # No overall row means the store was never built for this key; readers
+    # fall back to COUNT(*) until rebuild_kpi_counters creates it
+    if not _bump(definition.key, ALL_USERS, delta):
+        return
+    if owner is None or _bump(definition.key, owner, delta) or delta < 0:
+        return
+    try:
+        with transaction.atomic():
+            KPICounter.objects.create(key=definition.key, user_id=owner, value=delta)
+    except IntegrityError:
+        # Created concurrently by another request
+        _bump(definition.key, owner, delta)
+
+
+def _remember_previous_state(sender, instance, raw=False, **kwargs):
+    instance._kpi_previous = None
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    definitions = _counters_by_model.get(sender, [])
+    fields = {name for d in definitions for name in (d.field, d.owner_field) if name}
+    if not fields:
+        return
+    row = sender._default_manager.filter(pk=instance.pk).values(*fields).first()
+    if row is not None:
+        instance._kpi_previous = {d.key: d.state(row) for d in definitions}
+
+
+def _apply_saved(sender, instance, created=False, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_kpi_previous', None)
+    instance._kpi_previous = None
+    for definition in _counters_by_model.get(sender, []):
+        new_state = definition.state(instance)
+        if created:
+            _apply(definition, new_state, 1)
+            continue
+        old_state = previous.get(definition.key) if previous else None
+        if old_state is None or old_state == new_state:
+            continue
+        _apply(definition, old_state, -1)
+        _apply(definition, new_state, 1)
+
+
+def _apply_deleted(sender, instance, **kwargs):
+    for definition in _counters_by_model.get(sender, []):
+        _apply(definition, definition.state(instance), -1)
+
+
+def read_counters(spec):
+    """
+    Read several counters in one query
+
+    Args:
+        spec (dict): {counter key: user id}, ALL_USERS for the overall count
+
+    Returns:
+        dict: {counter key: value}, or None for counters that were never built
+    """
+    if not spec:
+        return {}
+    query = Q()
+    for key, user_id in spec.items():
+        query |= Q(key=key, user_id=user_id)
+        if user_id != ALL_USERS:
+            query |= Q(key=key, user_id=ALL_USERS)
+    found = {
+        (key, user_id): value
+        for key, user_id, value in KPICounter.objects.filter(query).values_list('key', 'user_id', 'value')
+    }
+    values = {}
+    for key, user_id in spec.items():
+        if (key, ALL_USERS) not in found:
+            values[key] = None
+        else:
+            # A built store has no row for users with nothing counted
+            values[key] = found.get((key, user_id), 0)
+    return values
+
+
+def read_counts(spec):
+    """
+    Read counts for a dashboard, from the counters where possible
+
+    Args:
+        spec (dict): {counter key: (user id, fallback queryset)}. A user id of
+            None means the counters cannot answer for this caller.
+
+    Returns:
+        dict: {counter key: int}; keys the store cannot serve are counted live
+
+    Usage:
+        counts = read_counts({
+            rows_key(PODetails): (user_id, owned_rows(PODetails, user_id)),
+        })
+    """
+    stored = read_counters({key: user_id for key, (user_id, _) in spec.items() if user_id is not None})
+    counts = {}
+    for key, (user_id, queryset) in spec.items():
+        value = stored.get(key)
+        counts[key] = queryset.count() if value is None else value
+    return counts
+
+
+def rebuild_counters(keys=None, dry_run=False):
+    """
+    Recompute counters from the source tables and fix any drift
+
+    Args:
+        keys (list): Counter keys to rebuild (default: all registered)
+        dry_run (bool): Only report drift, do not write
+
+    Returns:
+        list: (key, user_id, stored value or None, actual value) for each drifted row
+    """
+    drift = []
+    for definition in get_counter_definitions(keys):
+        actual = definition.compute()
+        stored = dict(KPICounter.objects.filter(key=definition.key).values_list('user_id', 'value'))
+        key_drift = []
+        for user_id in sorted(set(actual) | set(stored)):
+            expected = actual.get(user_id, 0)
+            current = stored.get(user_id)
+            if current != expected and not (current is None and expected == 0 and user_id != ALL_USERS):
+                key_drift.append((definition.key, user_id, current, expected))
+        drift.extend(key_drift)
+        if dry_run or not key_drift:
+            continue
+        with transaction.atomic():
+            for key, user_id, current, expected in key_drift:
+                KPICounter.objects.update_or_create(key=key, user_id=user_id, defaults={'value': expected})
+    if drift:
+        logger.warning(f"KPI counter drift on {len(drift)} row(s): {drift[:10]}")
+    return drift
+
+
+# Marketing dashboard headline numbers
+register_counter('customers.total', Customer, owner_field='created_by_user_id')
+register_counter('leads.active', Lead, 'status', ACTIVE_LEAD_STATUSES, owner_field='assigned_to_user_id')
+register_counter('quotations.sent', Quotation, 'status', ('sent',))
+register_counter('manufacturing.in_production', Manufacturing, 'status', IN_PRODUCTION_STATUSES)
+
+# MIS, WSR, OD plan, PO and work order sheets, per creating HRMS user
+for _model in (
+    FollowUpStatus, ProjectToday, OrderExpectedNextMonth, MISPurchaseOrder, NewData,
+    NewDataDetails, ODPlan, InquiryLog, ODPlanVisitReport, ODPlanRemarks, PODetails,
+    POStatus, WorkOrderFormat, WeeklySummary, CallingDetails, HotOrders,
+    PendingPayment2024, PendingPayment2025, OrderLoss, DSR,
+):
+    register_row_counter(_model)
+register_row_counter(ODPlanVisitReport, 'visit_status', ('planned', 'completed', 'cancelled'))
+del _model
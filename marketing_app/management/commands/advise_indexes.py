@@ -0,0 +1,91 @@
+"""
+Propose indexes from the query plans of the marketing pages
+
+Replays the parameterless GET URLs of marketing_app.urls, explains every
+SELECT they issue, and for each full table scan proposes a composite index.
+Each proposal is tried inside a rolled-back transaction and reported with
+its plan and timing before and after.
+
+Usage:
+    python manage.py advise_indexes                          # report only
+    python manage.py advise_indexes lead_list visit_list     # only some URL names
+    python manage.py advise_indexes --write                  # also write a migration
+    python manage.py advise_indexes --user-id 12 --username asha --permission marketing.data.view_region
+
+Run it against a database with production-like volumes: on small tables
+the planner prefers scans and the timings mean little. Indexes written to a
+migration must also be added to the models' Meta.indexes (the command
+prints the lines) so makemigrations stays in step.
+"""
+from django.core.management.base import BaseCommand, CommandError
+from marketing_app import index_advisor
+from marketing_app.permissions import MARKETING_PERMISSIONS
+from marketing_app.urls import urlpatterns
+
+
+class Command(BaseCommand):
+    help = 'Report full table scans behind the marketing pages and propose indexes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('urls', nargs='*', help='URL names to replay (default: all without arguments)')
+        parser.add_argument('--user-id', type=int, default=1, help='HRMS user id to replay as (default: 1)')
+        parser.add_argument('--username', default='index-advisor', help='HRMS username to replay as')
+        parser.add_argument('--permission', action='append', dest='permissions',
+                            help='Permission code to grant (repeatable; default: every marketing permission)')
+        parser.add_argument('--repeat', type=int, default=5, help='Timing runs per query, best kept (default: 5)')
+        parser.add_argument('--write', action='store_true', help='Write a migration with the indexes that remove a scan')
+
+    def handle(self, *args, **options):
+        urls, skipped = index_advisor.replay_urls(urlpatterns)
+        if options['urls']:
+            unknown = set(options['urls']) - {name for name, _ in urls}
+            if unknown:
+                raise CommandError(f"Unknown or parameterised URL name(s): {', '.join(sorted(unknown))}")
+            urls = [(name, path) for name, path in urls if name in options['urls']]
+        codes = options['permissions'] or sorted(set(MARKETING_PERMISSIONS.values()))
+
+        client, token = index_advisor.replay_client(options['user_id'], options['username'], codes)
+        try:
+            selects, responses = index_advisor.capture_selects(client, urls)
+        finally:
+            index_advisor.end_replay(client, token)
+
+        self.stdout.write(f"Replayed {len(urls)} URL(s), skipped {len(skipped)} with arguments")
+        for name, (status, queries, elapsed) in responses.items():
+            self.stdout.write(f"  {name}: HTTP {status}, {queries} queries, {elapsed:.1f} ms")
+
+        try:
+            proposals, scanned = index_advisor.propose_indexes(selects)
+        except NotImplementedError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(f"\n{len(scanned)} of {len(selects)} distinct SELECT(s) use a full table scan")
+        for query in scanned:
+            self.stdout.write(f"  {', '.join(sorted(query.scans))} <- {', '.join(sorted(query.urls))}")
+
+        useful = []
+        for proposal in proposals:
+            index_advisor.evaluate(proposal, repeat=options['repeat'])
+            self._report(proposal)
+            if proposal.removes_scan:
+                useful.append(proposal)
+
+        if not proposals:
+            self.stdout.write(self.style.SUCCESS("\nNo indexes to propose"))
+            return
+        self.stdout.write(f"\n{len(useful)} of {len(proposals)} proposed index(es) remove a full scan")
+        for proposal in useful:
+            index = proposal.index()
+            self.stdout.write(f"  {proposal.model.__name__}.Meta.indexes: "
+                              f"models.Index(fields={index.fields!r}, name={index.name!r})")
+        if options['write'] and useful:
+            path = index_advisor.write_migration(useful)
+            self.stdout.write(self.style.SUCCESS(f"Wrote {path}"))
+
+    def _report(self, proposal):
+        index = proposal.index()
+        self.stdout.write(f"\n{proposal.model.__name__} ({', '.join(index.fields)})")
+        for query, before, after in zip(proposal.queries, proposal.before, proposal.after):
+            self.stdout.write(f"  {', '.join(sorted(query.urls))}: {query.sql[:160]}")
+            self.stdout.write(f"    before {before[1]:.2f} ms: {' | '.join(before[0] or [])}")
+            self.stdout.write(f"    after  {after[1]:.2f} ms: {' | '.join(after[0] or [])}")
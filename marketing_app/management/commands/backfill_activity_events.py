@@ -0,0 +1,37 @@
+"""
+Seed the activity feed with creation events for existing rows
+
+Rows that already have an event are skipped, so the command can be re-run.
+
+Usage:
+    python manage.py backfill_activity_events              # last 30 days
+    python manage.py backfill_activity_events --days 90
+    python manage.py backfill_activity_events --all
+    python manage.py backfill_activity_events --all --if-empty   # only while the feed is empty (container start)
+"""
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from marketing_app.activity_feed import backfill_events
+from marketing_app.models import ActivityEvent
+
+
+class Command(BaseCommand):
+    help = 'Append activity feed events for rows created before the feed existed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30, help='Number of most recent days to backfill (default: 30)')
+        parser.add_argument('--all', action='store_true', help='Backfill the full history')
+        parser.add_argument('--if-empty', action='store_true', help='Do nothing if the feed already has events')
+
+    def handle(self, *args, **options):
+        if options['if_empty'] and ActivityEvent.objects.exists():
+            self.stdout.write("Activity feed already loaded")
+            return
+        since = None
+        if not options['all']:
+            if options['days'] < 1:
+                raise CommandError("--days must be at least 1")
+            since = timezone.localdate() - timedelta(days=options['days'] - 1)
+        written = backfill_events(since)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} activity event(s)"))
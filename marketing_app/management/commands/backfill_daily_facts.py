@@ -0,0 +1,50 @@
+"""
+Rebuild the daily fact tables from the source models
+
+Usage:
+    python manage.py backfill_daily_facts              # last 7 days (run nightly from cron)
+    python manage.py backfill_daily_facts --days 30    # last 30 days
+    python manage.py backfill_daily_facts --all        # full history (first deploy)
+    python manage.py backfill_daily_facts --all --if-empty  # only sources with no facts yet (container start)
+    python manage.py backfill_daily_facts visit lead   # only some sources
+"""
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from marketing_app.daily_facts import get_fact_sources, rebuild_facts
+from marketing_app.models import DailyFact
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily fact tables used by the analytics pages'
+
+    def add_arguments(self, parser):
+        parser.add_argument('sources', nargs='*', help='Fact sources to rebuild (default: all)')
+        parser.add_argument('--days', type=int, default=7, help='Number of most recent days to rebuild (default: 7)')
+        parser.add_argument('--all', action='store_true', help='Rebuild the full history')
+        parser.add_argument('--if-empty', action='store_true', help='Skip sources that already have facts')
+
+    def handle(self, *args, **options):
+        names = options['sources'] or None
+        try:
+            names = [source.name for source in get_fact_sources(names)]
+        except KeyError as e:
+            raise CommandError(f"Unknown fact source: {e}")
+        if options['if_empty']:
+            loaded = set(DailyFact.objects.filter(source__in=names).values_list('source', flat=True).distinct())
+            names = [name for name in names if name not in loaded]
+            if not names:
+                self.stdout.write("Daily facts already loaded")
+                return
+
+        start_date = None
+        if not options['all']:
+            if options['days'] < 1:
+                raise CommandError("--days must be at least 1")
+            start_date = timezone.localdate() - timedelta(days=options['days'] - 1)
+
+        written = rebuild_facts(names, start_date=start_date)
+        for name, count in written.items():
+            self.stdout.write(f"  {name}: {count} fact row(s)")
+        window = 'full history' if start_date is None else f'since {start_date}'
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt daily facts for {len(written)} source(s), {window}"))
@@ -0,0 +1,52 @@
+"""
+Rebuild or verify the signal-maintained KPI counters
+
+Usage:
+    python manage.py rebuild_kpi_counters            # reconcile drift (run from cron)
+    python manage.py rebuild_kpi_counters --check    # report drift only, exit 1 if any
+    python manage.py rebuild_kpi_counters --reset    # drop and rebuild from scratch
+    python manage.py rebuild_kpi_counters --if-empty # only counters with no stored rows (container start)
+"""
+from django.core.management.base import BaseCommand, CommandError
+from marketing_app.models import KPICounter
+from marketing_app.kpi_counters import get_counter_definitions, rebuild_counters
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the KPI counters from the source tables and report drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument('keys', nargs='*', help='Counter keys to rebuild (default: all)')
+        parser.add_argument('--check', action='store_true', help='Only report drift; exit 1 if any is found')
+        parser.add_argument('--reset', action='store_true', help='Delete the stored counters before rebuilding')
+        parser.add_argument('--if-empty', action='store_true', help='Only build counters that have no stored rows')
+
+    def handle(self, *args, **options):
+        keys = options['keys'] or None
+        try:
+            definitions = get_counter_definitions(keys)
+        except KeyError as e:
+            raise CommandError(f"Unknown counter key: {e}")
+        keys = [d.key for d in definitions]
+        if options['if_empty']:
+            built = set(KPICounter.objects.filter(key__in=keys).values_list('key', flat=True).distinct())
+            keys = [key for key in keys if key not in built]
+            if not keys:
+                self.stdout.write("KPI counters already built")
+                return
+
+        if options['reset'] and not options['check']:
+            deleted, _ = KPICounter.objects.filter(key__in=keys).delete()
+            self.stdout.write(f"Deleted {deleted} stored counter row(s)")
+
+        drift = rebuild_counters(keys, dry_run=options['check'])
+        for key, user_id, stored, actual in drift:
+            scope = 'all users' if user_id == KPICounter.ALL_USERS else f'user {user_id}'
+            self.stdout.write(f"  {key} ({scope}): stored={stored} actual={actual}")
+
+        if options['check']:
+            if drift:
+                raise CommandError(f"{len(drift)} counter row(s) drifted")
+            self.stdout.write(self.style.SUCCESS(f"{len(keys)} counter(s) verified, no drift"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Rebuilt {len(keys)} counter(s), fixed {len(drift)} row(s)"))
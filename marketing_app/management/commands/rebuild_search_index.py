@@ -0,0 +1,36 @@
+"""
+Rebuild the full-text search index for list views
+
+Usage:
+    python manage.py rebuild_search_index              # all kinds
+    python manage.py rebuild_search_index inquiry qc   # only some kinds
+    python manage.py rebuild_search_index --if-empty   # only kinds with no entries yet (container start)
+"""
+from django.core.management.base import BaseCommand, CommandError
+from marketing_app.models import SearchEntry
+from marketing_app.search_index import get_search_kinds, rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search entries from the source tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kinds', nargs='*', help='Search kinds to rebuild (default: all)')
+        parser.add_argument('--if-empty', action='store_true', help='Skip kinds that already have entries')
+
+    def handle(self, *args, **options):
+        try:
+            names = [kind.name for kind in get_search_kinds(options['kinds'] or None)]
+        except KeyError as e:
+            raise CommandError(f"Unknown search kind: {e}")
+        if options['if_empty']:
+            built = set(SearchEntry.objects.filter(kind__in=names).values_list('kind', flat=True).distinct())
+            names = [name for name in names if name not in built]
+            if not names:
+                self.stdout.write("Search index already built")
+                return
+
+        written = rebuild_index(names)
+        for name, count in written.items():
+            self.stdout.write(f"  {name}: {count} entr{'y' if count == 1 else 'ies'}")
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {len(written)} search kind(s)"))
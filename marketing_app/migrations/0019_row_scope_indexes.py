@@ -0,0 +1,38 @@
+# Generated by Django 4.2.7 on 2026-10-17 04:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketing_app', '0018_add_all_hrms_user_fields'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='campaign',
+            name='created_by_user_id',
+            field=models.IntegerField(blank=True, db_index=True, help_text='HRMS User ID', null=True),
+        ),
+        migrations.AlterField(
+            model_name='customer',
+            name='created_by_user_id',
+            field=models.IntegerField(blank=True, db_index=True, help_text='HRMS User ID', null=True),
+        ),
+        migrations.AlterField(
+            model_name='lead',
+            name='assigned_to_user_id',
+            field=models.IntegerField(blank=True, db_index=True, help_text='HRMS User ID', null=True),
+        ),
+        migrations.AlterField(
+            model_name='region',
+            name='manager_user_id',
+            field=models.IntegerField(blank=True, db_index=True, help_text='HRMS User ID', null=True),
+        ),
+        migrations.AlterField(
+            model_name='visit',
+            name='assigned_to_user_id',
+            field=models.IntegerField(blank=True, db_index=True, help_text='HRMS User ID', null=True),
+        ),
+    ]
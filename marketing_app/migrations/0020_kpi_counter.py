@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-17 04:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketing_app', '0019_row_scope_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KPICounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(help_text="Counter key, e.g. 'leads.active'", max_length=100)),
+                ('user_id', models.IntegerField(default=0, help_text='HRMS User ID the count is scoped to (0 = all users)')),
+                ('value', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'KPI Counter',
+                'verbose_name_plural': 'KPI Counters',
+                'unique_together': {('key', 'user_id')},
+            },
+        ),
+    ]
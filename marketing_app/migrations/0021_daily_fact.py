@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-17 04:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketing_app', '0020_kpi_counter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyFact',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(choices=[('quotation', 'Quotation'), ('manufacturing', 'Manufacturing'), ('visit', 'Visit'), ('lead', 'Lead')], max_length=20)),
+                ('date', models.DateField()),
+                ('region_id', models.IntegerField(default=0, help_text='Region ID (0 = no region)')),
+                ('user_id', models.IntegerField(default=0, help_text='HRMS User ID (0 = unassigned)')),
+                ('status', models.CharField(max_length=20)),
+                ('row_count', models.IntegerField(default=0)),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+            options={
+                'verbose_name': 'Daily Fact',
+                'verbose_name_plural': 'Daily Facts',
+                'unique_together': {('source', 'date', 'region_id', 'user_id', 'status')},
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-17 04:36
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketing_app', '0021_daily_fact'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivityEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_type', models.CharField(help_text="e.g. 'quotation.created', 'visit.completed'", max_length=50)),
+                ('object_type', models.CharField(help_text='Model name of the source row', max_length=50)),
+                ('object_id', models.BigIntegerField()),
+                ('title', models.CharField(max_length=255)),
+                ('description', models.CharField(blank=True, max_length=500)),
+                ('status', models.CharField(blank=True, max_length=50)),
+                ('icon', models.CharField(blank=True, max_length=30)),
+                ('color', models.CharField(blank=True, max_length=20)),
+                ('user_id', models.IntegerField(blank=True, help_text='HRMS User ID', null=True)),
+                ('user_name', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Activity Event',
+                'verbose_name_plural': 'Activity Events',
+                'ordering': ['-created_at', '-id'],
+                'indexes': [models.Index(fields=['created_at', 'id'], name='activity_time_idx'), models.Index(fields=['user_id', 'created_at', 'id'], name='activity_user_time_idx')],
+            },
+        ),
+    ]
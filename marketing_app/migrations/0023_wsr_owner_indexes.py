@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-17 04:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketing_app', '0022_activity_event'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='callingdetails',
+            index=models.Index(fields=['created_by_user_id', 'created_at'], name='calling_details_owner_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dsr',
+            index=models.Index(fields=['created_by_user_id', 'created_at'], name='dsr_owner_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='hotorders',
+            index=models.Index(fields=['created_by_user_id', 'created_at'], name='hot_orders_owner_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='postatus',
+            index=models.Index(fields=['created_by_user_id', 'created_at'], name='po_status_owner_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='weeklysummary',
+            index=models.Index(fields=['created_by_user_id', 'created_at'], name='weekly_summary_owner_idx'),
+        ),
+    ]
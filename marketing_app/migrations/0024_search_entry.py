@@ -0,0 +1,79 @@
+# Generated by Django 4.2.7 on 2026-10-17 04:42
+
+from django.db import migrations, models
+
+SQLITE_FORWARD = [
+    # External-content FTS5 table over marketing_app_searchentry.body; the
+    # trigram tokenizer keeps substring search ("icontains") semantics
+    """CREATE VIRTUAL TABLE marketing_app_searchentry_fts USING fts5(
+        body, content='marketing_app_searchentry', content_rowid='id', tokenize='trigram'
+    )""",
+    """CREATE TRIGGER marketing_app_searchentry_ai AFTER INSERT ON marketing_app_searchentry BEGIN
+        INSERT INTO marketing_app_searchentry_fts(rowid, body) VALUES (new.id, new.body);
+    END""",
+    """CREATE TRIGGER marketing_app_searchentry_ad AFTER DELETE ON marketing_app_searchentry BEGIN
+        INSERT INTO marketing_app_searchentry_fts(marketing_app_searchentry_fts, rowid, body)
+        VALUES ('delete', old.id, old.body);
+    END""",
+    """CREATE TRIGGER marketing_app_searchentry_au AFTER UPDATE ON marketing_app_searchentry BEGIN
+        INSERT INTO marketing_app_searchentry_fts(marketing_app_searchentry_fts, rowid, body)
+        VALUES ('delete', old.id, old.body);
+        INSERT INTO marketing_app_searchentry_fts(rowid, body) VALUES (new.id, new.body);
+    END""",
+]
+
+SQLITE_REVERSE = [
+    "DROP TRIGGER IF EXISTS marketing_app_searchentry_au",
+    "DROP TRIGGER IF EXISTS marketing_app_searchentry_ad",
+    "DROP TRIGGER IF EXISTS marketing_app_searchentry_ai",
+    "DROP TABLE IF EXISTS marketing_app_searchentry_fts",
+]
+
+POSTGRES_FORWARD = [
+    # Matches the expression Django emits for SearchVector('body', config='simple')
+    """CREATE INDEX marketing_app_searchentry_body_gin ON marketing_app_searchentry
+        USING GIN (to_tsvector('simple'::regconfig, COALESCE(body, '')))""",
+]
+
+POSTGRES_REVERSE = [
+    "DROP INDEX IF EXISTS marketing_app_searchentry_body_gin",
+]
+
+
+def _run(schema_editor, statements):
+    for statement in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+def create_search_backend(apps, schema_editor):
+    _run(schema_editor, {'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRES_FORWARD})
+
+
+def drop_search_backend(apps, schema_editor):
+    _run(schema_editor, {'sqlite': SQLITE_REVERSE, 'postgresql': POSTGRES_REVERSE})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketing_app', '0023_wsr_owner_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(help_text="Search kind, e.g. 'lead', 'inquiry'", max_length=30)),
+                ('object_id', models.BigIntegerField()),
+                ('body', models.TextField(blank=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Search Entry',
+                'verbose_name_plural': 'Search Entries',
+                'unique_together': {('kind', 'object_id')},
+            },
+        ),
+        migrations.RunPython(create_search_backend, drop_search_backend),
+    ]
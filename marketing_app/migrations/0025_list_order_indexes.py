@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-17 04:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketing_app', '0024_search_entry'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='followupstatus',
+            index=models.Index(fields=['-follow_up_date', '-created_at'], name='follow_up_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inquirylog',
+            index=models.Index(fields=['-enquiry_date', '-created_at'], name='inquiry_log_order_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.7 on 2026-10-17 05:01
+
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketing_app', '0025_list_order_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(django.db.models.functions.text.Lower('name'), name='customer_name_prefix_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='workorder',
+            index=models.Index(django.db.models.functions.text.Lower('work_order_number'), name='work_order_number_prefix_idx'),
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models.functions import Lower
 from django.contrib.auth.models import User
 from django.utils import timezone
 from django.core.validators import MinValueValidator, MaxValueValidator
@@ -32,7 +33,7 @@ class Campaign(models.Model):
     target_audience = models.TextField(blank=True)
     goals = models.TextField(blank=True)
     # HRMS User Information (replaces ForeignKey to User)
-    created_by_user_id = models.IntegerField(null=True, blank=True, help_text="HRMS User ID")
+    created_by_user_id = models.IntegerField(null=True, blank=True, db_index=True, help_text="HRMS User ID")
     created_by_username = models.CharField(max_length=150, blank=True, help_text="HRMS Username")
     created_by_email = models.EmailField(blank=True, help_text="HRMS User Email")
     created_by_full_name = models.CharField(max_length=255, blank=True, help_text="HRMS User Full Name")
@@ -86,7 +87,7 @@ class Lead(models.Model):
     score = models.IntegerField(default=0)
     notes = models.TextField(blank=True)
     # HRMS User Information (replaces ForeignKey to User)
-    assigned_to_user_id = models.IntegerField(null=True, blank=True, help_text="HRMS User ID")
+    assigned_to_user_id = models.IntegerField(null=True, blank=True, db_index=True, help_text="HRMS User ID")
     assigned_to_username = models.CharField(max_length=150, blank=True, help_text="HRMS Username")
     assigned_to_email = models.EmailField(blank=True, help_text="HRMS User Email")
     assigned_to_full_name = models.CharField(max_length=255, blank=True, help_text="HRMS User Full Name")
@@ -150,7 +151,7 @@ class Region(models.Model):
     name = models.CharField(max_length=50, unique=True)
     description = models.TextField(blank=True)
     # HRMS User Information (replaces ForeignKey to User)
-    manager_user_id = models.IntegerField(null=True, blank=True, help_text="HRMS User ID")
+    manager_user_id = models.IntegerField(null=True, blank=True, db_index=True, help_text="HRMS User ID")
     manager_username = models.CharField(max_length=150, blank=True, help_text="HRMS Username")
     manager_email = models.EmailField(blank=True, help_text="HRMS User Email")
     manager_full_name = models.CharField(max_length=255, blank=True, help_text="HRMS User Full Name")
@@ -178,7 +179,7 @@ class Customer(models.Model):
     phone = models.CharField(max_length=20)
     region = models.ForeignKey(Region, on_delete=models.CASCADE)
     # HRMS User Information (replaces ForeignKey to User)
-    created_by_user_id = models.IntegerField(null=True, blank=True, help_text="HRMS User ID")
+    created_by_user_id = models.IntegerField(null=True, blank=True, db_index=True, help_text="HRMS User ID")
     created_by_username = models.CharField(max_length=150, blank=True, help_text="HRMS Username")
     created_by_email = models.EmailField(blank=True, help_text="HRMS User Email")
     created_by_full_name = models.CharField(max_length=255, blank=True, help_text="HRMS User Full Name")
@@ -187,6 +188,10 @@ class Customer(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    class Meta:
+        # Serves case-insensitive prefix lookups from the typeahead endpoints
+        indexes = [models.Index(Lower('name'), name='customer_name_prefix_idx')]
+    
     def __str__(self):
         return self.name
     
@@ -252,7 +257,7 @@ class Visit(models.Model):
     outcome = models.TextField(blank=True)
     next_follow_up_date = models.DateTimeField(null=True, blank=True)
     # HRMS User Information (replaces ForeignKey to User)
-    assigned_to_user_id = models.IntegerField(null=True, blank=True, help_text="HRMS User ID")
+    assigned_to_user_id = models.IntegerField(null=True, blank=True, db_index=True, help_text="HRMS User ID")
     assigned_to_username = models.CharField(max_length=150, blank=True, help_text="HRMS Username")
     assigned_to_email = models.EmailField(blank=True, help_text="HRMS User Email")
     assigned_to_full_name = models.CharField(max_length=255, blank=True, help_text="HRMS User Full Name")
@@ -757,6 +762,9 @@ class WorkOrder(models.Model):
     notes = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
+    class Meta:
+        indexes = [models.Index(Lower('work_order_number'), name='work_order_number_prefix_idx')]
+    
     def __str__(self):
         return f"{self.work_order_number} - {self.purchase_order.po_number}"
 
@@ -1233,6 +1241,8 @@ class InquiryLog(models.Model):
     
     class Meta:
         ordering = ['-enquiry_date', '-created_at']
+        # Serves list pages seeking on the ordering keys
+        indexes = [models.Index(fields=['-enquiry_date', '-created_at'], name='inquiry_log_order_idx')]
         verbose_name = "Inquiry Log"
         verbose_name_plural = "Inquiry Logs"
     
@@ -1315,6 +1325,7 @@ class FollowUpStatus(models.Model):
     
     class Meta:
         ordering = ['-follow_up_date', '-created_at']
+        indexes = [models.Index(fields=['-follow_up_date', '-created_at'], name='follow_up_order_idx')]
         verbose_name = "Follow-Up Status"
         verbose_name_plural = "Follow-Up Status"
     
@@ -1820,6 +1831,8 @@ class POStatus(models.Model):
     
     class Meta:
         ordering = ['-po_date', '-created_at']
+        # Per-owner counts and recent rows (created_by_user_id = ? ORDER BY created_at)
+        indexes = [models.Index(fields=['created_by_user_id', 'created_at'], name='po_status_owner_idx')]
         verbose_name = "PO Status"
         verbose_name_plural = "PO Status"
     
@@ -2040,6 +2053,7 @@ class WeeklySummary(models.Model):
     
     class Meta:
         ordering = ['-week_no', 'region']
+        indexes = [models.Index(fields=['created_by_user_id', 'created_at'], name='weekly_summary_owner_idx')]
         verbose_name = "Weekly Summary"
         verbose_name_plural = "Weekly Summaries"
     
@@ -2072,6 +2086,7 @@ class CallingDetails(models.Model):
     
     class Meta:
         ordering = ['-week_no', 'region']
+        indexes = [models.Index(fields=['created_by_user_id', 'created_at'], name='calling_details_owner_idx')]
         verbose_name = "Calling Detail"
         verbose_name_plural = "Calling Details"
     
@@ -2125,6 +2140,7 @@ class HotOrders(models.Model):
     
     class Meta:
         ordering = ['-week_no', 'case_number']
+        indexes = [models.Index(fields=['created_by_user_id', 'created_at'], name='hot_orders_owner_idx')]
         verbose_name = "Hot Order"
         verbose_name_plural = "Hot Orders"
     
@@ -2281,8 +2297,108 @@ class DSR(models.Model):
     
     class Meta:
         ordering = ['-week_no', 'team', 'region']
+        indexes = [models.Index(fields=['created_by_user_id', 'created_at'], name='dsr_owner_idx')]
         verbose_name = "DSR"
         verbose_name_plural = "DSRs"
     
     def __str__(self):
         return f"Week {self.week_no} - {self.get_team_display()} - {self.person}"
+
+
+class KPICounter(models.Model):
+    """Signal-maintained dashboard counter (see kpi_counters)"""
+    ALL_USERS = 0
+    
+    key = models.CharField(max_length=100, help_text="Counter key, e.g. 'leads.active'")
+    user_id = models.IntegerField(default=ALL_USERS, help_text="HRMS User ID the count is scoped to (0 = all users)")
+    value = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ['key', 'user_id']
+        verbose_name = "KPI Counter"
+        verbose_name_plural = "KPI Counters"
+    
+    def __str__(self):
+        return f"{self.key} [{self.user_id}] = {self.value}"
+
+
+class DailyFact(models.Model):
+    """Pre-aggregated daily rows per source model (see daily_facts)"""
+    NO_REGION = 0
+    NO_USER = 0
+    
+    SOURCE_CHOICES = [
+        ('quotation', 'Quotation'),
+        ('manufacturing', 'Manufacturing'),
+        ('visit', 'Visit'),
+        ('lead', 'Lead'),
+    ]
+    
+    source = models.CharField(max_length=20, choices=SOURCE_CHOICES)
+    date = models.DateField()
+    region_id = models.IntegerField(default=NO_REGION, help_text="Region ID (0 = no region)")
+    user_id = models.IntegerField(default=NO_USER, help_text="HRMS User ID (0 = unassigned)")
+    status = models.CharField(max_length=20)
+    row_count = models.IntegerField(default=0)
+    amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    
+    class Meta:
+        unique_together = ['source', 'date', 'region_id', 'user_id', 'status']
+        verbose_name = "Daily Fact"
+        verbose_name_plural = "Daily Facts"
+    
+    def __str__(self):
+        return f"{self.source} {self.date} r{self.region_id} u{self.user_id} {self.status}: {self.row_count}"
+
+
+class ActivityEvent(models.Model):
+    """Append-only activity feed entry, rendered when written (see activity_feed)"""
+    event_type = models.CharField(max_length=50, help_text="e.g. 'quotation.created', 'visit.completed'")
+    object_type = models.CharField(max_length=50, help_text="Model name of the source row")
+    object_id = models.BigIntegerField()
+    title = models.CharField(max_length=255)
+    description = models.CharField(max_length=500, blank=True)
+    status = models.CharField(max_length=50, blank=True)
+    icon = models.CharField(max_length=30, blank=True)
+    color = models.CharField(max_length=20, blank=True)
+    # HRMS user the source row belongs to
+    user_id = models.IntegerField(null=True, blank=True, help_text="HRMS User ID")
+    user_name = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        ordering = ['-created_at', '-id']
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='activity_time_idx'),
+            models.Index(fields=['user_id', 'created_at', 'id'], name='activity_user_time_idx'),
+        ]
+        verbose_name = "Activity Event"
+        verbose_name_plural = "Activity Events"
+    
+    def __str__(self):
+        return f"{self.created_at:%Y-%m-%d %H:%M} {self.title}"
+    
+    @property
+    def type(self):
+        return self.event_type.split('.')[0]
+    
+    @property
+    def time(self):
+        return self.created_at
+
+
+class SearchEntry(models.Model):
+    """Search text for one list row, indexed by the full-text backend (see search_index)"""
+    kind = models.CharField(max_length=30, help_text="Search kind, e.g. 'lead', 'inquiry'")
+    object_id = models.BigIntegerField()
+    body = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ['kind', 'object_id']
+        verbose_name = "Search Entry"
+        verbose_name_plural = "Search Entries"
+    
+    def __str__(self):
+        return f"{self.kind}:{self.object_id}"
@@ -0,0 +1,65 @@
+"""
+Per-owner summaries for the HRMS sheet modules
+
+Sheet rows store their owner in ``created_by_user_id`` (the legacy
+``created_by`` FK is empty for rows created under HRMS auth). Owner queries
+filter on that column and are served by the (created_by_user_id, created_at)
+indexes on the WSR and PO status tables.
+"""
+from .kpi_counters import read_counts, rows_key
+from .models import WeeklySummary, HotOrders, CallingDetails, DSR
+
+# Summary field -> model counted per owner
+WSR_COUNTS = {
+    'weekly_summary_count': WeeklySummary,
+    'hot_orders_count': HotOrders,
+    'calling_details_count': CallingDetails,
+    'dsr_count': DSR,
+}
+
+
+def owned_rows(model, user_id):
+    """
+    Rows of ``model`` created by one HRMS user
+
+    Without an HRMS user id (e.g. a Django-auth session) nothing is owned;
+    filtering on None would match every ownerless row instead.
+    """
+    if user_id is None:
+        return model.objects.none()
+    return model.objects.filter(created_by_user_id=user_id)
+
+
+def owner_counts(user_id, counts):
+    """
+    Row counts per model for one HRMS user, from the row counters
+
+    Args:
+        user_id (int): HRMS user id
+        counts (dict): {name: model}
+
+    Returns:
+        dict: {name: count}
+    """
+    stored = read_counts({
+        rows_key(model): (user_id, owned_rows(model, user_id)) for model in counts.values()
+    })
+    return {name: stored[rows_key(model)] for name, model in counts.items()}
+
+
+def wsr_summary(user_id, recent=5):
+    """
+    WSR counts and recent weekly summaries for one HRMS user
+
+    The four counts are read in one query; recent rows come straight off the
+    owner index.
+
+    Returns:
+        dict: weekly_summary_count, hot_orders_count, calling_details_count,
+        dsr_count and recent_weekly_summaries (newest first)
+    """
+    summary = owner_counts(user_id, WSR_COUNTS)
+    summary['recent_weekly_summaries'] = list(
+        owned_rows(WeeklySummary, user_id).order_by('-created_at')[:recent]
+    )
+    return summary
@@ -1,7 +1,120 @@
 """
 Helper functions to filter querysets based on user permissions
+
+Row scoping is pushed into the queryset as WHERE clauses on indexed
+columns, and is derived from the request's permission snapshot:
+
+- ``marketing.data.view_all`` (or an HRMS superuser) sees every row
+- ``marketing.data.view_region`` sees rows in the regions they manage
+  (Region.manager_user_id), plus their own rows
+- everyone else sees only rows assigned to or created by them
+
+Until HRMS issues the two data.* codes, HRMS_RBAC_ROW_SCOPE stays False and
+every user with a view permission keeps seeing all rows.
 """
-from marketing_app.permissions import check_permission, get_user_permissions
+from django.conf import settings
+from django.db.models import Q
+from marketing_app.models import Campaign, Lead, Customer, Visit, Region
+from marketing_app.hrms_principal import get_principal
+from marketing_app.permissions import get_request_permissions, check_permission, MARKETING_PERMISSIONS
+
+SCOPE_ALL = 'all'
+SCOPE_REGION = 'region'
+SCOPE_OWN = 'own'
+
+# model -> (HRMS user id columns that mark a row as "theirs", path to Region id)
+ROW_SCOPE_FIELDS = {
+    Campaign: (('created_by_user_id',), None),
+    Lead: (('assigned_to_user_id',), None),
+    Customer: (('created_by_user_id',), 'region_id'),
+    Visit: (('assigned_to_user_id',), 'customer__region_id'),
+}
+
+
+class RowScope:
+    """
+    What slice of the data the current user may see
+
+    Built once per request; region ids are only queried when a
+    region-scoped filter is actually applied.
+    """
+    __slots__ = ('level', 'user_id', '_region_ids')
+
+    def __init__(self, level, user_id=None, region_ids=None):
+        self.level = level
+        self.user_id = user_id
+        self._region_ids = region_ids
+
+    @property
+    def region_ids(self):
+        if self._region_ids is None:
+            self._region_ids = list(
+                Region.objects.filter(manager_user_id=self.user_id).values_list('id', flat=True)
+            )
+        return self._region_ids
+
+    def q_for(self, model):
+        """
+        Q object restricting ``model`` to this scope
+
+        Returns:
+            Q: Filter, or None when the scope does not restrict rows
+        """
+        if self.level == SCOPE_ALL:
+            return None
+        owner_fields, region_field = ROW_SCOPE_FIELDS[model]
+        if self.user_id is None:
+            return Q(pk__in=[])
+        q = Q()
+        for field in owner_fields:
+            q |= Q(**{field: self.user_id})
+        if self.level == SCOPE_REGION and region_field and self.region_ids:
+            q |= Q(**{f'{region_field}__in': self.region_ids})
+        return q
+
+
+def get_row_scope(request):
+    """
+    Get the row scope for the request, computed once from the permission snapshot
+
+    Returns:
+        RowScope: Scope for the current user
+    """
+    scope = getattr(request, '_hrms_row_scope', None)
+    if scope is not None:
+        return scope
+
+    principal = get_principal(request)
+    user_id = principal.id if principal is not None else None
+    perms = get_request_permissions(request)
+    if not getattr(settings, 'HRMS_RBAC_ROW_SCOPE', False):
+        scope = RowScope(SCOPE_ALL, user_id)
+    elif (principal is not None and principal.is_superuser) or perms.has(MARKETING_PERMISSIONS['data.view_all']):
+        scope = RowScope(SCOPE_ALL, user_id)
+    elif perms.has(MARKETING_PERMISSIONS['data.view_region']):
+        scope = RowScope(SCOPE_REGION, user_id)
+    else:
+        scope = RowScope(SCOPE_OWN, user_id)
+    request._hrms_row_scope = scope
+    return scope
+
+
+def scope_queryset(request, queryset, view_permission):
+    """
+    Restrict a queryset to the rows the current user may see
+
+    Args:
+        request: Django request object
+        queryset: Queryset of a model listed in ROW_SCOPE_FIELDS
+        view_permission (str): Permission code required to see any rows
+
+    Returns:
+        Filtered queryset
+    """
+    if not get_request_permissions(request).has(view_permission):
+        return queryset.none()
+    q = get_row_scope(request).q_for(queryset.model)
+    return queryset if q is None else queryset.filter(q)
 
 
 def filter_campaigns_by_permission(request, campaigns):
@@ -15,14 +128,7 @@ def filter_campaigns_by_permission(request, campaigns):
     Returns:
         Filtered queryset based on permissions
     """
-    user_perms = get_user_permissions(request)
-    
-    # If user has view permission, return all campaigns
-    if check_permission(request, 'marketing.campaign.view'):
-        return campaigns
-    
-    # Otherwise, return empty queryset
-    return campaigns.none()
+    return scope_queryset(request, campaigns, 'marketing.campaign.view')
 
 
 def filter_leads_by_permission(request, leads):
@@ -36,10 +142,7 @@ def filter_leads_by_permission(request, leads):
     Returns:
         Filtered queryset based on permissions
     """
-    if check_permission(request, 'marketing.lead.view'):
-        return leads
-    
-    return leads.none()
+    return scope_queryset(request, leads, 'marketing.lead.view')
 
 
 def filter_customers_by_permission(request, customers):
@@ -53,10 +156,7 @@ def filter_customers_by_permission(request, customers):
     Returns:
         Filtered queryset based on permissions
     """
-    if check_permission(request, 'marketing.customer.view'):
-        return customers
-    
-    return customers.none()
+    return scope_queryset(request, customers, 'marketing.customer.view')
 
 
 def filter_visits_by_permission(request, visits):
@@ -70,10 +170,7 @@ def filter_visits_by_permission(request, visits):
     Returns:
         Filtered queryset based on permissions
     """
-    if check_permission(request, 'marketing.visit.view'):
-        return visits
-    
-    return visits.none()
+    return scope_queryset(request, visits, 'marketing.visit.view')
 
 
 def can_create_campaign(request):
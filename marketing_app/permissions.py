@@ -1,12 +1,14 @@
 """
 Permission helpers for Marketing App using HRMS RBAC
 """
-from functools import wraps
-from django.shortcuts import redirect
+from functools import wraps, lru_cache
+from django.shortcuts import redirect, render
 from django.contrib import messages
 from django.http import HttpResponseForbidden
 from django.urls import reverse
-from .hrms_rbac import HRMSRBACClient
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from .hrms_rbac import HRMSRBACClient, AsyncHRMSRBACClient, PermissionSnapshot, hrms_circuit_breaker
+from .hrms_cache import permission_cache
 import logging
 
 logger = logging.getLogger(__name__)
@@ -28,10 +30,268 @@ def get_rbac_client(request):
     return client
 
 
+def store_permission_snapshot(request, snapshot, user_id=None):
+    """
+    Store a permission snapshot in the shared permission cache
+    
+    Args:
+        request: Django request object
+        snapshot (PermissionSnapshot): Snapshot to store
+        user_id (int): HRMS user id, so role changes can invalidate it
+    """
+    token = request.session.get('hrms_rbac_token')
+    if snapshot is None or not token:
+        return
+    permission_cache.set_snapshot(token, snapshot, user_id=user_id)
+    # Keep an already-resolved request permission object in step
+    perms = getattr(request, '_hrms_permissions', None)
+    if perms is not None:
+        perms.reset(snapshot)
+
+
+def _cache_user_info(token, user_info):
+    """Cache a user-info response together with the snapshot derived from it"""
+    snapshot = PermissionSnapshot.from_user_info(user_info)
+    permission_cache.set_user_info(token, user_info)
+    permission_cache.set_snapshot(token, snapshot, user_id=(user_info.get('user') or {}).get('id'))
+    return snapshot
+
+
+def get_cached_user_info(request):
+    """
+    Get HRMS user info for the current user, from the shared cache when possible
+    
+    Returns:
+        dict: User info with roles and permissions, or None
+    """
+    token = request.session.get('hrms_rbac_token')
+    if not token:
+        return None
+    
+    user_info = permission_cache.get_user_info(token)
+    if user_info is None:
+        user_info = get_rbac_client(request).get_user_info()
+        if user_info:
+            _cache_user_info(token, user_info)
+    return user_info
+
+
+def load_permission_snapshot(request):
+    """
+    Load the permission snapshot for the current user from the shared cache
+    
+    The snapshot is taken at login and refreshed from HRMS with a single
+    user-info call once it is older than HRMS_RBAC_PERMISSION_TTL. If HRMS
+    is down, a stale snapshot is used for up to HRMS_RBAC_STALE_GRACE more
+    seconds. Prefer get_request_permissions(), which memoizes this per request.
+    
+    Args:
+        request: Django request object
+    
+    Returns:
+        PermissionSnapshot: Current snapshot, or None if it cannot be obtained
+    """
+    token = request.session.get('hrms_rbac_token')
+    if not token:
+        return None
+    
+    snapshot = permission_cache.get_snapshot(token)
+    if snapshot is not None and snapshot.is_fresh():
+        return snapshot
+    
+    user_info = get_rbac_client(request).get_user_info()
+    return _refreshed_snapshot(token, snapshot, user_info)
+
+
+async def aload_permission_snapshot(request):
+    """
+    Async version of load_permission_snapshot for ASGI views
+    
+    Session and cache access run in a thread; the HRMS refresh goes
+    through AsyncHRMSRBACClient so only this coroutine waits on it.
+    """
+    token = await sync_to_async(request.session.get)('hrms_rbac_token')
+    if not token:
+        return None
+    
+    snapshot = await sync_to_async(permission_cache.get_snapshot)(token)
+    if snapshot is not None and snapshot.is_fresh():
+        return snapshot
+    
+    client = AsyncHRMSRBACClient()
+    client.token = token
+    user_info = await client.get_user_info()
+    return await sync_to_async(_refreshed_snapshot)(token, snapshot, user_info)
+
+
+def _refreshed_snapshot(token, cached, user_info):
+    """
+    Cache a refreshed snapshot, or fall back to the cached one during an outage
+    """
+    refreshed = _cache_user_info(token, user_info) if user_info else None
+    if refreshed is None:
+        # During an HRMS outage keep serving the last-known permissions for a bounded grace period
+        if cached is not None and hrms_circuit_breaker.is_degraded and cached.is_usable_stale():
+            logger.warning(f"HRMS unavailable; using permission snapshot {int(cached.age)}s old")
+            return cached
+        logger.warning("Could not refresh HRMS permission snapshot")
+        return None
+    
+    return refreshed
+
+
+_UNRESOLVED = object()
+
+
+class RequestPermissions:
+    """
+    Lazily resolved, request-memoized view of the current user's permissions
+    
+    Nothing is loaded until the first check; the snapshot and every answer
+    are then reused for the rest of the request, so views, template tags,
+    filters and the context processor share at most one HRMS call.
+    
+    Usage:
+        perms = get_request_permissions(request)
+        if 'marketing.lead.edit' in perms:
+            ...
+    """
+    def __init__(self, request):
+        self._request = request
+        self._snapshot = _UNRESOLVED
+        self._results = {}
+    
+    def reset(self, snapshot=_UNRESOLVED):
+        self._snapshot = snapshot
+        self._results = {}
+    
+    @property
+    def snapshot(self):
+        if self._snapshot is _UNRESOLVED:
+            self._snapshot = load_permission_snapshot(self._request)
+        return self._snapshot
+    
+    def has(self, permission_code):
+        if permission_code not in self._results:
+            self._results.update(self.check_many([permission_code]))
+        return self._results[permission_code]
+    
+    def check_many(self, permission_codes):
+        """
+        Check several permissions, resolving unknown ones in one batch
+        
+        Returns:
+            dict: Permission code -> bool mapping
+        """
+        missing = [perm for perm in permission_codes if perm not in self._results]
+        if missing:
+            self._results.update(self._resolve(missing))
+        return {perm: self._results[perm] for perm in permission_codes}
+    
+    def _resolve(self, permission_codes):
+        client = get_rbac_client(self._request)
+        if not client:
+            logger.warning(f"No HRMS token found for permission check: {', '.join(permission_codes)}")
+            return {perm: False for perm in permission_codes}
+        
+        snapshot = self.snapshot
+        if snapshot is not None:
+            return snapshot.check_many(permission_codes)
+        
+        # No snapshot available: fall back to a single live batch check
+        try:
+            results = client.check_multiple_permissions(permission_codes)
+        except Exception as e:
+            logger.error(f"Permission check error for {permission_codes}: {str(e)}")
+            results = {}
+        # On API error, default to False (deny access) for security
+        return {perm: bool(results.get(perm, False)) for perm in permission_codes}
+    
+    async def asnapshot(self):
+        if self._snapshot is _UNRESOLVED:
+            self._snapshot = await aload_permission_snapshot(self._request)
+        return self._snapshot
+    
+    async def ahas(self, permission_code):
+        results = await self.acheck_many([permission_code])
+        return results[permission_code]
+    
+    async def acheck_many(self, permission_codes):
+        """Async version of check_many for ASGI views"""
+        missing = [perm for perm in permission_codes if perm not in self._results]
+        if missing:
+            self._results.update(await self._aresolve(missing))
+        return {perm: self._results[perm] for perm in permission_codes}
+    
+    async def _aresolve(self, permission_codes):
+        token = await sync_to_async(self._request.session.get)('hrms_rbac_token')
+        if not token:
+            logger.warning(f"No HRMS token found for permission check: {', '.join(permission_codes)}")
+            return {perm: False for perm in permission_codes}
+        
+        snapshot = await self.asnapshot()
+        if snapshot is not None:
+            return snapshot.check_many(permission_codes)
+        
+        client = AsyncHRMSRBACClient()
+        client.token = token
+        try:
+            results = await client.check_multiple_permissions(permission_codes)
+        except Exception as e:
+            logger.error(f"Permission check error for {permission_codes}: {str(e)}")
+            results = {}
+        return {perm: bool(results.get(perm, False)) for perm in permission_codes}
+    
+    def __contains__(self, permission_code):
+        return self.has(permission_code)
+    
+    def __getitem__(self, permission_code):
+        # Accept short MARKETING_PERMISSIONS keys such as 'lead.edit'
+        return self.has(MARKETING_PERMISSIONS.get(permission_code, permission_code))
+    
+    def __iter__(self):
+        snapshot = self.snapshot
+        return iter(sorted(snapshot.codes) if snapshot is not None else [])
+    
+    def __len__(self):
+        snapshot = self.snapshot
+        return len(snapshot.codes) if snapshot is not None else 0
+
+
+def get_request_permissions(request):
+    """
+    Get the request-scoped permission object, creating it on first use
+    
+    Args:
+        request: Django request object
+    
+    Returns:
+        RequestPermissions: Lazily resolved permissions for this request
+    """
+    perms = getattr(request, '_hrms_permissions', None)
+    if perms is None:
+        perms = RequestPermissions(request)
+        request._hrms_permissions = perms
+    return perms
+
+
+def get_permission_snapshot(request):
+    """
+    Get the permission snapshot for the current user (memoized per request)
+    
+    Returns:
+        PermissionSnapshot: Current snapshot, or None if it cannot be obtained
+    """
+    return get_request_permissions(request).snapshot
+
+
 def check_permission(request, permission_code):
     """
     Check if user has specific permission via HRMS RBAC
     
+    Answered from the permission snapshot; falls back to a live HRMS call
+    only when no snapshot is available. Results are memoized per request.
+    
     Args:
         request: Django request object
         permission_code (str): Permission code to check (e.g., 'marketing.campaign.view')
@@ -39,22 +299,12 @@ def check_permission(request, permission_code):
     Returns:
         bool: True if user has permission, False otherwise
     """
-    client = get_rbac_client(request)
-    if not client:
-        logger.warning(f"No HRMS token found for permission check: {permission_code}")
-        return False
-    
-    try:
-        return client.check_permission(permission_code)
-    except Exception as e:
-        error_msg = str(e)
-        # Check if it's a connection error
-        if 'Connection refused' in error_msg or 'Max retries' in error_msg:
-            logger.error(f"HRMS server unavailable for permission check {permission_code}: {error_msg}")
-        else:
-            logger.error(f"Permission check error for {permission_code}: {error_msg}")
-        # On API error, default to False (deny access) for security
-        return False
+    return get_request_permissions(request).has(permission_code)
+
+
+async def acheck_permission(request, permission_code):
+    """Async version of check_permission for ASGI views"""
+    return await get_request_permissions(request).ahas(permission_code)
 
 
 def check_multiple_permissions(request, permission_codes):
@@ -68,11 +318,12 @@ def check_multiple_permissions(request, permission_codes):
     Returns:
         dict: Permission code -> bool mapping
     """
-    client = get_rbac_client(request)
-    if not client:
-        return {perm: False for perm in permission_codes}
-    
-    return client.check_multiple_permissions(permission_codes)
+    return get_request_permissions(request).check_many(permission_codes)
+
+
+async def acheck_multiple_permissions(request, permission_codes):
+    """Async version of check_multiple_permissions for ASGI views"""
+    return await get_request_permissions(request).acheck_many(permission_codes)
 
 
 def get_user_permissions(request):
@@ -85,40 +336,153 @@ def get_user_permissions(request):
     Returns:
         list: List of permission codes user has
     """
-    client = get_rbac_client(request)
-    if not client:
-        return []
+    return list(get_request_permissions(request))
+
+
+def declare_permissions(*permission_codes):
+    """
+    Decorator declaring every permission a view and its template will check
     
-    user_info = client.get_user_info()
-    if user_info and user_info.get('success'):
-        permissions = user_info.get('permissions', [])
-        return [perm.get('code') for perm in permissions if perm.get('code')]
+    All declared codes are resolved in one batch before the view runs
+    (a single /check-permissions/ call at most) and the view gets them
+    as request.perms, where lookups are plain dict hits. Place it above
+    require_permission so the required code joins the same batch.
     
-    return []
+    Usage:
+        @hrms_login_required
+        @declare_permissions('campaign.view', 'campaign.create', 'campaign.edit')
+        @require_permission(MARKETING_PERMISSIONS['campaign.view'])
+        def campaign_list(request):
+            can_create = request.perms['campaign.create']
+    
+    Args:
+        permission_codes (str): Full codes or MARKETING_PERMISSIONS keys
+    """
+    def decorator(view_func):
+        codes = tuple(MARKETING_PERMISSIONS.get(code, code) for code in permission_codes)
+        
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def async_wrapper(request, *args, **kwargs):
+                perms = get_request_permissions(request)
+                if await sync_to_async(request.session.get)('hrms_rbac_token'):
+                    await perms.acheck_many(codes)
+                request.perms = perms
+                return await view_func(request, *args, **kwargs)
+            async_wrapper.declared_permissions = codes
+            return async_wrapper
+        
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            perms = get_request_permissions(request)
+            if request.session.get('hrms_rbac_token'):
+                perms.check_many(codes)
+            request.perms = perms
+            return view_func(request, *args, **kwargs)
+        wrapper.declared_permissions = codes
+        return wrapper
+    return decorator
+
+
+# Landing pages in preference order: (permission code, URL name, label)
+ACCESSIBLE_PAGES = [
+    ('marketing.campaign.view', 'marketing:dashboard', 'Dashboard'),
+    ('marketing.customer.view', 'marketing:customer_list', 'Customers'),
+    ('marketing.lead.view', 'marketing:lead_list', 'Leads'),
+    ('marketing.visit.view', 'marketing:visit_list', 'Visits'),
+    ('marketing.reports.view', 'marketing:campaign_analytics', 'Reports'),
+]
+
+
+@lru_cache(maxsize=256)
+def _accessible_pages_for(codes):
+    """Accessible pages for a permission set; shared by every user with the same set"""
+    return tuple((url_name, label) for perm, url_name, label in ACCESSIBLE_PAGES if perm in codes)
 
 
 def get_user_accessible_pages(request):
     """
     Get a list of pages the user has permission to access
     Returns URL name or path that user can access
+    
+    Computed from the permission snapshot without any extra HRMS calls.
     """
-    user_perms = get_user_permissions(request)
+    perms = get_request_permissions(request)
+    snapshot = perms.snapshot
+    if snapshot is not None:
+        return list(_accessible_pages_for(snapshot.codes))
     
-    # Map permissions to page URLs
-    accessible_pages = []
+    # No snapshot: resolve every landing permission in one batch
+    granted = perms.check_many([perm for perm, _, _ in ACCESSIBLE_PAGES])
+    return [(url_name, label) for perm, url_name, label in ACCESSIBLE_PAGES if granted[perm]]
+
+
+def _deny_access(request, view_func, permission_codes, redirect_url, raise_exception):
+    """
+    Build the response for a denied permission check
+    
+    Redirects to redirect_url, or to the first page the user can access,
+    or renders the 403 page.
+    """
+    permission_label = ', '.join(permission_codes)
+    
+    def render_403():
+        return render(request, 'marketing_app/403_permission_denied.html', {
+            'permission': permission_label,
+            'view_name': view_func.__name__
+        }, status=403)
     
-    if check_permission(request, 'marketing.campaign.view'):
-        accessible_pages.append(('marketing:dashboard', 'Dashboard'))
-    if check_permission(request, 'marketing.customer.view'):
-        accessible_pages.append(('marketing:customer_list', 'Customers'))
-    if check_permission(request, 'marketing.lead.view'):
-        accessible_pages.append(('marketing:lead_list', 'Leads'))
-    if check_permission(request, 'marketing.visit.view'):
-        accessible_pages.append(('marketing:visit_list', 'Visits'))
-    if check_permission(request, 'marketing.reports.view'):
-        accessible_pages.append(('marketing:campaign_analytics', 'Reports'))
+    if raise_exception:
+        return render_403()
     
-    return accessible_pages
+    plural = 's' if len(permission_codes) > 1 else ''
+    messages.error(
+        request,
+        f"You don't have permission to access this resource. "
+        f"Required permission{plural}: {permission_label}"
+    )
+    
+    if redirect_url:
+        return redirect(redirect_url)
+    
+    # Try to find a page user has permission for
+    accessible_pages = get_user_accessible_pages(request)
+    if accessible_pages:
+        # Redirect to first accessible page
+        return redirect(accessible_pages[0][0])
+    
+    # No accessible pages, show 403 page
+    return render_403()
+
+
+def _async_permission_guard(view_func, permission_codes, require_all, redirect_url, raise_exception):
+    """
+    Wrap an async view with the same checks as the require_* decorators
+    """
+    @wraps(view_func)
+    async def wrapper(request, *args, **kwargs):
+        token = await sync_to_async(request.session.get)('hrms_rbac_token')
+        if not token:
+            return redirect(f"{reverse('hrms_login')}?next={request.path}")
+        
+        try:
+            permissions = await acheck_multiple_permissions(request, permission_codes)
+            allowed = all(permissions.values()) if require_all else any(permissions.values())
+        except Exception as e:
+            logger.error(f"Permission check error: {str(e)}")
+            allowed = False
+        
+        if not allowed:
+            logger.warning(
+                f"Permission denied: User tried to access "
+                f"{view_func.__name__} without {', '.join(permission_codes)}"
+            )
+            return await sync_to_async(_deny_access)(
+                request, view_func, permission_codes, redirect_url, raise_exception
+            )
+        
+        return await view_func(request, *args, **kwargs)
+    return wrapper
 
 
 def require_permission(permission_code, redirect_url=None, raise_exception=False):
@@ -134,8 +498,13 @@ def require_permission(permission_code, redirect_url=None, raise_exception=False
         permission_code (str): Permission code required
         redirect_url (str): URL to redirect if permission denied (default: show 403 page or redirect to accessible page)
         raise_exception (bool): If True, raise 403 instead of redirecting
+    
+    Async views get an async wrapper that never blocks the event loop.
     """
     def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            return _async_permission_guard(view_func, [permission_code], True, redirect_url, raise_exception)
+        
         @wraps(view_func)
         def wrapper(request, *args, **kwargs):
             # Check if user has HRMS token
@@ -156,35 +525,7 @@ def require_permission(permission_code, redirect_url=None, raise_exception=False
                     f"Permission denied: User tried to access "
                     f"{view_func.__name__} without {permission_code}"
                 )
-                
-                if raise_exception:
-                    from django.shortcuts import render
-                    return render(request, 'marketing_app/403_permission_denied.html', {
-                        'permission': permission_code,
-                        'view_name': view_func.__name__
-                    }, status=403)
-                
-                messages.error(
-                    request,
-                    f"You don't have permission to access this resource. "
-                    f"Required permission: {permission_code}"
-                )
-                
-                if redirect_url:
-                    return redirect(redirect_url)
-                
-                # Try to find a page user has permission for
-                accessible_pages = get_user_accessible_pages(request)
-                if accessible_pages:
-                    # Redirect to first accessible page
-                    return redirect(accessible_pages[0][0])
-                else:
-                    # No accessible pages, show 403 page
-                    from django.shortcuts import render
-                    return render(request, 'marketing_app/403_permission_denied.html', {
-                        'permission': permission_code,
-                        'view_name': view_func.__name__
-                    }, status=403)
+                return _deny_access(request, view_func, [permission_code], redirect_url, raise_exception)
             
             return view_func(request, *args, **kwargs)
         return wrapper
@@ -201,6 +542,9 @@ def require_any_permission(permission_codes, redirect_url=None, raise_exception=
             pass
     """
     def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            return _async_permission_guard(view_func, permission_codes, False, redirect_url, raise_exception)
+        
         @wraps(view_func)
         def wrapper(request, *args, **kwargs):
             token = request.session.get('hrms_rbac_token')
@@ -219,33 +563,7 @@ def require_any_permission(permission_codes, redirect_url=None, raise_exception=
                     f"Permission denied: User tried to access "
                     f"{view_func.__name__} without any of {permission_codes}"
                 )
-                
-                if raise_exception:
-                    from django.shortcuts import render
-                    return render(request, 'marketing_app/403_permission_denied.html', {
-                        'permission': ', '.join(permission_codes),
-                        'view_name': view_func.__name__
-                    }, status=403)
-                
-                messages.error(
-                    request,
-                    f"You don't have permission to access this resource. "
-                    f"Required permissions: {', '.join(permission_codes)}"
-                )
-                
-                if redirect_url:
-                    return redirect(redirect_url)
-                
-                # Try to find a page user has permission for
-                accessible_pages = get_user_accessible_pages(request)
-                if accessible_pages:
-                    return redirect(accessible_pages[0][0])
-                else:
-                    from django.shortcuts import render
-                    return render(request, 'marketing_app/403_permission_denied.html', {
-                        'permission': ', '.join(permission_codes),
-                        'view_name': view_func.__name__
-                    }, status=403)
+                return _deny_access(request, view_func, permission_codes, redirect_url, raise_exception)
             
             return view_func(request, *args, **kwargs)
         return wrapper
@@ -262,6 +580,9 @@ def require_all_permissions(permission_codes, redirect_url=None, raise_exception
             pass
     """
     def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            return _async_permission_guard(view_func, permission_codes, True, redirect_url, raise_exception)
+        
         @wraps(view_func)
         def wrapper(request, *args, **kwargs):
             token = request.session.get('hrms_rbac_token')
@@ -280,33 +601,7 @@ def require_all_permissions(permission_codes, redirect_url=None, raise_exception
                     f"Permission denied: User tried to access "
                     f"{view_func.__name__} without all of {permission_codes}"
                 )
-                
-                if raise_exception:
-                    from django.shortcuts import render
-                    return render(request, 'marketing_app/403_permission_denied.html', {
-                        'permission': ', '.join(permission_codes),
-                        'view_name': view_func.__name__
-                    }, status=403)
-                
-                messages.error(
-                    request,
-                    f"You don't have permission to access this resource. "
-                    f"Required permissions: {', '.join(permission_codes)}"
-                )
-                
-                if redirect_url:
-                    return redirect(redirect_url)
-                
-                # Try to find a page user has permission for
-                accessible_pages = get_user_accessible_pages(request)
-                if accessible_pages:
-                    return redirect(accessible_pages[0][0])
-                else:
-                    from django.shortcuts import render
-                    return render(request, 'marketing_app/403_permission_denied.html', {
-                        'permission': ', '.join(permission_codes),
-                        'view_name': view_func.__name__
-                    }, status=403)
+                return _deny_access(request, view_func, permission_codes, redirect_url, raise_exception)
             
             return view_func(request, *args, **kwargs)
         return wrapper
@@ -345,6 +640,10 @@ MARKETING_PERMISSIONS = {
     'reports.view': 'marketing.reports.view',
     'reports.export': 'marketing.reports.export',
     
+    # Row scope (see permission_filters)
+    'data.view_all': 'marketing.data.view_all',
+    'data.view_region': 'marketing.data.view_region',
+    
     # Settings
     'settings.view': 'marketing.settings.view',
     'settings.edit': 'marketing.settings.edit',
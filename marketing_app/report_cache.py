@@ -0,0 +1,79 @@
+"""
+Shared cache for computed report data
+
+Reports are cached in the REPORT_CACHE_ALIAS cache (shared by all workers)
+and dropped once a write to one of the models they are built from commits.
+"""
+import logging
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'report'
+
+_sources = {}
+
+
+def _cache():
+    return caches[getattr(settings, 'REPORT_CACHE_ALIAS', 'default')]
+
+
+def _key(name):
+    return f'{KEY_PREFIX}:{name}'
+
+
+def register_report(name, *models):
+    """
+    Invalidate report ``name`` whenever any of ``models`` is saved or deleted
+
+    Usage:
+        register_report('region_team_rollup', Quotation, Customer, Region)
+    """
+    for model in models:
+        _sources.setdefault(model, set()).add(name)
+        uid = f'report_cache:{model._meta.label}'
+        post_save.connect(_invalidate_for_sender, sender=model, dispatch_uid=uid)
+        post_delete.connect(_invalidate_for_sender, sender=model, dispatch_uid=uid)
+
+
+def get_report(name, builder, timeout=None):
+    """
+    Get a cached report, building and caching it on a miss
+
+    Args:
+        name (str): Report name passed to register_report
+        builder (callable): Computes the report when it is not cached
+        timeout (int): Seconds to keep it (default: REPORT_CACHE_TIMEOUT)
+
+    Returns:
+        The cached or freshly built report
+    """
+    cache = _cache()
+    report = cache.get(_key(name))
+    if report is None:
+        report = builder()
+        if timeout is None:
+            timeout = getattr(settings, 'REPORT_CACHE_TIMEOUT', 300)
+        cache.set(_key(name), report, timeout=timeout)
+    return report
+
+
+def invalidate_report(name):
+    _cache().delete(_key(name))
+
+
+def _invalidate_for_sender(sender, **kwargs):
+    names = _sources.get(sender, ())
+    if not names:
+        return
+
+    def invalidate():
+        _cache().delete_many([_key(name) for name in names])
+        logger.debug(f"Invalidated report cache for {sender.__name__} write: {sorted(names)}")
+
+    # Dropping before commit would let a concurrent request rebuild the
+    # report from pre-commit data and cache it for the full timeout
+    transaction.on_commit(invalidate)
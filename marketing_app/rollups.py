@@ -0,0 +1,323 @@
+"""
+Grouped rollups for analytics pages
+
+Per-user and per-period statistics are computed with one GROUP BY query per
+source model and pivoted in memory, so the number of queries stays fixed no
+matter how many users or periods are reported.
+"""
+from datetime import timedelta
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.db.models import Case, Count, DateField, IntegerField, Max, Q, Sum, Value, When
+from django.db.models.functions import Trunc
+from .kpi_builder import date_range
+from .models import Quotation, Customer, Region
+from .report_cache import get_report, register_report
+
+REGION_TEAM_REPORT = 'region_team_rollup'
+
+
+class RollupUser:
+    """User identity assembled from HRMS ``*_user_id`` columns or a legacy FK"""
+    __slots__ = ('id', 'username', 'full_name', 'email')
+
+    def __init__(self, id=None, username='', full_name='', email=''):
+        self.id = id
+        self.username = username
+        self.full_name = full_name
+        self.email = email
+
+    def get_full_name(self):
+        return self.full_name
+
+    def __str__(self):
+        return self.username
+
+
+class UserRollup:
+    """
+    Per-user counts across several models
+
+    Each source is grouped on its HRMS user id column and its legacy User FK.
+    Rows are merged per user by username, which the HRMS and legacy Django
+    accounts share.
+
+    Users listed in ``users`` get a row even without activity in the window.
+
+    Usage:
+        rollup = UserRollup(users=get_user_model().objects.all())
+        rollup.add('customers_created', customers_qs, 'created_by')
+        rollup.add('visits_conducted', visits_qs, 'assigned_to')
+        for row in rollup.rows():
+            row['user'], row['customers_created'], row['visits_conducted']
+    """
+    def __init__(self, users=None):
+        """
+        Args:
+            users: Optional queryset of Django users to report with zero counts
+                when they have no activity
+        """
+        self.sources = []
+        self.users = users
+
+    def add(self, name, queryset, user_prefix, legacy_field=None):
+        """
+        Args:
+            name (str): Stat name in each output row
+            queryset: Rows to count (already filtered to the reporting window)
+            user_prefix (str): HRMS field prefix, e.g. 'created_by' for created_by_user_id
+            legacy_field (str): Legacy User FK (defaults to ``user_prefix``)
+        """
+        self.sources.append((name, queryset, user_prefix, legacy_field or user_prefix))
+        return self
+
+    def _grouped(self, queryset, prefix, legacy_field):
+        return (queryset
+                .filter(Q(**{f'{prefix}_user_id__isnull': False}) | Q(**{f'{legacy_field}__isnull': False}))
+                .values(f'{prefix}_user_id', f'{legacy_field}_id')
+                .annotate(
+                    n=Count('pk'),
+                    username=Max(f'{prefix}_username'),
+                    full_name=Max(f'{prefix}_full_name'),
+                    email=Max(f'{prefix}_email'),
+                )
+                .order_by())
+
+    def rows(self):
+        """
+        Returns:
+            list: One dict per user with 'user' (RollupUser) and a count per
+            source, busiest users first
+        """
+        names = [name for name, *_ in self.sources]
+        grouped = []
+        legacy_ids = set()
+        for name, queryset, prefix, legacy_field in self.sources:
+            for row in self._grouped(queryset, prefix, legacy_field):
+                grouped.append((name, row[f'{prefix}_user_id'], row[f'{legacy_field}_id'], row))
+                if not row['username'] and row[f'{legacy_field}_id']:
+                    legacy_ids.add(row[f'{legacy_field}_id'])
+
+        legacy_users = {}
+        if legacy_ids:
+            legacy_users = {user.id: user for user in get_user_model().objects.filter(id__in=legacy_ids)}
+
+        pivot = {}
+        for name, hrms_id, legacy_id, row in grouped:
+            user = RollupUser(hrms_id, row['username'] or '', row['full_name'] or '', row['email'] or '')
+            if not user.username and legacy_id in legacy_users:
+                legacy = legacy_users[legacy_id]
+                user = RollupUser(hrms_id, legacy.username, legacy.get_full_name(), legacy.email)
+            if user.username:
+                key = user.username
+            elif hrms_id is not None:
+                key = ('hrms', hrms_id)
+            else:
+                key = ('user', legacy_id)
+            entry = pivot.get(key)
+            if entry is None:
+                entry = pivot[key] = {'user': user, **{stat: 0 for stat in names}}
+            elif entry['user'].id is None and hrms_id is not None:
+                entry['user'] = user
+            entry[name] += row['n']
+
+        if self.users is not None:
+            for legacy in self.users:
+                if legacy.username not in pivot:
+                    user = RollupUser(None, legacy.username, legacy.get_full_name(), legacy.email)
+                    pivot[legacy.username] = {'user': user, **{stat: 0 for stat in names}}
+
+        return sorted(pivot.values(), key=lambda entry: -sum(entry[stat] for stat in names))
+
+
+def period_bucket(model, field, periods):
+    """
+    Expression numbering the period each row's ``field`` falls in
+
+    Args:
+        periods (list): (start date, end date) pairs, both days inclusive
+
+    Returns:
+        Case: Integer index into ``periods`` (NULL outside all of them)
+    """
+    return Case(
+        *[When(date_range(model, field, start, end), then=Value(index))
+          for index, (start, end) in enumerate(periods)],
+        default=None,
+        output_field=IntegerField(),
+    )
+
+
+def rollup_by_period(queryset, field, periods, **aggregates):
+    """
+    Aggregate a queryset per period in one GROUP BY query
+
+    Args:
+        queryset: Rows to aggregate
+        field (str): Date or datetime column that places a row in a period
+        periods (list): (start date, end date) pairs, both days inclusive
+        **aggregates: Aggregate expressions, e.g. orders=Count('pk')
+
+    Returns:
+        list: One dict of aggregate values per period, in ``periods`` order,
+        with 0 for periods that have no rows
+    """
+    model = queryset.model
+    window_start = min(start for start, _ in periods)
+    window_end = max(end for _, end in periods)
+    rows = (queryset
+            .filter(date_range(model, field, window_start, window_end))
+            .annotate(_period=period_bucket(model, field, periods))
+            .values('_period')
+            .annotate(**aggregates)
+            .order_by())
+    by_period = {row.pop('_period'): row for row in rows}
+    return [
+        {name: by_period.get(index, {}).get(name) or 0 for name in aggregates}
+        for index in range(len(periods))
+    ]
+
+
+TIME_SERIES_LABELS = {'month': '%b %Y', 'week': '%d %b', 'day': '%d %b'}
+
+
+def series_buckets(period, start_date, end_date):
+    """
+    Start dates of every calendar bucket touching ``start_date``..``end_date``
+
+    Args:
+        period (str): 'month', 'week' (ISO, Monday start) or 'day'
+
+    Returns:
+        list: Bucket start dates, oldest first
+    """
+    if period == 'month':
+        current = start_date.replace(day=1)
+    elif period == 'week':
+        current = start_date - timedelta(days=start_date.weekday())
+    elif period == 'day':
+        current = start_date
+    else:
+        raise ValueError(f"Unsupported time series period: {period}")
+
+    buckets = []
+    while current <= end_date:
+        buckets.append(current)
+        if period == 'month':
+            current = (current.replace(day=28) + timedelta(days=4)).replace(day=1)
+        else:
+            current += timedelta(days=7 if period == 'week' else 1)
+    return buckets
+
+
+def time_series(queryset, field, period, start_date, end_date, **aggregates):
+    """
+    Chart-ready series of calendar buckets from one Trunc/GROUP BY query
+
+    Args:
+        queryset: Rows to aggregate
+        field (str): Date or datetime column that places a row in a bucket
+        period (str): 'month', 'week' or 'day'
+        start_date (date): First day included (widened to its bucket start)
+        end_date (date): Last day included
+        **aggregates: Aggregate expressions, e.g. customers=Count('pk')
+
+    Returns:
+        list: One dict per bucket, oldest first, with 'period' (bucket start
+        date), 'label' and each aggregate (0 for empty buckets)
+
+    Usage:
+        time_series(Customer.objects.all(), 'created_at', 'month', start, today,
+                    customers=Count('pk'))
+    """
+    buckets = series_buckets(period, start_date, end_date)
+    model = queryset.model
+    rows = (queryset
+            .filter(date_range(model, field, buckets[0], end_date))
+            .annotate(bucket=Trunc(field, period, output_field=DateField()))
+            .values('bucket')
+            .annotate(**aggregates)
+            .order_by())
+    by_bucket = {row.pop('bucket'): row for row in rows}
+    label_format = TIME_SERIES_LABELS[period]
+    return [
+        {
+            'period': bucket,
+            'label': bucket.strftime(label_format),
+            **{name: by_bucket.get(bucket, {}).get(name) or 0 for name in aggregates},
+        }
+        for bucket in buckets
+    ]
+
+
+def _build_region_team_rollup():
+    rows = (Quotation.objects
+            .values('customer__region_id', 'created_by_user_id', 'created_by_id')
+            .annotate(
+                total_sales=Sum('total_amount'),
+                deal_count=Count('id'),
+                last_activity=Max('updated_at'),
+                full_name=Max('created_by_full_name'),
+                email=Max('created_by_email'),
+                legacy_first_name=Max('created_by__first_name'),
+                legacy_last_name=Max('created_by__last_name'),
+                legacy_email=Max('created_by__email'),
+            )
+            .order_by())
+
+    regions = {}
+    for row in rows:
+        region = regions.setdefault(row['customer__region_id'], {
+            'total_sales': Decimal('0'), 'deal_count': 0, 'members': {},
+        })
+        total_sales = row['total_sales'] or Decimal('0')
+        region['total_sales'] += total_sales
+        region['deal_count'] += row['deal_count']
+
+        if row['created_by_user_id'] is not None:
+            member_key = row['created_by_user_id']
+            name = row['full_name']
+            email = row['email']
+        elif row['created_by_id'] is not None:
+            member_key = ('legacy', row['created_by_id'])
+            name = f"{row['legacy_first_name'] or ''} {row['legacy_last_name'] or ''}".strip()
+            email = row['legacy_email']
+        else:
+            continue
+
+        member = region['members'].get(member_key)
+        if member is None:
+            member = region['members'][member_key] = {
+                'id': row['created_by_user_id'] or row['created_by_id'],
+                'name': name or 'Unnamed User',
+                'email': email or '',
+                'total_sales': Decimal('0'),
+                'deal_count': 0,
+                'last_activity': None,
+            }
+        member['total_sales'] += total_sales
+        member['deal_count'] += row['deal_count']
+        if member['last_activity'] is None or row['last_activity'] > member['last_activity']:
+            member['last_activity'] = row['last_activity']
+
+    for region in regions.values():
+        region['members'] = sorted(region['members'].values(), key=lambda m: m['total_sales'], reverse=True)
+    return regions
+
+
+def region_team_rollup():
+    """
+    Quotation totals per region and per creator, from one grouped query
+
+    Cached in the shared report cache and invalidated on Quotation, Customer
+    and Region writes.
+
+    Returns:
+        dict: {region id: {'total_sales', 'deal_count', 'members': [...]}};
+        members (busiest first) carry id, name, email, total_sales,
+        deal_count and last_activity. Regions without quotations are absent.
+    """
+    return get_report(REGION_TEAM_REPORT, _build_region_team_rollup)
+
+
+register_report(REGION_TEAM_REPORT, Quotation, Customer, Region)
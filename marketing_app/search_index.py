@@ -0,0 +1,426 @@
+"""
+Full-text search for list views
+
+Each registered model keeps one SearchEntry row per object holding the text
+of its searchable fields, refreshed on save/delete. The entries are indexed
+by the database's full-text engine:
+
+- SQLite: an FTS5 table (trigram tokenizer) synced by triggers, ranked by bm25
+- PostgreSQL: a GIN index on to_tsvector('simple', body), ranked by ts_rank
+
+List views page through the ranked object ids, so a search costs an index
+lookup plus one primary-key fetch per page however large the table grows.
+The rows a view may show (permissions and list filters) are applied inside
+the index query, before its SEARCH_MAX_RESULTS limit; exports and counts
+filter on the uncapped set of matches instead.
+
+A query is split on whitespace and matches entries holding every term, in
+any order; the icontains fallback matches the query as one substring.
+
+Queries the index cannot answer (terms shorter than three characters) and
+kinds whose index has not been built fall back to icontains filters; fields
+on to-many relations (customer locations) are matched with a correlated
+EXISTS, so the fallback never needs a join plus DISTINCT.
+
+Run ``rebuild_search_index`` after bulk imports; the Docker image builds any
+kind with no entries on start (``--if-empty``).
+"""
+import logging
+import re
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef, Q
+from django.db.models.expressions import RawSQL
+from django.db.models.signals import post_save, post_delete
+from .models import (
+    SearchEntry, Lead, Customer, CustomerLocation, InquiryLog, QCTracking, PaymentFollowUp, PurchaseOrder,
+    Manufacturing,
+)
+
+logger = logging.getLogger(__name__)
+
+MIN_TERM_LENGTH = 3
+
+
+class SearchKind:
+    """The searchable fields of one model"""
+    __slots__ = ('name', 'model', 'fields')
+
+    def __init__(self, name, model, fields):
+        self.name = name
+        self.model = model
+        self.fields = tuple(fields)
+
+    def fallback_q(self, query):
+        """OR of icontains filters over the fields (the pre-index search)"""
+        return _contains_q(self.model, self.fields, query)
+
+    def documents(self, pks=None):
+        """
+        Search text per object, read with one query
+
+        Returns:
+            dict: {pk: body}
+        """
+        rows = self.model._default_manager.all()
+        if pks is not None:
+            rows = rows.filter(pk__in=pks)
+        documents = {}
+        for pk, *values in rows.values_list('pk', *self.fields).order_by().iterator():
+            parts = documents.setdefault(pk, [])
+            parts.extend(str(value) for value in values if value not in (None, '') and str(value) not in parts)
+        return {pk: ' '.join(parts) for pk, parts in documents.items()}
+
+
+def _to_many_hop(model, path):
+    """
+    Split ``path`` at its first to-many relation
+
+    Returns:
+        tuple: (prefix up to and including the relation, rest of the path),
+        or None if the path only follows to-one relations
+    """
+    names = path.split('__')
+    for position, name in enumerate(names[:-1]):
+        field = model._meta.get_field(name)
+        if field.one_to_many or field.many_to_many:
+            return '__'.join(names[:position + 1]), '__'.join(names[position + 1:])
+        model = field.related_model
+    return None
+
+
+def _contains_q(model, paths, query):
+    """
+    OR of icontains filters on ``paths``
+
+    Paths through a to-many relation are matched with one correlated EXISTS
+    per relation, so rows are neither joined nor duplicated.
+    """
+    condition = Q()
+    nested = {}
+    for path in paths:
+        hop = _to_many_hop(model, path)
+        if hop is None:
+            condition |= Q(**{f'{path}__icontains': query})
+        else:
+            nested.setdefault(hop[0], []).append(hop[1])
+    for prefix, rests in nested.items():
+        *outer, name = prefix.split('__')
+        owner = model
+        for step in outer:
+            owner = owner._meta.get_field(step).related_model
+        field = owner._meta.get_field(name)
+        # Reverse relations are filtered through their forward field
+        remote = field.field.name if field.auto_created else field.related_query_name()
+        rows = field.related_model._default_manager.filter(
+            _contains_q(field.related_model, rests, query),
+            **{remote: OuterRef('__'.join([*outer, 'pk']))},
+        )
+        condition |= Q(Exists(rows))
+    return condition
+
+
+_kinds = {}
+_kinds_by_model = {}
+
+
+def register_search(name, model, fields, also_on=None, depends_on=None):
+    """
+    Index ``fields`` of ``model`` for full-text search
+
+    Args:
+        name (str): SearchEntry.kind value
+        model: Model class whose rows are searched
+        fields (iterable): Field lookup paths whose text is indexed
+        also_on (dict): {related model: attribute holding our pk} for child
+            rows whose text is part of the document, e.g. customer locations
+        depends_on (dict): {related model: lookup path from ``model``} for
+            parent rows whose text is part of the document, e.g. the customer
+            name on a QC record; saving one reindexes every row that embeds it
+            (deleting one cascades to those rows)
+
+    Returns:
+        SearchKind: The registered kind
+    """
+    kind = SearchKind(name, model, fields)
+    _kinds[name] = kind
+    _kinds_by_model[model] = kind
+    uid = f'search_index:{name}'
+    post_save.connect(_reindex_saved, sender=model, dispatch_uid=uid)
+    post_delete.connect(_remove_deleted, sender=model, dispatch_uid=uid)
+    for related_model, attribute in (also_on or {}).items():
+        def reindex_parent(sender, instance, raw=False, _kind=kind, _attribute=attribute, **kwargs):
+            if not raw:
+                reindex(_kind, [getattr(instance, _attribute)])
+        post_save.connect(reindex_parent, sender=related_model, dispatch_uid=f'{uid}:{related_model._meta.label}',
+                          weak=False)
+        post_delete.connect(reindex_parent, sender=related_model, dispatch_uid=f'{uid}:{related_model._meta.label}',
+                            weak=False)
+    for related_model, path in (depends_on or {}).items():
+        def reindex_dependents(sender, instance, raw=False, created=False, _kind=kind, _path=path, **kwargs):
+            if raw or created:
+                return
+            pks = list(_kind.model._default_manager.filter(**{_path: instance.pk}).values_list('pk', flat=True))
+            if pks:
+                reindex(_kind, pks)
+        post_save.connect(reindex_dependents, sender=related_model,
+                          dispatch_uid=f'{uid}:{related_model._meta.label}', weak=False)
+    return kind
+
+
+def get_search_kinds(names=None):
+    if names is None:
+        return list(_kinds.values())
+    return [_kinds[name] for name in names]
+
+
+def reindex(kind, pks):
+    """Refresh the entries of some objects; entries of missing objects are dropped"""
+    documents = kind.documents(pks)
+    with transaction.atomic():
+        for pk in pks:
+            if pk in documents:
+                SearchEntry.objects.update_or_create(kind=kind.name, object_id=pk, defaults={'body': documents[pk]})
+            else:
+                SearchEntry.objects.filter(kind=kind.name, object_id=pk).delete()
+
+
+def _reindex_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        reindex(_kinds_by_model[sender], [instance.pk])
+
+
+def _remove_deleted(sender, instance, **kwargs):
+    SearchEntry.objects.filter(kind=_kinds_by_model[sender].name, object_id=instance.pk).delete()
+
+
+def rebuild_index(names=None, batch_size=1000):
+    """
+    Rebuild search entries from scratch
+
+    Returns:
+        dict: {kind name: number of entries written}
+    """
+    written = {}
+    for kind in get_search_kinds(names):
+        documents = kind.documents()
+        with transaction.atomic():
+            SearchEntry.objects.filter(kind=kind.name).delete()
+            SearchEntry.objects.bulk_create(
+                [SearchEntry(kind=kind.name, object_id=pk, body=body) for pk, body in documents.items()],
+                batch_size=batch_size,
+            )
+        written[kind.name] = len(documents)
+    logger.info(f"Rebuilt search index: {written}")
+    return written
+
+
+def _terms(query):
+    return [term for term in re.split(r'\s+', query.strip()) if term]
+
+
+def _sqlite_match(terms):
+    # Each term is a quoted FTS5 string; a space between strings means AND
+    return ' '.join('"{}"'.format(term.replace('"', '""')) for term in terms)
+
+
+def _sqlite_ids(kind, terms, limit, queryset):
+    entries = SearchEntry.objects.filter(kind=kind.name)
+    if queryset is not None:
+        # Empty scopes (.none(), pk__in=[]) compile to no query at all
+        entries = entries.filter(object_id__in=queryset.order_by().values('pk'))
+    # Only the MATCH and its bm25 rank need raw SQL
+    entries = entries.extra(
+        tables=['marketing_app_searchentry_fts'],
+        where=['marketing_app_searchentry_fts.rowid = marketing_app_searchentry.id',
+               'marketing_app_searchentry_fts MATCH %s'],
+        params=[_sqlite_match(terms)],
+        order_by=['marketing_app_searchentry_fts.rank'],
+    )
+    return list(entries.values_list('object_id', flat=True)[:limit])
+
+
+def _postgres_search(terms):
+    from django.contrib.postgres.search import SearchQuery, SearchVector
+
+    words = [re.sub(r'[^\w]', '', term) for term in terms]
+    raw = ' & '.join(f'{word}:*' for word in words if word)
+    if not raw:
+        return None, None
+    return SearchVector('body', config='simple'), SearchQuery(raw, config='simple', search_type='raw')
+
+
+def _postgres_ids(kind, terms, limit, queryset):
+    from django.contrib.postgres.search import SearchRank
+
+    vector, search = _postgres_search(terms)
+    if search is None:
+        return []
+    entries = SearchEntry.objects.filter(kind=kind.name)
+    if queryset is not None:
+        entries = entries.filter(object_id__in=queryset.order_by().values('pk'))
+    return list(entries
+                .annotate(document=vector)
+                .filter(document=search)
+                .annotate(rank=SearchRank(vector, search))
+                .order_by('-rank', '-object_id')
+                .values_list('object_id', flat=True)[:limit])
+
+
+def _index_terms(kind, query):
+    """Query terms if the index can answer ``query``, else None"""
+    terms = _terms(query)
+    if not terms or any(len(term) < MIN_TERM_LENGTH for term in terms):
+        return None
+    if connection.vendor not in ('sqlite', 'postgresql'):
+        return None
+    if not SearchEntry.objects.filter(kind=kind.name).exists():
+        return None
+    return terms
+
+
+def _max_results():
+    return getattr(settings, 'SEARCH_MAX_RESULTS', 1000)
+
+
+def search_ids(kind, query, queryset=None):
+    """
+    Object ids matching ``query``, best match first
+
+    Args:
+        kind (SearchKind): What to search
+        query (str): Search text
+        queryset: Rows the caller may show; applied inside the index query,
+            before the SEARCH_MAX_RESULTS limit
+
+    Returns:
+        list: Ranked ids (capped at SEARCH_MAX_RESULTS), or None when the
+        index cannot answer and the caller should filter with icontains
+    """
+    terms = _index_terms(kind, query)
+    if terms is None:
+        return None
+    if connection.vendor == 'sqlite':
+        return _sqlite_ids(kind, terms, _max_results(), queryset)
+    return _postgres_ids(kind, terms, _max_results(), queryset)
+
+
+def _matching_ids(kind, terms):
+    """Subquery of every matching object id, unranked and uncapped"""
+    entries = SearchEntry.objects.filter(kind=kind.name)
+    if connection.vendor == 'sqlite':
+        return entries.filter(id__in=RawSQL(
+            "SELECT rowid FROM marketing_app_searchentry_fts WHERE marketing_app_searchentry_fts MATCH %s",
+            [_sqlite_match(terms)],
+        )).values('object_id')
+    vector, search = _postgres_search(terms)
+    if search is None:
+        return entries.none().values('object_id')
+    return entries.annotate(document=vector).filter(document=search).values('object_id')
+
+
+def _kind_for(queryset):
+    return _kinds_by_model[queryset.model]
+
+
+def search_filter(queryset, query):
+    """
+    Narrow ``queryset`` to every row matching ``query``, keeping its ordering
+
+    The matches are not capped, so this suits exports and counts; list pages
+    use search() and ranked_page() instead.
+
+    Usage:
+        qc_records = search_filter(qc_records, request.GET.get('search', ''))
+    """
+    if not query:
+        return queryset
+    kind = _kind_for(queryset)
+    terms = _index_terms(kind, query)
+    if terms is None:
+        return queryset.filter(kind.fallback_q(query))
+    return queryset.filter(pk__in=_matching_ids(kind, terms))
+
+
+def search(queryset, query):
+    """
+    Search a list view's rows once, for both its counts and its page
+
+    Args:
+        queryset: Rows the view may show, with its list filters applied
+        query (str): Search text
+
+    Returns:
+        tuple: (queryset narrowed to every match, ranked ids for
+        ranked_page() or None when the rows are not ranked)
+
+    Usage:
+        customers, ranked = search(customers, search_query)
+        total = customers.count()
+        page_obj = ranked_page(customers, ranked, request.GET.get('page'), 15)
+    """
+    if not query:
+        return queryset, None
+    kind = _kind_for(queryset)
+    ids = search_ids(kind, query, queryset)
+    if ids is None:
+        return queryset.filter(kind.fallback_q(query)), None
+    if len(ids) < _max_results():
+        # Every match is ranked; the narrowed queryset needs no second index query
+        return queryset.filter(pk__in=ids), ids
+    return queryset.filter(pk__in=_matching_ids(kind, _terms(query))), ids
+
+
+def ranked_page(queryset, ids, page_number, per_page):
+    """
+    One page of ``queryset``, in the order of the ranked ``ids`` from search()
+
+    Only the current page's rows are loaded. With ``ids`` None the queryset
+    is paginated in its own order.
+
+    Returns:
+        Page: Django paginator page whose object_list holds model instances
+    """
+    if ids is None:
+        return Paginator(queryset, per_page).get_page(page_number)
+    page = Paginator(ids, per_page).get_page(page_number)
+    rows = queryset.in_bulk(list(page.object_list))
+    page.object_list = [rows[pk] for pk in page.object_list if pk in rows]
+    return page
+
+
+def search_page(queryset, query, page_number, per_page):
+    """
+    One page of ``queryset`` rows matching ``query``, best matches first
+
+    The rows ``queryset`` allows (permissions and list filters) are applied
+    inside the index query, so the ranked ids need no further filtering, and
+    only the current page's rows are loaded. Without a query, or when the
+    index cannot answer, ``queryset`` is paginated as before.
+
+    Returns:
+        Page: Django paginator page whose object_list holds model instances
+
+    Usage:
+        page_obj = search_page(leads, search_query, request.GET.get('page'), 15)
+    """
+    kind = _kind_for(queryset)
+    ids = search_ids(kind, query, queryset) if query else None
+    if ids is None and query:
+        queryset = queryset.filter(kind.fallback_q(query))
+    return ranked_page(queryset, ids, page_number, per_page)
+
+
+register_search('lead', Lead, ['first_name', 'last_name', 'email', 'company', 'phone'])
+register_search('customer', Customer, ['name', 'contact_person', 'email', 'phone',
+                                       'locations__address', 'locations__city'],
+                also_on={CustomerLocation: 'customer_id'})
+register_search('inquiry', InquiryLog, ['company_name', 'enquiry_number', 'contact_person', 'location'])
+register_search('qc', QCTracking, ['qc_number', 'manufacturing__batch_number',
+                                   'manufacturing__work_order__purchase_order__customer__name'],
+                depends_on={Manufacturing: 'manufacturing',
+                            Customer: 'manufacturing__work_order__purchase_order__customer'})
+register_search('payment_followup', PaymentFollowUp, ['purchase_order__po_number',
+                                                      'purchase_order__customer__name', 'notes'],
+                depends_on={PurchaseOrder: 'purchase_order', Customer: 'purchase_order__customer'})
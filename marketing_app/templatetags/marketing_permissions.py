@@ -56,6 +56,5 @@ def has_perm(request, permission_code):
     if not request:
         return False
     
-    from marketing_app.permissions import check_permission
     return check_permission(request, permission_code)
 
@@ -1,14 +1,16 @@
-from django.test import TestCase, Client
+from io import StringIO
+from django.test import TestCase, Client, override_settings
 from django.contrib.auth.models import User
 from django.urls import reverse
 from django.utils import timezone
+from django.db.models import Count
 from decimal import Decimal
 from datetime import date, timedelta
 from .models import (
     Customer, CustomerLocation, Region, Lead, Visit, Expense, 
     Exhibition, Quotation, PurchaseOrder, WorkOrder, Manufacturing,
     Dispatch, URS, GADrawing, TechnicalDiscussion, Negotiation,
-    ProductionPlan, QCTracking, PackingDetails, DispatchChecklist
+    ProductionPlan, QCTracking, PackingDetails, DispatchChecklist, PaymentFollowUp
 )
 
 class ModelTests(TestCase):
@@ -626,3 +628,1244 @@ class SecurityTests(TestCase):
         })
         
         self.assertEqual(response.status_code, 403)  # Should be forbidden without CSRF token
+
+
+LOCMEM_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'hrms_rbac': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'hrms-rbac-tests'},
+    'reports': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'report-tests'},
+}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class PermissionSnapshotTests(TestCase):
+    """Permission checks answered from the session permission snapshot"""
+
+    def setUp(self):
+        from django.core.cache import caches
+        from django.test import RequestFactory
+        from django.contrib.sessions.backends.db import SessionStore
+        from .hrms_rbac import PermissionSnapshot
+        from .permissions import store_permission_snapshot
+
+        caches['hrms_rbac'].clear()
+        self.request = RequestFactory().get('/dashboard/')
+        self.request.session = SessionStore()
+        self.request.session['hrms_rbac_token'] = 'test-token'
+        store_permission_snapshot(self.request, PermissionSnapshot(
+            ['marketing.campaign.view', 'marketing.lead.view']
+        ), user_id=7)
+
+    def expire_snapshot(self):
+        from .hrms_cache import permission_cache
+        snapshot = permission_cache.get_snapshot('test-token')
+        snapshot.fetched_at = 0
+        permission_cache.set_snapshot('test-token', snapshot)
+
+    def test_check_permission_uses_snapshot(self):
+        """Fresh snapshot answers checks without calling HRMS"""
+        from unittest import mock
+        from .permissions import check_permission, check_multiple_permissions
+
+        with mock.patch('marketing_app.hrms_rbac.HRMSTransport.request') as transport_request:
+            self.assertTrue(check_permission(self.request, 'marketing.campaign.view'))
+            self.assertFalse(check_permission(self.request, 'marketing.campaign.delete'))
+            self.assertEqual(
+                check_multiple_permissions(self.request, ['marketing.lead.view', 'marketing.visit.view']),
+                {'marketing.lead.view': True, 'marketing.visit.view': False}
+            )
+        transport_request.assert_not_called()
+
+    def test_stale_snapshot_is_refreshed(self):
+        """Expired snapshot is re-fetched once from user info"""
+        from unittest import mock
+        from .permissions import check_permission
+
+        self.expire_snapshot()
+        user_info = {'success': True, 'permissions': [{'code': 'marketing.visit.view'}]}
+        with mock.patch('marketing_app.hrms_rbac.HRMSRBACClient.get_user_info', return_value=user_info) as get_info:
+            self.assertTrue(check_permission(self.request, 'marketing.visit.view'))
+            self.assertTrue(check_permission(self.request, 'marketing.visit.view'))
+        self.assertEqual(get_info.call_count, 1)
+
+    def test_request_checks_share_one_lookup(self):
+        """Context processor is lazy and template checks share one HRMS call"""
+        from unittest import mock
+        from .context_processors import permissions as permissions_context
+
+        self.expire_snapshot()
+        user_info = {'success': True, 'permissions': [{'code': 'marketing.lead.view'}]}
+        with mock.patch('marketing_app.hrms_rbac.HRMSRBACClient.get_user_info', return_value=user_info) as get_info:
+            context = permissions_context(self.request)
+            self.assertEqual(get_info.call_count, 0)
+            for _ in range(20):
+                self.assertTrue(context['has_permission']('marketing.lead.view'))
+            self.assertIn('marketing.lead.view', context['user_permissions'])
+        self.assertEqual(get_info.call_count, 1)
+
+
+    def test_denied_request_redirects_without_hrms_calls(self):
+        """Denial redirect is computed from the snapshot alone"""
+        from unittest import mock
+        from django.contrib.messages.storage.fallback import FallbackStorage
+        from django.http import HttpResponse
+        from .permissions import require_permission
+
+        setattr(self.request, '_messages', FallbackStorage(self.request))
+        view = require_permission('marketing.customer.delete')(lambda request: HttpResponse('ok'))
+        with mock.patch('marketing_app.hrms_rbac.HRMSTransport.request') as transport_request:
+            response = view(self.request)
+        transport_request.assert_not_called()
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response.url, reverse('marketing:dashboard'))
+    def test_declared_permissions_resolved_in_one_batch(self):
+        """Without a snapshot, declared permissions cost one batch call"""
+        from unittest import mock
+        from django.http import HttpResponse
+        from .hrms_cache import permission_cache
+        from .permissions import declare_permissions
+
+        permission_cache.invalidate_token('test-token')
+        granted = {'marketing.lead.view': True, 'marketing.lead.edit': False}
+
+        @declare_permissions('lead.view', 'lead.edit')
+        def view(request):
+            return HttpResponse(f"{request.perms['lead.view']}/{request.perms['marketing.lead.edit']}")
+
+        with mock.patch('marketing_app.hrms_rbac.HRMSRBACClient.get_user_info', return_value=None), \
+                mock.patch('marketing_app.hrms_rbac.HRMSRBACClient.check_multiple_permissions',
+                           return_value=granted) as batch:
+            response = view(self.request)
+        self.assertEqual(response.content, b'True/False')
+        self.assertEqual(batch.call_count, 1)
+
+    @override_settings(HRMS_RBAC_WEBHOOK_SECRET='s3cret')
+    def test_role_change_webhook_invalidates_cached_sessions(self):
+        """Role-change webhook drops the user's shared cache entries"""
+        import json
+        from .hrms_cache import permission_cache
+
+        url = reverse('hrms_role_changed_webhook')
+        payload = json.dumps({'user_id': 7})
+        response = self.client.post(url, payload, content_type='application/json')
+        self.assertEqual(response.status_code, 403)
+        self.assertIsNotNone(permission_cache.get_snapshot('test-token'))
+
+        response = self.client.post(url, payload, content_type='application/json',
+                                    HTTP_X_HRMS_WEBHOOK_SECRET='s3cret')
+        self.assertEqual(response.json(), {'success': True, 'invalidated': 1})
+        self.assertIsNone(permission_cache.get_snapshot('test-token'))
+
+    @override_settings(HRMS_RBAC_WEBHOOK_SECRET='s3cret')
+    def test_health_details_need_the_shared_secret(self):
+        url = reverse('hrms_health')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b'')
+
+        response = self.client.get(url, HTTP_X_HRMS_WEBHOOK_SECRET='s3cret')
+        self.assertIn('circuit_breaker', response.json())
+
+    def test_user_index_refreshed_and_counts_batched(self):
+        """Every write re-arms the user index; lookups are counted without cache writes"""
+        from unittest import mock
+        from .hrms_cache import permission_cache
+
+        snapshot = permission_cache.get_snapshot('test-token')
+        with mock.patch.object(permission_cache.cache, 'set', wraps=permission_cache.cache.set) as cache_set:
+            permission_cache.set_snapshot('test-token', snapshot, user_id=7)
+        self.assertIn('hrms_rbac:user:7', [call.args[0] for call in cache_set.call_args_list])
+
+        before = permission_cache.stats()['hits']
+        with mock.patch.object(permission_cache.cache, 'incr') as incr:
+            permission_cache.get_snapshot('test-token')
+        incr.assert_not_called()
+        self.assertEqual(permission_cache.stats()['hits'], before + 1)
+
+    def test_async_view_and_middleware(self):
+        """Async views are guarded without blocking and the middleware runs async"""
+        from unittest import mock
+        from asgiref.sync import async_to_sync, iscoroutinefunction
+        from django.contrib.messages.storage.fallback import FallbackStorage
+        from django.http import HttpResponse
+        from .hrms_middleware import HRMSRBACMiddleware
+        from .permissions import require_permission
+
+        @require_permission('marketing.lead.view')
+        async def allowed_view(request):
+            return HttpResponse('ok')
+
+        @require_permission('marketing.lead.delete')
+        async def denied_view(request):
+            return HttpResponse('ok')
+
+        self.assertTrue(iscoroutinefunction(allowed_view))
+        setattr(self.request, '_messages', FallbackStorage(self.request))
+        with mock.patch('marketing_app.hrms_rbac.HRMSTransport.request') as transport_request:
+            self.assertEqual(async_to_sync(allowed_view)(self.request).status_code, 200)
+            self.assertEqual(async_to_sync(denied_view)(self.request).status_code, 302)
+        transport_request.assert_not_called()
+
+        async def get_response(request):
+            return HttpResponse('ok')
+
+        middleware = HRMSRBACMiddleware(get_response)
+        self.assertTrue(iscoroutinefunction(middleware))
+        self.request.session['hrms_user_info'] = {'user': {'id': 7, 'username': 'asha'}}
+        response = async_to_sync(middleware)(self.request)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.request.user.username, 'asha')
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class HRMSTransportTests(TestCase):
+    """Pooled HRMS transport behaviour"""
+
+    def test_idempotent_calls_retry_with_jitter(self):
+        """Connection errors are retried only for idempotent calls"""
+        import requests
+        from unittest import mock
+        from .hrms_rbac import HRMSTransport, CircuitBreaker
+
+        transport = HRMSTransport(max_retries=2, retry_backoff=0, breaker=CircuitBreaker())
+        ok = mock.Mock(status_code=200)
+        with mock.patch.object(transport.session, 'request',
+                               side_effect=[requests.exceptions.ConnectionError(), ok]) as send:
+            self.assertIs(transport.request('GET', 'https://hrms.test/user/info/', idempotent=True), ok)
+        self.assertEqual(send.call_count, 2)
+        self.assertEqual(transport.stats()['retries'], 1)
+
+        with mock.patch.object(transport.session, 'request',
+                               side_effect=requests.exceptions.ConnectionError()) as send:
+            with self.assertRaises(requests.exceptions.ConnectionError):
+                transport.request('POST', 'https://hrms.test/login/')
+        self.assertEqual(send.call_count, 1)
+
+    def test_transport_recreated_after_reset(self):
+        """reset_transport() gives the worker a fresh pool"""
+        from .hrms_rbac import get_transport, reset_transport
+
+        first = get_transport()
+        self.assertIs(get_transport(), first)
+        reset_transport()
+        self.assertIsNot(get_transport(), first)
+
+    def test_circuit_breaker_fails_fast_when_open(self):
+        """Open breaker rejects calls without touching the network"""
+        import requests
+        from unittest import mock
+        from .hrms_rbac import HRMSTransport, CircuitBreaker, HRMSUnavailable
+
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+        transport = HRMSTransport(max_retries=0, retry_backoff=0, breaker=breaker)
+        with mock.patch.object(transport.session, 'request',
+                               side_effect=requests.exceptions.Timeout()) as send:
+            for _ in range(2):
+                with self.assertRaises(requests.exceptions.Timeout):
+                    transport.request('GET', 'https://hrms.test/user/info/', idempotent=True)
+            with self.assertRaises(HRMSUnavailable):
+                transport.request('GET', 'https://hrms.test/user/info/', idempotent=True)
+        self.assertEqual(send.call_count, 2)
+        self.assertEqual(breaker.stats()['state'], CircuitBreaker.OPEN)
+
+    def test_half_open_probe_released_on_other_errors(self):
+        """A probe failing with a non-connection error lets the next probe through"""
+        import requests
+        from unittest import mock
+        from .hrms_rbac import HRMSTransport, CircuitBreaker
+
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+        breaker.record_failure()
+        breaker._opened_at -= 60
+        transport = HRMSTransport(max_retries=2, retry_backoff=0, breaker=breaker)
+        ok = mock.Mock(status_code=200)
+        with mock.patch.object(transport.session, 'request',
+                               side_effect=[requests.exceptions.ChunkedEncodingError(), ok]) as send:
+            with self.assertRaises(requests.exceptions.ChunkedEncodingError):
+                transport.request('GET', 'https://hrms.test/user/info/', idempotent=True)
+            breaker._opened_at -= 60
+            self.assertIs(transport.request('GET', 'https://hrms.test/user/info/', idempotent=True), ok)
+        self.assertEqual(send.call_count, 2)
+        self.assertEqual(breaker.stats()['state'], CircuitBreaker.CLOSED)
+
+    def test_stale_snapshot_served_during_outage(self):
+        """Last-known permissions stand in while HRMS is down"""
+        import time
+        from unittest import mock
+        from django.test import RequestFactory
+        from django.contrib.sessions.backends.db import SessionStore
+        from .hrms_rbac import PermissionSnapshot
+        from .hrms_cache import permission_cache
+        from .permissions import check_permission
+
+        request = RequestFactory().get('/dashboard/')
+        request.session = SessionStore()
+        request.session['hrms_rbac_token'] = 'test-token'
+        stale = PermissionSnapshot(['marketing.lead.view'], fetched_at=time.time() - 400)
+        permission_cache.set_snapshot('test-token', stale)
+        with mock.patch('marketing_app.hrms_rbac.HRMSRBACClient.get_user_info', return_value=None), \
+                mock.patch('marketing_app.permissions.hrms_circuit_breaker') as breaker:
+            breaker.is_degraded = True
+            self.assertTrue(check_permission(request, 'marketing.lead.view'))
+
+
+class HRMSPrincipalTests(TestCase):
+    """Per-request HRMS principal"""
+
+    def setUp(self):
+        from django.test import RequestFactory
+        from django.contrib.sessions.backends.db import SessionStore
+
+        self.user = User.objects.create_user(username='asha', password='testpass123')
+        self.request = RequestFactory().get('/dashboard/')
+        self.request.session = SessionStore()
+        self.request.session['hrms_rbac_token'] = 'test-token'
+        self.request.session['hrms_user_info'] = {
+            'user': {'id': 42, 'username': 'asha', 'first_name': 'Asha', 'last_name': 'Rao'},
+        }
+
+    def test_principal_shared_by_helpers(self):
+        """Helpers reuse one principal and one Django user lookup"""
+        from .hrms_principal import HRMSPrincipal, get_principal
+        from .user_helpers import get_user_info_dict
+        from .user_utils import get_django_user
+
+        principal = get_principal(self.request)
+        self.assertIsInstance(principal, HRMSPrincipal)
+        self.assertIs(get_principal(self.request), principal)
+        self.request.user = principal
+
+        with self.assertNumQueries(1):
+            for _ in range(3):
+                self.assertEqual(get_django_user(self.request), self.user)
+        info = get_user_info_dict(self.request)
+        self.assertEqual(info['user_id'], 42)
+        self.assertEqual(info['full_name'], 'Asha Rao')
+
+
+@override_settings(CACHES=LOCMEM_CACHES, HRMS_SESSION_REFRESH_INTERVAL=900)
+class HRMSSessionTests(TestCase):
+    """Compact, write-avoiding HRMS sessions"""
+
+    def setUp(self):
+        from django.test import RequestFactory
+        from django.contrib.sessions.backends.db import SessionStore
+
+        self.request = RequestFactory().get('/dashboard/')
+        self.request.session = SessionStore()
+        self.request.session['hrms_rbac_token'] = 'test-token'
+
+    def test_login_stores_compact_record(self):
+        """Login keeps the full HRMS response out of the session"""
+        from unittest import mock
+        from .hrms_cache import permission_cache
+        from .hrms_principal import PRINCIPAL_SESSION_KEY
+
+        result = {
+            'success': True, 'token': 'login-token',
+            'user': {'id': 42, 'username': 'asha', 'first_name': 'Asha'},
+            'employee': {'id': 9, 'department': 'Sales'},
+            'roles': [{'name': 'Executive'}], 'permissions': ['lead.view'],
+        }
+        with mock.patch('marketing_app.hrms_auth_views.HRMSRBACClient.login', return_value=result):
+            response = self.client.post('/hrms-login/', {'username': 'asha', 'password': 'x'})
+        self.assertEqual(response.status_code, 302)
+
+        session = self.client.session
+        self.assertNotIn('hrms_user_info', session)
+        self.assertEqual(session[PRINCIPAL_SESSION_KEY],
+                         {'v': 1, 'id': 42, 'username': 'asha', 'first_name': 'Asha'})
+        self.assertEqual(permission_cache.get_user_info('login-token')['employee']['department'], 'Sales')
+
+    def test_refresh_only_after_interval(self):
+        """The session is re-saved at most once per refresh interval"""
+        import time
+        from .hrms_middleware import refresh_session, mark_session_refreshed
+        from .hrms_principal import HRMSPrincipal
+
+        principal = HRMSPrincipal({'id': 42, 'username': 'asha'})
+        mark_session_refreshed(self.request.session)
+        self.assertFalse(refresh_session(self.request.session, principal))
+        self.request.session['hrms_refreshed_at'] = int(time.time()) - 901
+        self.assertTrue(refresh_session(self.request.session, principal))
+        self.assertFalse(refresh_session(self.request.session, principal))
+
+    def test_legacy_session_upgraded(self):
+        """Sessions holding the full login response are rewritten once"""
+        from .hrms_middleware import refresh_session
+        from .hrms_principal import HRMSPrincipal, PRINCIPAL_SESSION_KEY
+
+        self.request.session['hrms_user_info'] = {'user': {'id': 42, 'username': 'asha'}}
+        principal = HRMSPrincipal.from_session(self.request.session)
+        self.assertTrue(refresh_session(self.request.session, principal))
+        self.assertNotIn('hrms_user_info', self.request.session)
+        self.assertEqual(HRMSPrincipal.from_session(self.request.session).id, 42)
+        self.assertEqual(self.request.session[PRINCIPAL_SESSION_KEY]['username'], 'asha')
+
+
+@override_settings(CACHES=LOCMEM_CACHES, HRMS_RBAC_ROW_SCOPE=True)
+class RowScopeTests(TestCase):
+    """Row scoping pushed into the queryset from the permission snapshot"""
+
+    def setUp(self):
+        from django.core.cache import caches
+
+        caches['hrms_rbac'].clear()
+        self.north = Region.objects.create(name='North', manager_user_id=7)
+        self.south = Region.objects.create(name='South', manager_user_id=8)
+        self.own = Customer.objects.create(name='Own', contact_person='A', email='a@x.com',
+                                           phone='1', region=self.south, created_by_user_id=7)
+        self.regional = Customer.objects.create(name='Regional', contact_person='B', email='b@x.com',
+                                                phone='2', region=self.north, created_by_user_id=9)
+        self.other = Customer.objects.create(name='Other', contact_person='C', email='c@x.com',
+                                             phone='3', region=self.south, created_by_user_id=9)
+
+    def make_request(self, codes):
+        from django.test import RequestFactory
+        from django.contrib.sessions.backends.db import SessionStore
+        from .hrms_principal import HRMSPrincipal
+        from .hrms_rbac import PermissionSnapshot
+        from .permissions import store_permission_snapshot
+
+        request = RequestFactory().get('/customers/')
+        request.session = SessionStore()
+        request.session['hrms_rbac_token'] = f'token-{len(codes)}'
+        request.user = HRMSPrincipal({'id': 7, 'username': 'asha'})
+        store_permission_snapshot(request, PermissionSnapshot(codes), user_id=7)
+        return request
+
+    def names(self, request):
+        from .permission_filters import filter_customers_by_permission
+        return set(filter_customers_by_permission(request, Customer.objects.all()).values_list('name', flat=True))
+
+    def test_executive_sees_own_rows(self):
+        request = self.make_request(['marketing.customer.view'])
+        self.assertEqual(self.names(request), {'Own'})
+
+    def test_regional_head_sees_region(self):
+        request = self.make_request(['marketing.customer.view', 'marketing.data.view_region'])
+        self.assertEqual(self.names(request), {'Own', 'Regional'})
+
+    def test_view_all_and_no_view_permission(self):
+        request = self.make_request(['marketing.customer.view', 'marketing.data.view_all'])
+        self.assertEqual(self.names(request), {'Own', 'Regional', 'Other'})
+        self.assertEqual(self.names(self.make_request([])), set())
+
+    @override_settings(HRMS_RBAC_ROW_SCOPE=False)
+    def test_scope_disabled_keeps_all_rows(self):
+        request = self.make_request(['marketing.customer.view'])
+        self.assertEqual(self.names(request), {'Own', 'Regional', 'Other'})
+
+    def test_scope_filters_in_sql_without_hrms_calls(self):
+        """One query for the rows, one for the managed regions, no HTTP"""
+        from unittest import mock
+
+        request = self.make_request(['marketing.customer.view', 'marketing.data.view_region'])
+        with mock.patch('marketing_app.hrms_rbac.HRMSTransport.request') as transport_request:
+            with self.assertNumQueries(2):
+                self.names(request)
+            with self.assertNumQueries(1):
+                self.names(request)
+        transport_request.assert_not_called()
+
+    def test_customer_list_stats_follow_scope_and_filters(self):
+        from unittest import mock
+        from django.http import HttpResponse
+        from . import views
+
+        Customer.objects.filter(name='Regional').update(customer_type='existing')
+        request = self.make_request(['marketing.customer.view', 'marketing.data.view_region'])
+        request.GET = request.GET.copy()
+        request.GET['region'] = str(self.north.pk)
+        with mock.patch.object(views, 'render', return_value=HttpResponse()) as render:
+            views.customer_list(request)
+        context = render.call_args.args[2]
+
+        self.assertEqual((context['customer_stats']['total_customers'],
+                          context['customer_stats']['active_customers']), (1, 1))
+        self.assertEqual(context['region_distribution'],
+                         [{'region': 'North', 'count': 1, 'percentage': 100.0}])
+
+
+class KPICounterTests(TestCase):
+    """Signal-maintained dashboard counters"""
+
+    def setUp(self):
+        from django.core.management import call_command
+
+        self.region = Region.objects.create(name='North')
+        Lead.objects.create(first_name='A', last_name='L', email='a@x.com', source='website',
+                            status='new', assigned_to_user_id=7)
+        Lead.objects.create(first_name='B', last_name='L', email='b@x.com', source='website',
+                            status='converted', assigned_to_user_id=7)
+        call_command('rebuild_kpi_counters', '--reset', stdout=StringIO())
+
+    def read(self, user_id=0):
+        from .kpi_counters import read_counters
+        return read_counters({'leads.active': user_id})['leads.active']
+
+    def test_signals_keep_counts_in_step(self):
+        self.assertEqual((self.read(), self.read(7), self.read(8)), (1, 1, 0))
+
+        lead = Lead.objects.create(first_name='C', last_name='L', email='c@x.com', source='website',
+                                   status='contacted', assigned_to_user_id=8)
+        self.assertEqual((self.read(), self.read(8)), (2, 1))
+
+        lead.status = 'lost'
+        lead.save()
+        self.assertEqual((self.read(), self.read(8)), (1, 0))
+
+        Lead.objects.filter(status='new').get().delete()
+        self.assertEqual((self.read(), self.read(7)), (0, 0))
+
+    def test_read_is_one_query(self):
+        from .kpi_counters import read_counters
+
+        with self.assertNumQueries(1):
+            counters = read_counters({'leads.active': 7, 'customers.total': 0, 'quotations.sent': 0})
+        self.assertEqual(counters['leads.active'], 1)
+        self.assertEqual(counters['customers.total'], 0)
+
+    def test_row_counters_per_user(self):
+        """Sheet dashboards read every count in one query"""
+        from .kpi_counters import read_counts, rows_key
+        from .models import ODPlanVisitReport, ODPlanRemarks
+
+        for status in ('planned', 'planned', 'completed'):
+            ODPlanVisitReport.objects.create(
+                month='October', date=date.today(), company_name='Acme', region='North',
+                visit_status=status, created_by_user_id=7
+            )
+        ODPlanRemarks.objects.create(remarks='Note', created_by_user_id=8)
+
+        spec = {
+            rows_key(ODPlanVisitReport): (7, None),
+            rows_key(ODPlanVisitReport, 'planned'): (7, None),
+            rows_key(ODPlanVisitReport, 'cancelled'): (7, None),
+            rows_key(ODPlanRemarks): (7, None),
+        }
+        with self.assertNumQueries(1):
+            counts = read_counts(spec)
+        self.assertEqual(list(counts.values()), [3, 2, 0, 0])
+
+    def test_check_reports_and_rebuild_fixes_drift(self):
+        from django.core.management import call_command
+        from django.core.management.base import CommandError
+
+        # Bulk updates bypass the signals
+        Lead.objects.filter(status='converted').update(status='qualified')
+        with self.assertRaises(CommandError):
+            call_command('rebuild_kpi_counters', '--check', stdout=StringIO())
+        call_command('rebuild_kpi_counters', stdout=StringIO())
+        self.assertEqual((self.read(), self.read(7)), (2, 2))
+        call_command('rebuild_kpi_counters', '--check', stdout=StringIO())
+
+    def test_initial_build_only_fills_missing_counters(self):
+        from django.core.management import call_command
+        from .models import KPICounter
+
+        Lead.objects.filter(status='converted').update(status='qualified')
+        call_command('rebuild_kpi_counters', '--if-empty', stdout=StringIO())
+        self.assertEqual(self.read(), 1)
+
+        KPICounter.objects.filter(key='leads.active').delete()
+        call_command('rebuild_kpi_counters', '--if-empty', stdout=StringIO())
+        self.assertEqual((self.read(), self.read(7)), (2, 2))
+
+
+class KPIQueryTests(TestCase):
+    """Conditional-aggregation KPI builder"""
+
+    def setUp(self):
+        self.region = Region.objects.create(name='North')
+        self.customer = Customer.objects.create(name='Acme', contact_person='A', email='a@x.com',
+                                                phone='1', region=self.region)
+        for number, status, amount in (('Q1', 'sent', 100), ('Q2', 'accepted', 250), ('Q3', 'accepted', 50)):
+            Quotation.objects.create(quotation_number=number, customer=self.customer, status=status,
+                                     total_amount=Decimal(amount), valid_until=date.today())
+
+    def test_counts_and_sums_in_one_query(self):
+        from .kpi_builder import KPIQuery
+
+        today = timezone.now().date()
+        with self.assertNumQueries(1):
+            stats = (KPIQuery(Quotation, 'created_at', today, today)
+                     .count('total')
+                     .count('accepted', status='accepted')
+                     .count('rejected', status='rejected')
+                     .sum('accepted_value', 'total_amount', status='accepted')
+                     .run())
+        self.assertEqual(stats, {'total': 3, 'accepted': 2, 'rejected': 0, 'accepted_value': Decimal('300')})
+
+    def test_date_range_is_sargable(self):
+        """Day ranges compare the bare column instead of casting it to a date"""
+        from .kpi_builder import date_range
+
+        today = timezone.now().date()
+        queryset = Quotation.objects.filter(date_range(Quotation, 'created_at', today, today))
+        sql = str(queryset.query).lower()
+        self.assertNotIn('cast', sql)
+        self.assertNotIn('django_datetime_cast_date', sql)
+        self.assertEqual(queryset.count(), 3)
+        yesterday = today - timedelta(days=1)
+        self.assertFalse(Quotation.objects.filter(date_range(Quotation, 'created_at', yesterday, yesterday)).exists())
+        self.assertEqual(Quotation.objects.filter(date_range(Quotation, 'valid_until', today)).count(), 3)
+
+    def report_context(self, view):
+        from unittest import mock
+        from django.http import HttpResponse
+        from django.test import RequestFactory
+        from django.contrib.sessions.backends.db import SessionStore
+        from . import views
+
+        request = RequestFactory().get('/reports/')
+        request.session = SessionStore()
+        request.user = User.objects.create_user(username='viewer', password='x')
+        with mock.patch.object(views, 'render', return_value=HttpResponse()) as render:
+            getattr(views, view)(request)
+        return render.call_args.args[2]
+
+    def add_batches(self):
+        today = date.today()
+        po = PurchaseOrder.objects.create(po_number='PO1', customer=self.customer, total_amount=Decimal('500'),
+                                          received_date=today, delivery_date=today, payment_terms='Net 30',
+                                          status='received')
+        work_order = WorkOrder.objects.create(work_order_number='WO1', purchase_order=po, start_date=today,
+                                              completion_date=today)
+        for batch, finished in (('B1', today), ('B2', None)):
+            Manufacturing.objects.create(work_order=work_order, batch_number=batch, planned_start_date=today,
+                                         planned_completion_date=today, actual_completion_date=finished)
+
+    def test_daily_report_counts_todays_rows(self):
+        self.add_batches()
+        stats = self.report_context('daily_reports')['daily_stats']
+        self.assertEqual(stats, {
+            'new_customers': 1, 'new_leads': 0, 'new_quotations': 3, 'new_purchase_orders': 1,
+            'new_work_orders': 1, 'completed_manufacturing': 1, 'new_visits': 0, 'pending_expenses': 0,
+        })
+
+    def test_monthly_report_counts_finished_batches_and_revenue(self):
+        self.add_batches()
+        stats = self.report_context('monthly_reports')['monthly_stats']
+        self.assertEqual(stats['completed_manufacturing'], 1)
+        self.assertEqual((stats['total_purchase_orders'], stats['total_revenue']), (1, Decimal('500')))
+        self.assertEqual(stats['total_quotations'], 3)
+
+
+class RollupTests(TestCase):
+    """Grouped per-user and per-period rollups"""
+
+    def setUp(self):
+        self.region = Region.objects.create(name='North')
+        self.next_id = 0
+
+    def add_user_activity(self, count):
+        for _ in range(count):
+            self.next_id += 1
+            n = self.next_id
+            Customer.objects.create(name=f'C{n}', contact_person='A', email=f'c{n}@x.com', phone='1',
+                                    region=self.region, created_by_user_id=n, created_by_username=f'hrms{n}')
+            Lead.objects.create(first_name='L', last_name=str(n), email=f'l{n}@x.com', source='website',
+                                assigned_to_user_id=n, assigned_to_username=f'hrms{n}')
+        # A legacy row with only the Django FK
+        legacy = User.objects.create_user(username=f'legacy{n}', password='x')
+        Customer.objects.create(name=f'Legacy{n}', contact_person='A', email=f'legacy{n}@x.com', phone='1',
+                                region=self.region, created_by=legacy)
+
+    def performance_rows(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from .rollups import UserRollup
+
+        with CaptureQueriesContext(connection) as queries:
+            rows = (UserRollup()
+                    .add('customers_created', Customer.objects.all(), 'created_by')
+                    .add('leads_created', Lead.objects.all(), 'assigned_to')
+                    .rows())
+        return rows, len(queries)
+
+    def render_context(self, view):
+        from unittest import mock
+        from django.http import HttpResponse
+        from django.test import RequestFactory
+        from . import views
+
+        request = RequestFactory().get('/reports/performance/')
+        request.user = User.objects.create_user(username='viewer', password='x')
+        with mock.patch.object(views, 'render', return_value=HttpResponse()) as render:
+            getattr(views, view)(request)
+        return render.call_args.args[2]
+
+    def test_query_count_flat_as_users_grow(self):
+        self.add_user_activity(2)
+        rows, few_users_queries = self.performance_rows()
+        self.assertEqual(len(rows), 3)
+
+        self.add_user_activity(25)
+        rows, many_users_queries = self.performance_rows()
+        self.assertEqual(len(rows), 29)
+        self.assertEqual(many_users_queries, few_users_queries)
+
+        by_name = {row['user'].username: row for row in rows}
+        self.assertEqual((by_name['hrms1']['customers_created'], by_name['hrms1']['leads_created']), (1, 1))
+        self.assertEqual(by_name['legacy27']['customers_created'], 1)
+
+    def test_performance_analytics_page_uses_rollups(self):
+        self.add_user_activity(2)
+        context = self.render_context('performance_analytics')
+        by_name = {row['user'].username: row for row in context['user_performance']}
+        self.assertEqual((by_name['hrms2']['customers_created'], by_name['hrms2']['leads_created']), (1, 1))
+        self.assertEqual(by_name['legacy2']['customers_created'], 1)
+
+    def test_performance_analytics_lists_idle_users(self):
+        self.add_user_activity(1)
+        User.objects.create_user(username='idle', password='x', first_name='Ida')
+        rows = self.render_context('performance_analytics')['user_performance']
+        by_name = {row['user'].username: row for row in rows}
+        self.assertEqual(by_name['idle']['user'].get_full_name(), 'Ida')
+        self.assertEqual([by_name['idle'][stat] for stat in
+                          ('customers_created', 'leads_created', 'quotations_created', 'visits_conducted')],
+                         [0, 0, 0, 0])
+        self.assertEqual(by_name['legacy1']['customers_created'], 1)
+        self.assertEqual(rows[0]['user'].username, 'hrms1')
+
+    @override_settings(CACHES=LOCMEM_CACHES)
+    def test_region_team_rollup_cached_until_quotation_write(self):
+        from django.core.cache import caches
+        from .rollups import region_team_rollup
+
+        caches['reports'].clear()
+        south = Region.objects.create(name='South')
+        for n, region in enumerate((self.region, self.region, south)):
+            customer = Customer.objects.create(name=f'C{n}', contact_person='A', email=f'c{n}@x.com',
+                                               phone='1', region=region)
+            Quotation.objects.create(quotation_number=f'Q{n}', customer=customer, total_amount=Decimal('100'),
+                                     valid_until=date.today(), created_by_user_id=n % 2 + 1,
+                                     created_by_full_name=f'Rep {n % 2 + 1}')
+
+        with self.assertNumQueries(1):
+            rollup = region_team_rollup()
+        self.assertEqual(rollup[self.region.id]['total_sales'], Decimal('200'))
+        self.assertEqual([m['name'] for m in rollup[self.region.id]['members']], ['Rep 1', 'Rep 2'])
+        self.assertEqual(rollup[south.id]['deal_count'], 1)
+        with self.assertNumQueries(0):
+            region_team_rollup()
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            Quotation.objects.filter(quotation_number='Q2').get().delete()
+            # Still cached until the write commits
+            self.assertIn(south.id, region_team_rollup())
+        self.assertTrue(callbacks)
+        self.assertNotIn(south.id, region_team_rollup())
+
+    def test_rollup_by_period_fills_empty_periods(self):
+        from .rollups import rollup_by_period
+
+        today = timezone.now().date()
+        customer = Customer.objects.create(name='Acme', contact_person='A', email='a@x.com',
+                                           phone='1', region=self.region)
+        Quotation.objects.create(quotation_number='Q1', customer=customer, total_amount=Decimal('10'),
+                                 valid_until=today)
+        periods = [(today - timedelta(days=60), today - timedelta(days=31)),
+                   (today - timedelta(days=30), today)]
+        with self.assertNumQueries(1):
+            trend = rollup_by_period(Quotation.objects.all(), 'created_at', periods, quotations=Count('pk'))
+        self.assertEqual(trend, [{'quotations': 0}, {'quotations': 1}])
+
+    def test_time_series_fills_calendar_buckets(self):
+        from .kpi_builder import months_back
+        from .rollups import time_series
+
+        today = timezone.now().date()
+        Customer.objects.create(name='Acme', contact_person='A', email='a@x.com', phone='1', region=self.region)
+        with self.assertNumQueries(1):
+            series = time_series(Customer.objects.all(), 'created_at', 'month', months_back(today, 11), today,
+                                 customers=Count('pk'))
+        self.assertEqual(len(series), 12)
+        self.assertEqual(series[0]['period'], months_back(today, 11))
+        self.assertEqual([point['customers'] for point in series], [0] * 11 + [1])
+        self.assertEqual(series[-1]['label'], today.strftime('%b %Y'))
+
+        weekly = time_series(Customer.objects.all(), 'created_at', 'week', today - timedelta(days=14), today,
+                             customers=Count('pk'))
+        self.assertEqual(weekly[-1]['customers'], 1)
+        self.assertEqual(weekly[0]['period'].weekday(), 0)
+
+    def test_performance_analytics_trends_from_time_series(self):
+        today = timezone.now().date()
+        customer = Customer.objects.create(name='Acme', contact_person='A', email='a@x.com',
+                                           phone='1', region=self.region)
+        Quotation.objects.create(quotation_number='Q1', customer=customer, total_amount=Decimal('10'),
+                                 valid_until=today)
+        trends = self.render_context('performance_analytics')['trends']
+        self.assertEqual(len(trends), 6)
+        self.assertEqual(trends[-1]['period'], today.strftime('%b %Y'))
+        self.assertEqual([trend['quotations'] for trend in trends], [0] * 5 + [1])
+        self.assertEqual(trends[-1]['orders'], 0)
+
+
+class DailyFactTests(TestCase):
+    """Pre-aggregated daily facts for long-range analytics"""
+
+    def setUp(self):
+        self.region = Region.objects.create(name='North')
+        self.customer = Customer.objects.create(name='Acme', contact_person='A', email='a@x.com',
+                                                phone='1', region=self.region)
+
+    def quotation_facts(self):
+        from .daily_facts import fact_amount, fact_count, read_facts
+
+        today = timezone.localdate()
+        return list(read_facts('quotation', today - timedelta(days=364), today,
+                               total=fact_count(), accepted=fact_count('accepted'),
+                               accepted_value=fact_amount('accepted')))
+
+    def test_signals_keep_facts_in_step_with_rebuild(self):
+        from django.core.management import call_command
+        from .daily_facts import rebuild_facts
+        from .models import DailyFact
+
+        first = Quotation.objects.create(quotation_number='Q1', customer=self.customer, status='sent',
+                                         total_amount=Decimal('100'), valid_until=date.today(),
+                                         created_by_user_id=7)
+        Quotation.objects.create(quotation_number='Q2', customer=self.customer, status='accepted',
+                                 total_amount=Decimal('250'), valid_until=date.today(), created_by_user_id=7)
+        first.status = 'accepted'
+        first.save()
+        Quotation.objects.filter(quotation_number='Q2').get().delete()
+
+        with self.assertNumQueries(1):
+            rows = self.quotation_facts()
+        self.assertEqual([(row['total'], row['accepted'], row['accepted_value']) for row in rows],
+                         [(1, 1, Decimal('100'))])
+        fact = DailyFact.objects.get(source='quotation', row_count=1)
+        self.assertEqual((fact.region_id, fact.user_id, fact.status), (self.region.id, 7, 'accepted'))
+
+        incremental = set(DailyFact.objects.filter(row_count__gt=0).values_list(
+            'source', 'date', 'region_id', 'user_id', 'status', 'row_count', 'amount'))
+        rebuild_facts()
+        rebuilt = set(DailyFact.objects.values_list(
+            'source', 'date', 'region_id', 'user_id', 'status', 'row_count', 'amount'))
+        self.assertEqual(incremental, rebuilt)
+
+        # Bulk updates bypass the signals until the nightly backfill
+        Quotation.objects.update(status='rejected')
+        call_command('backfill_daily_facts', '--days', '1', stdout=StringIO())
+        self.assertEqual([(row['total'], row['accepted']) for row in self.quotation_facts()], [(1, 0)])
+
+    def test_initial_load_only_fills_empty_sources(self):
+        from django.core.management import call_command
+        from .models import DailyFact
+
+        Quotation.objects.create(quotation_number='Q1', customer=self.customer, status='sent',
+                                 total_amount=Decimal('100'), valid_until=date.today())
+        DailyFact.objects.all().delete()
+        call_command('backfill_daily_facts', '--all', '--if-empty', stdout=StringIO())
+        self.assertEqual(DailyFact.objects.filter(source='quotation').count(), 1)
+
+        Quotation.objects.update(status='accepted')
+        call_command('backfill_daily_facts', '--all', '--if-empty', stdout=StringIO())
+        self.assertEqual(DailyFact.objects.get(source='quotation').status, 'sent')
+
+    def test_legacy_visits_attributed_by_username(self):
+        from .daily_facts import fact_count, read_facts, rebuild_facts
+        from .models import DailyFact
+
+        now = timezone.now()
+        asha = User.objects.create_user(username='asha', password='x')
+        ghost = User.objects.create_user(username='ghost', password='x')
+        Visit.objects.create(customer=self.customer, visit_type='sales', scheduled_date=now, purpose='Demo',
+                             assigned_to_user_id=7, assigned_to_username='asha')
+        Visit.objects.create(customer=self.customer, visit_type='sales', scheduled_date=now, purpose='Demo',
+                             assigned_to=asha, status='completed')
+        Visit.objects.create(customer=self.customer, visit_type='sales', scheduled_date=now, purpose='Demo',
+                             assigned_to=ghost)
+
+        def per_user():
+            today = timezone.localdate()
+            return {row['user_id']: (row['total'], row['completed'])
+                    for row in read_facts('visit', today, today, group_by=('user_id',),
+                                          total=fact_count(), completed=fact_count('completed'))}
+
+        incremental = per_user()
+        self.assertEqual(incremental, {7: (2, 1), DailyFact.NO_USER: (1, 0)})
+        rebuild_facts(['visit'])
+        self.assertEqual(per_user(), incremental)
+
+
+
+class ActivityFeedTests(TestCase):
+    """Append-only activity feed"""
+
+    def setUp(self):
+        self.region = Region.objects.create(name='North')
+        self.customer = Customer.objects.create(name='Acme', contact_person='A', email='a@x.com', phone='1',
+                                                region=self.region, created_by_user_id=7,
+                                                created_by_full_name='Asha Rao')
+
+    def test_writes_append_rendered_events(self):
+        from .activity_feed import read_feed
+
+        quotation = Quotation.objects.create(quotation_number='Q1', customer=self.customer,
+                                             total_amount=Decimal('100'), valid_until=date.today(),
+                                             created_by_user_id=7)
+        quotation.payment_terms = 'Net 30'
+        quotation.save()
+        quotation.status = 'accepted'
+        quotation.save()
+
+        with self.assertNumQueries(1):
+            events, next_cursor = read_feed(limit=10)
+        self.assertIsNone(next_cursor)
+        self.assertEqual([event.title for event in events],
+                         ['Quotation Accepted: Q1', 'New Quotation: Q1', 'New Customer: Acme'])
+        self.assertEqual(events[-1].description, 'Added by Asha Rao')
+        self.assertEqual(events[1].description, 'For Acme - ₹100')
+        self.assertEqual(read_feed(user_id=8)[0], [])
+
+    def test_keyset_pages_do_not_overlap(self):
+        from .activity_feed import read_feed
+
+        for n in range(4):
+            Lead.objects.create(first_name='L', last_name=str(n), email=f'l{n}@x.com', source='website')
+        first, cursor = read_feed(limit=3)
+        second, last_cursor = read_feed(limit=3, cursor=cursor)
+        self.assertEqual(len(first) + len(second), 5)
+        self.assertFalse({e.id for e in first} & {e.id for e in second})
+        self.assertIsNone(last_cursor)
+        self.assertEqual([e.object_type for e in read_feed(types=['customer'])[0]], ['customer'])
+
+    def test_daily_report_lists_todays_events(self):
+        from django.test import RequestFactory
+        from django.contrib.sessions.backends.db import SessionStore
+        from .views import daily_reports
+
+        request = RequestFactory().get('/reports/daily/')
+        request.session = SessionStore()
+        request.user = User.objects.create_user(username='viewer', password='x')
+        response = daily_reports(request)
+        self.assertContains(response, 'New Customer: Acme')
+        self.assertContains(response, 'Added by Asha Rao')
+
+    def test_visit_created_from_posted_date_string(self):
+        from django.test import RequestFactory
+        from django.contrib.messages.storage.fallback import FallbackStorage
+        from django.contrib.sessions.backends.db import SessionStore
+        from .activity_feed import read_feed
+        from .views import customer_visit
+
+        request = RequestFactory().post('/visits/new/', {
+            'customer': self.customer.pk, 'visit_date': '2026-03-05', 'purpose': 'Demo', 'outcome': '',
+        })
+        request.session = SessionStore()
+        request.user = User.objects.create_user(username='viewer', password='x')
+        request._messages = FallbackStorage(request)
+        response = customer_visit(request)
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(read_feed(limit=1)[0][0].title, 'Visit Scheduled - Acme')
+        self.assertTrue(read_feed(limit=1)[0][0].description.endswith('on 05 Mar 2026'))
+
+    def test_initial_load_skipped_once_feed_has_events(self):
+        from django.core.management import call_command
+        from .models import ActivityEvent
+
+        ActivityEvent.objects.all().delete()
+        call_command('backfill_activity_events', '--all', '--if-empty', stdout=StringIO())
+        self.assertEqual(ActivityEvent.objects.count(), 1)
+        # bulk_create bypasses the signals; only a plain backfill picks it up
+        Customer.objects.bulk_create([Customer(name='Globex', contact_person='B', email='b@x.com', phone='2',
+                                               region=self.region)])
+        call_command('backfill_activity_events', '--all', '--if-empty', stdout=StringIO())
+        self.assertEqual(ActivityEvent.objects.count(), 1)
+
+
+class OwnerSummaryTests(TestCase):
+    """Per-owner WSR summaries on created_by_user_id"""
+
+    def test_wsr_summary_counts_and_recent_rows(self):
+        from django.core.management import call_command
+        from .models import WeeklySummary, CallingDetails, DSR
+        from .owner_summary import wsr_summary
+
+        for n, user_id in enumerate((7, 7, 8)):
+            WeeklySummary.objects.create(week_no=str(n), region='north', product_line='pumps',
+                                         created_by_user_id=user_id)
+        CallingDetails.objects.create(week_no='1', region='north', coordinator_name='C',
+                                      product_line='pumps', created_by_user_id=7)
+        DSR.objects.create(week_no='1', team='team_a', region='north', person='P', created_by_user_id=8)
+        call_command('rebuild_kpi_counters', stdout=StringIO())
+
+        with self.assertNumQueries(2):
+            summary = wsr_summary(7)
+        self.assertEqual(
+            [summary[name] for name in ('weekly_summary_count', 'hot_orders_count',
+                                        'calling_details_count', 'dsr_count')],
+            [2, 0, 1, 0],
+        )
+        self.assertEqual([row.week_no for row in summary['recent_weekly_summaries']], ['1', '0'])
+
+    def test_no_hrms_user_owns_nothing(self):
+        from .models import WeeklySummary
+        from .owner_summary import owned_rows
+
+        WeeklySummary.objects.create(week_no='1', region='north', product_line='pumps')
+        self.assertFalse(owned_rows(WeeklySummary, None).exists())
+
+
+class SearchIndexTests(TestCase):
+    """Full-text list search"""
+
+    def setUp(self):
+        from .search_index import rebuild_index
+
+        for n, company in enumerate(('Acme Pharma', 'Globex Labs', 'Acme Foods')):
+            Lead.objects.create(first_name='Lead', last_name=str(n), email=f'lead{n}@x.com',
+                                company=company, source='website', status='new' if n else 'lost')
+        rebuild_index(['lead'])
+
+    def test_matches_ranked_and_kept_in_sync(self):
+        from .search_index import get_search_kinds, search_ids
+
+        kind, = get_search_kinds(['lead'])
+        self.assertEqual(len(search_ids(kind, 'acme')), 2)
+        self.assertEqual(search_ids(kind, 'cme foo'), [Lead.objects.get(company='Acme Foods').pk])
+
+        lead = Lead.objects.get(company='Globex Labs')
+        lead.company = 'Acme Globex'
+        lead.save()
+        self.assertEqual(len(search_ids(kind, 'acme')), 3)
+        lead.delete()
+        self.assertEqual(len(search_ids(kind, 'acme')), 2)
+        self.assertIsNone(search_ids(kind, 'ac'))
+
+    def test_page_respects_filters_and_loads_one_page(self):
+        from .search_index import search_page
+
+        with self.assertNumQueries(3):
+            page = search_page(Lead.objects.filter(status='new'), 'acme', 1, 10)
+            rows = list(page.object_list)
+        self.assertEqual([lead.company for lead in rows], ['Acme Foods'])
+        self.assertEqual(page.paginator.count, 1)
+
+        # Short terms fall back to icontains
+        page = search_page(Lead.objects.all(), 'Ac', 1, 10)
+        self.assertEqual(page.paginator.count, 2)
+
+    def test_customer_locations_match_through_exists(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from .search_index import search_filter
+
+        region = Region.objects.create(name='West')
+        customer = Customer.objects.create(name='Initech', contact_person='Bill', email='bill@initech.com',
+                                           phone='1', region=region)
+        for address in ('Plot 4, MIDC', 'Plot 9, MIDC'):
+            CustomerLocation.objects.create(customer=customer, address=address, city='Pune',
+                                            state='MH', pincode='411001')
+
+        # Short terms use the fallback filters: one row per customer, no DISTINCT
+        with CaptureQueriesContext(connection) as captured:
+            self.assertEqual(list(search_filter(Customer.objects.all(), 'Pu')), [customer])
+        self.assertIn('EXISTS', captured.captured_queries[0]['sql'])
+        self.assertNotIn('DISTINCT', captured.captured_queries[0]['sql'])
+        # Cities are part of the indexed document
+        self.assertEqual(list(search_filter(Customer.objects.all(), 'pune')), [customer])
+
+    @override_settings(SEARCH_MAX_RESULTS=1)
+    def test_scope_applied_before_the_limit_and_filters_uncapped(self):
+        from .search_index import search, search_filter, search_page
+
+        # With a limit of one, an unscoped top match could be the 'lost' Acme Pharma lead
+        page = search_page(Lead.objects.filter(status='new'), 'acme', 1, 10)
+        self.assertEqual([lead.company for lead in page.object_list], ['Acme Foods'])
+        self.assertEqual(search_filter(Lead.objects.all(), 'acme').count(), 2)
+
+        leads, ranked = search(Lead.objects.all(), 'acme')
+        self.assertEqual(len(ranked), 1)
+        self.assertEqual(leads.count(), 2)
+
+    def test_search_within_an_empty_scope(self):
+        from .search_index import search, search_page
+
+        for leads in (Lead.objects.none(), Lead.objects.filter(pk__in=[])):
+            self.assertEqual(list(search_page(leads, 'acme', 1, 10).object_list), [])
+            narrowed, ranked = search(leads, 'acme')
+            self.assertEqual(ranked, [])
+            self.assertFalse(narrowed.exists())
+
+    def test_embedded_parent_text_reindexed_on_rename(self):
+        from .search_index import search_filter
+
+        region = Region.objects.create(name='West')
+        customer = Customer.objects.create(name='Initech', contact_person='Bill', email='bill@initech.com',
+                                           phone='1', region=region)
+        po = PurchaseOrder.objects.create(po_number='PO-1', customer=customer, total_amount=Decimal('10'),
+                                          received_date=date.today(), delivery_date=date.today(),
+                                          payment_terms='Net 30')
+        followup = PaymentFollowUp.objects.create(purchase_order=po, payment_method='credit',
+                                                  payment_terms_declared='Net 30', follow_up_date=date.today())
+        customer.name = 'Umbrella'
+        customer.save()
+        self.assertEqual(list(search_filter(PaymentFollowUp.objects.all(), 'umbrella')), [followup])
+        self.assertFalse(search_filter(PaymentFollowUp.objects.all(), 'initech').exists())
+
+    def test_initial_build_only_fills_empty_kinds(self):
+        from django.core.management import call_command
+        from .models import SearchEntry
+
+        SearchEntry.objects.filter(kind='lead').update(body='stale')
+        call_command('rebuild_search_index', '--if-empty', stdout=StringIO())
+        self.assertEqual(set(SearchEntry.objects.filter(kind='lead').values_list('body', flat=True)), {'stale'})
+
+        Customer.objects.create(name='Initech', contact_person='Bill', email='bill@initech.com', phone='1',
+                                region=Region.objects.create(name='West'))
+        SearchEntry.objects.filter(kind='customer').delete()
+        call_command('rebuild_search_index', '--if-empty', stdout=StringIO())
+        self.assertEqual(SearchEntry.objects.filter(kind='customer').count(), 1)
+
+
+class KeysetPaginatorTests(TestCase):
+    """Seek pagination for list views"""
+
+    def setUp(self):
+        for n in range(7):
+            Lead.objects.create(first_name='Lead', last_name=str(n), email=f'lead{n}@x.com',
+                                company='Acme', source='website', status='new')
+        # Ties on the ordering key are broken by primary key
+        Lead.objects.filter(last_name__in=['2', '3', '4']).update(created_at=timezone.now())
+
+    def test_cursors_walk_every_row_once_in_both_directions(self):
+        from .keyset_pagination import KeysetPaginator
+
+        leads = Lead.objects.order_by('-created_at')
+        paginator = KeysetPaginator(leads, 3)
+        expected = list(leads.order_by('-created_at', '-pk').values_list('pk', flat=True))
+
+        pages = [paginator.get_page(None)]
+        while pages[-1].has_next():
+            with self.assertNumQueries(1):
+                pages.append(paginator.get_page(pages[-1].next_page_number()))
+        self.assertEqual([lead.pk for page in pages for lead in page], expected)
+        self.assertEqual([page.number for page in pages], [1, 2, 3])
+        self.assertEqual(pages[-1].end_index(), 7)
+
+        back = paginator.get_page(pages[2].previous_page_number())
+        self.assertEqual([lead.pk for lead in back], expected[3:6])
+        self.assertTrue(back.has_next())
+        self.assertEqual(paginator.get_page(back.previous_page_number()).number, 1)
+
+    def test_page_numbers_and_bad_cursors(self):
+        from .keyset_pagination import KeysetPaginator
+
+        paginator = KeysetPaginator(Lead.objects.all(), 3, count_limit=5)
+        self.assertEqual(len(paginator.get_page('3')), 1)
+        self.assertEqual(paginator.get_page('not-a-cursor').number, 1)
+        self.assertEqual(paginator.count, 5)
+        self.assertFalse(paginator.count_is_exact)
+
+    def test_list_shows_capped_count_without_a_last_page(self):
+        from django.template.loader import render_to_string
+        from django.test import RequestFactory
+        from django.contrib.sessions.backends.db import SessionStore
+        from .keyset_pagination import KeysetPaginator
+        from .models import InquiryLog
+
+        request = RequestFactory().get('/inquiry-log/')
+        request.session = SessionStore()
+        request.user = User.objects.create_user(username='viewer', password='x')
+        page = KeysetPaginator(Lead.objects.all(), 3, count_limit=5).get_page(None)
+        html = render_to_string('marketing/inquiry_log_list.html',
+                                {'page_obj': page, 'is_paginated': True,
+                                 'offer_categories': InquiryLog.OFFER_CATEGORIES}, request=request)
+        self.assertIn('(5+)', html)
+        self.assertNotIn('Last', html)
+        self.assertNotIn('of 2', html)
+
+
+class IndexAdvisorTests(TestCase):
+    """Index proposals from query plans"""
+
+    def test_proposes_index_for_scan_and_measures_it(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from .index_advisor import evaluate, existing_indexes, propose_indexes
+
+        Lead.objects.create(first_name='A', last_name='B', email='a@x.com', company='Acme',
+                            source='website', status='new')
+        with CaptureQueriesContext(connection) as captured:
+            list(Lead.objects.filter(status='new').order_by('-created_at'))
+        proposals, scanned = propose_indexes({captured.captured_queries[0]['sql']: {'lead_list'}})
+
+        self.assertEqual(len(scanned), 1)
+        proposal, = proposals
+        self.assertEqual(proposal.fields, ['status', 'created_at'])
+        evaluate(proposal, repeat=1)
+        self.assertTrue(proposal.removes_scan)
+        self.assertIn('USING INDEX', ' '.join(proposal.after[0][0]))
+        # The trial index is rolled back
+        self.assertNotIn(('status', 'created_at'), existing_indexes(Lead._meta.db_table))
+
+
+class TypeaheadTests(TestCase):
+    """Typeahead choices for form and filter fields"""
+
+    def setUp(self):
+        from django.conf import settings
+        from django.core.cache import caches
+
+        # Choice lists and per-term answers live in the shared report cache
+        caches[settings.REPORT_CACHE_ALIAS].clear()
+        region = Region.objects.create(name='South')
+        for name in ('Acme Pharma', 'acme foods', 'Globex'):
+            Customer.objects.create(name=name, contact_person='Raj', email='raj@x.com', phone='1', region=region)
+
+    def test_customers_match_by_prefix_and_are_cached(self):
+        from .typeahead import match
+
+        labels = [choice['label'] for choice in match('customers', ' ACME ')]
+        self.assertEqual(labels, ['acme foods - Raj', 'Acme Pharma - Raj'])
+        with self.assertNumQueries(0):
+            match('customers', 'acme')
+        self.assertEqual(match('customers', 'pharma'), [])
+
+    def test_user_list_is_cached_until_a_user_changes(self):
+        from .typeahead import match, selected_choice
+
+        user = User.objects.create_user(username='asha', first_name='Asha', last_name='Rao')
+        self.assertEqual(match('users', 'rao'), [{'id': user.id, 'label': 'Asha Rao'}])
+        with self.assertNumQueries(0):
+            self.assertEqual(selected_choice('users', str(user.id))['label'], 'Asha Rao')
+        user.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save()
+        self.assertEqual(match('users', 'asha'), [])
+
+    @override_settings(HRMS_RBAC_ROW_SCOPE=True)
+    def test_lookup_checks_source_permission_and_row_scope(self):
+        import json
+        from django.core.cache import caches
+        from django.test import RequestFactory
+        from django.contrib.sessions.backends.db import SessionStore
+        from .hrms_principal import HRMSPrincipal
+        from .hrms_rbac import PermissionSnapshot
+        from .permissions import store_permission_snapshot
+        from .views import typeahead_lookup
+
+        caches['hrms_rbac'].clear()
+        Customer.objects.filter(name='acme foods').update(created_by_user_id=7)
+
+        def lookup(source, codes):
+            request = RequestFactory().get(f'/typeahead/{source}/', {'q': 'acme'})
+            request.session = SessionStore()
+            request.session['hrms_rbac_token'] = f'token-{len(codes)}'
+            request.user = HRMSPrincipal({'id': 7, 'username': 'asha'})
+            store_permission_snapshot(request, PermissionSnapshot(codes), user_id=7)
+            return typeahead_lookup(request, source)
+
+        self.assertEqual(lookup('campaigns', ['marketing.customer.view']).status_code, 403)
+        response = lookup('customers', ['marketing.customer.view'])
+        self.assertEqual([choice['label'] for choice in json.loads(response.content)['results']],
+                         ['acme foods - Raj'])
+        response = lookup('customers', ['marketing.customer.view', 'marketing.data.view_all'])
+        self.assertEqual(len(json.loads(response.content)['results']), 2)
@@ -0,0 +1,188 @@
+"""
+Typeahead lookups for form and filter fields
+
+Pages used to render every customer, user, campaign or work order into a
+<select>. The fields now fetch matches as the user types from
+``typeahead/<source>/?q=...`` (see marketing/typeahead_field.html):
+
+- Large tables (customers, work orders) are matched on a case-insensitive
+  prefix with a range lookup served by a functional index on LOWER(column).
+  Answers are cached per term for TYPEAHEAD_CACHE_TIMEOUT seconds.
+- Small choice lists (HRMS users, active campaigns) are cached whole for
+  TYPEAHEAD_CACHE_TIMEOUT seconds, dropped on writes, and filtered in memory.
+
+Each source names the view permissions that let a user query it, and
+sources over a row-scoped model only match rows in the caller's RowScope.
+"""
+import hashlib
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.exceptions import ValidationError
+from django.db.models.functions import Lower
+from .models import Campaign, Customer, WorkOrder
+from .permission_filters import ROW_SCOPE_FIELDS
+from .permissions import MARKETING_PERMISSIONS
+from .report_cache import get_report, register_report
+
+# Sorts after any character a label contains, closing the prefix range
+PREFIX_END = '\uffff'
+
+
+class TypeaheadSource:
+    """Where one field's choices come from"""
+    __slots__ = ('name', 'queryset', 'label', 'prefix_field', 'params', 'permissions')
+
+    def __init__(self, name, queryset, label, prefix_field=None, params=(), permissions=()):
+        self.name = name
+        self.queryset = queryset
+        self.label = label
+        self.prefix_field = prefix_field
+        self.params = tuple(params)
+        self.permissions = tuple(permissions)
+
+    def choice(self, obj):
+        return {'id': obj.pk, 'label': self.label(obj)}
+
+
+_sources = {}
+
+
+def register_typeahead(name, queryset, label, prefix_field=None, params=(), models=(), permissions=()):
+    """
+    Serve ``queryset`` rows as typeahead choices
+
+    Args:
+        name (str): Source name used in the endpoint URL
+        queryset: Rows offered as choices
+        label (callable): label(obj) -> text shown for a row
+        prefix_field (str): Column matched by prefix through its LOWER() index;
+            without one the whole choice list is cached and filtered in memory
+        params (iterable): Query parameters passed through as exact filters
+        models (iterable): Models whose writes drop the cached choice list
+        permissions (iterable): Permission codes, any one of which allows lookups
+    """
+    _sources[name] = TypeaheadSource(name, queryset, label, prefix_field, params, permissions)
+    if prefix_field is None:
+        register_report(_list_key(name), *models)
+
+
+def source_permissions(name=None):
+    """
+    Permission codes that allow lookups on source ``name``
+
+    Args:
+        name (str): Registered source name, or None for the codes of every source
+
+    Raises:
+        KeyError: Unknown source
+    """
+    if name is None:
+        return sorted({code for source in _sources.values() for code in source.permissions})
+    return _sources[name].permissions
+
+
+def _list_key(name):
+    return f'typeahead:{name}'
+
+
+def _timeout():
+    return getattr(settings, 'TYPEAHEAD_CACHE_TIMEOUT', 60)
+
+
+def _normalize(term):
+    return ' '.join(term.lower().split())
+
+
+def choice_list(source):
+    """Every choice of a small source, from the cache"""
+    return get_report(_list_key(source.name), lambda: [source.choice(obj) for obj in source.queryset.all()],
+                      timeout=_timeout())
+
+
+def _lookup(source, term, filters, row_filter, limit):
+    rows = source.queryset.filter(**filters)
+    if row_filter is not None:
+        rows = rows.filter(row_filter)
+    rows = rows.annotate(_prefix=Lower(source.prefix_field))
+    if term:
+        rows = rows.filter(_prefix__gte=term, _prefix__lt=term + PREFIX_END)
+    return [source.choice(obj) for obj in rows.order_by('_prefix')[:limit]]
+
+
+def match(name, query, params=None, limit=None, scope=None):
+    """
+    Choices of source ``name`` matching what the user typed
+
+    Args:
+        name (str): Registered source name
+        query (str): Typed text; matches labels (or label words) starting with it
+        params (dict): Request parameters; the source's params become filters
+        limit (int): Maximum choices (default: TYPEAHEAD_LIMIT)
+        scope (RowScope): Caller's row scope; restricts row-scoped prefix sources
+
+    Returns:
+        list: [{'id': pk, 'label': text}]
+
+    Raises:
+        KeyError: Unknown source
+    """
+    source = _sources[name]
+    term = _normalize(query)
+    limit = limit or getattr(settings, 'TYPEAHEAD_LIMIT', 10)
+
+    if source.prefix_field is None:
+        return [choice for choice in choice_list(source)
+                if not term or any(word.startswith(term)
+                                   for word in (choice['label'].lower(), *choice['label'].lower().split()))][:limit]
+
+    filters = {param: params[param] for param in source.params if params and params.get(param)}
+    row_filter = None
+    if scope is not None and source.queryset.model in ROW_SCOPE_FIELDS:
+        row_filter = scope.q_for(source.queryset.model)
+    # The row filter names the user (and their regions), so scoped answers are cached per scope
+    digest = hashlib.md5(repr((term, sorted(filters.items()), str(row_filter), limit)).encode()).hexdigest()
+    cache = caches[getattr(settings, 'REPORT_CACHE_ALIAS', 'default')]
+    key = f'{_list_key(name)}:{digest}'
+    choices = cache.get(key)
+    if choices is None:
+        choices = _lookup(source, term, filters, row_filter, limit)
+        cache.set(key, choices, timeout=_timeout())
+    return choices
+
+
+def selected_choice(name, value):
+    """
+    The choice for an already selected value, so the field can show its label
+
+    Returns:
+        dict: {'id', 'label'}, or None if nothing valid is selected
+    """
+    if not value:
+        return None
+    source = _sources[name]
+    if source.prefix_field is None:
+        return next((choice for choice in choice_list(source) if str(choice['id']) == str(value)), None)
+    try:
+        obj = source.queryset.filter(pk=value).first()
+    except (ValueError, ValidationError):
+        return None
+    return source.choice(obj) if obj else None
+
+
+User = get_user_model()
+
+register_typeahead('customers', Customer.objects.all(), lambda c: f'{c.name} - {c.contact_person}',
+                   prefix_field='name', permissions=(MARKETING_PERMISSIONS['customer.view'],))
+# Work order labels carry the customer name
+register_typeahead('work_orders', WorkOrder.objects.select_related('purchase_order__customer'),
+                   lambda wo: f'{wo.work_order_number} - {wo.purchase_order.customer.name}',
+                   prefix_field='work_order_number', params=('status',),
+                   permissions=(MARKETING_PERMISSIONS['customer.view'],))
+# HRMS users as matched to their Django User rows by username (the legacy FKs the forms fill);
+# offered as assignees on the lead and visit pages
+register_typeahead('users', User.objects.filter(is_active=True).order_by('first_name', 'last_name', 'username'),
+                   lambda u: u.get_full_name() or u.username, models=(User,),
+                   permissions=(MARKETING_PERMISSIONS['lead.view'], MARKETING_PERMISSIONS['visit.view']))
+register_typeahead('campaigns', Campaign.objects.filter(status='active').order_by('name'),
+                   lambda c: c.name, models=(Campaign,), permissions=(MARKETING_PERMISSIONS['campaign.view'],))
@@ -12,6 +12,9 @@ urlpatterns = [
     path('dashboard/recent-activities/', views.recent_activities_details, name='recent_activities_details'),
     path('dashboard/alerts-notifications/', views.alerts_notifications_details, name='alerts_notifications_details'),
     
+    # Typeahead choices for form and filter fields (customers, users, campaigns, work_orders)
+    path('typeahead/<str:source>/', views.typeahead_lookup, name='typeahead'),
+    
     # Customers
     path('customers/', views.customer_list, name='customer_list'),
     path('customers/create/', views.customer_registration, name='customer_create'),
@@ -138,6 +141,7 @@ urlpatterns = [
     # Weekly Status Report System
     path('reports/wsr/dashboard/', views.wsr_dashboard, name='wsr_dashboard'),
     path('reports/wsr/sheets/', views.wsr_sheets, name='wsr_sheets'),
+    path('reports/wsr/api/summary/', views.wsr_summary_api, name='wsr_summary_api'),
     
     # MIS Reports
     path('mis/visitor-attendance/', views.visitor_attendance, name='visitor_attendance'),
@@ -3,6 +3,7 @@ Custom fields and mixins for storing HRMS user information
 instead of Django User ForeignKeys
 """
 from django.db import models
+from marketing_app.hrms_principal import get_principal
 
 
 class HRMSUserInfoMixin(models.Model):
@@ -57,27 +58,8 @@ def get_user_info_from_request(request):
     Returns:
         dict: User information dict with id, username, email, first_name, last_name
     """
-    user_info = request.session.get('hrms_user_info', {})
-    user_data = user_info.get('user', {})
-    
-    if not user_data:
-        # Fallback to employee data
-        employee_data = user_info.get('employee', {})
-        if employee_data:
-            return {
-                'id': employee_data.get('id'),
-                'username': request.session.get('username', ''),
-                'email': employee_data.get('email', ''),
-                'first_name': employee_data.get('first_name', ''),
-                'last_name': employee_data.get('last_name', ''),
-            }
+    principal = get_principal(request)
+    if principal is None:
         return {}
     
-    return {
-        'id': user_data.get('id'),
-        'username': user_data.get('username', ''),
-        'email': user_data.get('email', ''),
-        'first_name': user_data.get('first_name', ''),
-        'last_name': user_data.get('last_name', ''),
-    }
-
+    return principal.as_dict()
@@ -1,30 +1,26 @@
 """
 Helper functions to get and set user information from HRMS authentication
 """
-from marketing_app.user_fields import get_user_info_from_request
+from marketing_app.hrms_principal import get_principal
 
 
 def get_user_info_dict(request):
     """
-    Get user information dict from request session
+    Get user information dict from the request's HRMS principal
     
     Returns:
         dict: User info with id, username, email, first_name, last_name, full_name
     """
-    user_data = get_user_info_from_request(request)
+    principal = get_principal(request)
     
-    if user_data:
-        first_name = user_data.get('first_name', '')
-        last_name = user_data.get('last_name', '')
-        full_name = f"{first_name} {last_name}".strip()
-        
+    if principal is not None:
         return {
-            'user_id': user_data.get('id'),
-            'username': user_data.get('username', ''),
-            'email': user_data.get('email', ''),
-            'first_name': first_name,
-            'last_name': last_name,
-            'full_name': full_name,
+            'user_id': principal.id,
+            'username': principal.username,
+            'email': principal.email,
+            'first_name': principal.first_name,
+            'last_name': principal.last_name,
+            'full_name': principal.full_name,
         }
     
     return {
@@ -2,6 +2,7 @@
 Utility functions to get Django User from HRMS authentication
 """
 from django.contrib.auth import get_user_model
+from marketing_app.hrms_principal import get_principal
 
 User = get_user_model()
 
@@ -10,6 +11,9 @@ def get_django_user(request):
     """
     Get the actual Django User instance from request
     
+    The lookup for HRMS users is memoized on the request principal, so
+    repeated calls within a request cost one query at most.
+    
     Args:
         request: Django request object
     
@@ -23,20 +27,9 @@ def get_django_user(request):
     if isinstance(request.user, User):
         return request.user
     
-    # If it's an HRMSUser mock object, get the real user
-    if hasattr(request.user, 'username'):
-        try:
-            # Get username from HRMS user info in session
-            user_info = request.session.get('hrms_user_info', {})
-            user_data = user_info.get('user', {})
-            username = user_data.get('username') or request.user.username
-            
-            if username:
-                return User.objects.get(username=username)
-        except User.DoesNotExist:
-            pass
-        except Exception:
-            pass
+    # HRMS principal: matching Django user row by username
+    principal = get_principal(request)
+    if principal is not None:
+        return principal.django_user
     
     return None
-
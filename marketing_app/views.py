@@ -4,14 +4,32 @@ from django.contrib import messages
 from marketing_app.hrms_rbac import hrms_login_required
 from marketing_app.permissions import (
     require_permission, require_any_permission, check_permission,
-    MARKETING_PERMISSIONS
+    declare_permissions, MARKETING_PERMISSIONS
 )
 from marketing_app.user_utils import get_django_user
+from marketing_app.permission_filters import (
+    filter_campaigns_by_permission, filter_leads_by_permission,
+    filter_customers_by_permission, filter_visits_by_permission,
+    get_row_scope, SCOPE_ALL, SCOPE_REGION, SCOPE_OWN
+)
+from marketing_app.kpi_builder import KPIQuery, date_range, day_start, month_bounds, months_back, percentage
+from marketing_app.activity_feed import ACTIVITY_FILTERS, read_feed
+from marketing_app.keyset_pagination import KeysetPaginator
+from marketing_app.owner_summary import owned_rows, owner_counts, wsr_summary
+from marketing_app.search_index import ranked_page, search, search_filter, search_page
+from marketing_app.typeahead import match as typeahead_match, selected_choice, source_permissions
+from marketing_app.daily_facts import fact_amount, fact_count, read_facts
+from marketing_app.rollups import UserRollup, region_team_rollup, time_series
+from marketing_app.kpi_counters import (
+    read_counts, rows_key, ALL_USERS, ACTIVE_LEAD_STATUSES, IN_PRODUCTION_STATUSES
+)
 from marketing_app.user_helpers import get_user_info_dict, set_user_info_on_model
-from django.http import JsonResponse
+from django.http import Http404, JsonResponse
 from django.core.paginator import Paginator
 from django.db.models import (
     Q,
+    Exists,
+    OuterRef,
     Count,
     Sum,
     Max,
@@ -25,85 +43,57 @@ from django.utils import timezone
 from datetime import datetime, timedelta
 from decimal import Decimal
 import calendar
-from .models import Campaign, Lead, EmailTemplate, CampaignMetric, LeadActivity, Customer, CustomerLocation, Region, Visit, VisitParticipant, Expense, Exhibition, Quotation, PurchaseOrder, PaymentFollowUp, WorkOrder, Manufacturing, Dispatch, URS, GADrawing, TechnicalDiscussion, Negotiation, QuotationRevision, QCTracking, ProductionPlan, PackingDetails, DispatchChecklist, BudgetCategory, AnnualExhibitionBudget, BudgetAllocation, BudgetApproval, InquiryLog, FollowUpStatus, ProjectToday, OrderExpectedNextMonth, MISPurchaseOrder, NewData, NewDataDetails, ODPlan, ODPlanVisitReport, ODPlanRemarks, PODetails, POStatus, WorkOrderFormat, WeeklySummary, CallingDetails, HotOrders, PendingPayment2024, PendingPayment2025, OrderLoss, DSR
+from .models import Campaign, Lead, EmailTemplate, CampaignMetric, LeadActivity, Customer, CustomerLocation, Region, Visit, VisitParticipant, Expense, Exhibition, Quotation, PurchaseOrder, PaymentFollowUp, WorkOrder, Manufacturing, Dispatch, URS, GADrawing, TechnicalDiscussion, Negotiation, QuotationRevision, QCTracking, ProductionPlan, PackingDetails, DispatchChecklist, BudgetCategory, AnnualExhibitionBudget, BudgetAllocation, BudgetApproval, InquiryLog, FollowUpStatus, ProjectToday, OrderExpectedNextMonth, MISPurchaseOrder, NewData, NewDataDetails, ODPlan, ODPlanVisitReport, ODPlanRemarks, PODetails, POStatus, WorkOrderFormat, WeeklySummary, CallingDetails, HotOrders, PendingPayment2024, PendingPayment2025, OrderLoss, DSR, DailyFact
 from django.contrib.auth import get_user_model
 import sys
 
 User = get_user_model()
 
 @hrms_login_required
+@declare_permissions('campaign.view', 'customer.view', 'lead.view', 'reports.view')
 @require_permission(MARKETING_PERMISSIONS['campaign.view'])
 def marketing_dashboard(request):
     """Marketing Dashboard View"""
-    from marketing_app.permission_filters import (
-        filter_campaigns_by_permission, filter_leads_by_permission,
-        filter_customers_by_permission, can_view_reports
-    )
-    
     # Get current date and calculate date ranges
     today = timezone.now().date()
     last_30_days = today - timedelta(days=30)
     last_7_days = today - timedelta(days=7)
     
-    # Filter data based on permissions
-    customers_qs = Customer.objects.all()
-    customers_qs = filter_customers_by_permission(request, customers_qs)
-    total_customers = customers_qs.count()
-    active_leads = Lead.objects.filter(status__in=['new', 'contacted', 'qualified']).count()
-    pending_quotations = Quotation.objects.filter(status='sent').count()
-    production_orders = Manufacturing.objects.filter(status__in=['started', 'in_progress', 'qc_started']).count()
-    
-    # Recent activities
-    recent_activities = []
-    
-    # Recent POs
-    recent_pos = PurchaseOrder.objects.select_related('customer').order_by('-created_at')[:3]
-    for po in recent_pos:
-        recent_activities.append({
-            'type': 'po_received',
-            'title': f'PO Received from {po.customer.name}',
-            'description': f'Purchase Order #{po.po_number} for ₹{po.total_amount}',
-            'status': 'Completed',
-            'time': po.created_at,
-            'icon': 'check-circle',
-            'color': 'green'
-        })
-    
-    # Recent visits
-    recent_visits = Visit.objects.select_related('customer').order_by('-created_at')[:3]
-    for visit in recent_visits:
-        recent_activities.append({
-            'type': 'visit_completed',
-            'title': f'Visit Completed - {visit.customer.name}',
-            'description': f'{visit.get_visit_type_display()} completed',
-            'status': 'In Progress',
-            'time': visit.created_at,
-            'icon': 'map-pin',
-            'color': 'blue'
-        })
-    
-    # Recent production
-    recent_manufacturing = Manufacturing.objects.select_related('work_order__purchase_order__customer').order_by('-created_at')[:3]
-    for mfg in recent_manufacturing:
-        recent_activities.append({
-            'type': 'production_started',
-            'title': f'Production Started - Batch #{mfg.batch_number}',
-            'description': f'Manufacturing started for {mfg.work_order.purchase_order.customer.name}',
-            'status': 'Started',
-            'time': mfg.created_at,
-            'icon': 'factory',
-            'color': 'orange'
-        })
-    
-    # Sort activities by time
-    recent_activities.sort(key=lambda x: x['time'], reverse=True)
+    # Headline numbers come from the KPI counters in one query. Region-scoped
+    # users, missing view permissions and a not-yet-built store fall back to
+    # COUNT(*) on the permission-filtered querysets.
+    scope = get_row_scope(request)
+    owner = {SCOPE_ALL: ALL_USERS, SCOPE_OWN: scope.user_id}.get(scope.level)
+    can_view_customers = request.perms.has(MARKETING_PERMISSIONS['customer.view'])
+    can_view_leads = request.perms.has(MARKETING_PERMISSIONS['lead.view'])
+    counts = read_counts({
+        'customers.total': (
+            owner if can_view_customers else None,
+            filter_customers_by_permission(request, Customer.objects.all()),
+        ),
+        'leads.active': (
+            owner if can_view_leads else None,
+            filter_leads_by_permission(request, Lead.objects.filter(status__in=ACTIVE_LEAD_STATUSES)),
+        ),
+        'quotations.sent': (ALL_USERS, Quotation.objects.filter(status='sent')),
+        'manufacturing.in_production': (
+            ALL_USERS, Manufacturing.objects.filter(status__in=IN_PRODUCTION_STATUSES),
+        ),
+    })
+    total_customers = counts['customers.total']
+    active_leads = counts['leads.active']
+    pending_quotations = counts['quotations.sent']
+    production_orders = counts['manufacturing.in_production']
+    
+    # Recent activities, newest first from the activity feed
+    recent_activities, _ = read_feed(limit=4)
     
     context = {
         'total_customers': total_customers,
         'active_leads': active_leads,
         'pending_quotations': pending_quotations,
         'production_orders': production_orders,
-        'recent_activities': recent_activities[:4],
+        'recent_activities': recent_activities,
     }
     
     return render(request, 'marketing/dashboard.html', context)
@@ -129,10 +119,12 @@ def campaign_form(request):
 
 
 @hrms_login_required
+@declare_permissions('campaign.view', 'campaign.create', 'campaign.edit', 'campaign.delete')
 @require_permission(MARKETING_PERMISSIONS['campaign.view'])
 def campaign_list(request):
     """Campaign List View"""
     campaigns = Campaign.objects.select_related('created_by').order_by('-created_at')
+    campaigns = filter_campaigns_by_permission(request, campaigns)
     
     # Search functionality
     search_query = request.GET.get('search', '')
@@ -158,6 +150,9 @@ def campaign_list(request):
         'search_query': search_query,
         'status_filter': status_filter,
         'status_choices': Campaign.STATUS_CHOICES,
+        'can_create_campaign': request.perms['campaign.create'],
+        'can_edit_campaign': request.perms['campaign.edit'],
+        'can_delete_campaign': request.perms['campaign.delete'],
     }
     
     return render(request, 'marketing/campaign_list.html', context)
@@ -230,17 +225,9 @@ def campaign_detail(request, campaign_id):
 def lead_list(request):
     """Lead List View"""
     leads = Lead.objects.select_related('campaign').order_by('-created_at')
+    leads = filter_leads_by_permission(request, leads)
     
-    # Search functionality
     search_query = request.GET.get('search', '')
-    if search_query:
-        leads = leads.filter(
-            Q(first_name__icontains=search_query) |
-            Q(last_name__icontains=search_query) |
-            Q(email__icontains=search_query) |
-            Q(company__icontains=search_query) |
-            Q(phone__icontains=search_query)
-        )
     
     # Filter by status
     status_filter = request.GET.get('status', '')
@@ -266,10 +253,11 @@ def lead_list(request):
     if campaign_filter:
         leads = leads.filter(campaign_id=campaign_filter)
     
-    # Pagination
-    paginator = Paginator(leads, 15)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Full-text search, best matches first; otherwise seek pagination
+    if search_query:
+        page_obj = search_page(leads, search_query, request.GET.get('page'), 15)
+    else:
+        page_obj = KeysetPaginator(leads, 15).get_page(request.GET.get('page'))
     
     context = {
         'page_obj': page_obj,
@@ -280,8 +268,9 @@ def lead_list(request):
         'campaign_filter': campaign_filter,
         'status_choices': Lead.STATUS_CHOICES,
         'source_choices': Lead.SOURCE_CHOICES,
-        'users': User.objects.filter(is_active=True),
-        'campaigns': Campaign.objects.filter(status='active'),
+        # Filter fields load their choices from the typeahead endpoints
+        'assigned_choice': selected_choice('users', assigned_filter),
+        'campaign_choice': selected_choice('campaigns', campaign_filter),
     }
     
     return render(request, 'marketing/lead_list.html', context)
@@ -342,7 +331,7 @@ def lead_detail(request, lead_id):
 @login_required
 def email_templates(request):
     """Email Templates List"""
-    templates = EmailTemplate.objects.filter(created_by=request.user).order_by('-created_at')
+    templates = owned_rows(EmailTemplate, get_user_info_dict(request)['user_id']).order_by('-created_at')
     
     context = {
         'templates': templates,
@@ -504,16 +493,9 @@ def production_planning(request):
         status__in=['draft', 'approved', 'in_progress']
     ).count()
     
-    # Get work orders for form
-    work_orders = WorkOrder.objects.select_related('purchase_order__customer').filter(status='approved')
-    
-    # Get users for assignment
-    users = User.objects.filter(is_active=True)
-    
+    # Work order and assignee fields load their choices from the typeahead endpoints
     context = {
         'production_plans': production_plans,
-        'work_orders': work_orders,
-        'users': users,
         'total_plans': total_plans,
         'in_progress_plans': in_progress_plans,
         'completed_plans': completed_plans,
@@ -603,49 +585,29 @@ def progress_tracking_dashboard(request):
     end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
     
     # Sales Progress
-    total_quotations = Quotation.objects.filter(created_at__date__range=[start_date, end_date]).count()
-    accepted_quotations = Quotation.objects.filter(
-        created_at__date__range=[start_date, end_date],
-        status='accepted'
-    ).count()
-    conversion_rate = (accepted_quotations / total_quotations * 100) if total_quotations > 0 else 0
+    quotations = (KPIQuery(Quotation, 'created_at', start_date, end_date)
+                  .count('total').count('accepted', status='accepted').run())
     
     # Production Progress
-    total_manufacturing = Manufacturing.objects.filter(created_at__date__range=[start_date, end_date]).count()
-    completed_manufacturing = Manufacturing.objects.filter(
-        created_at__date__range=[start_date, end_date],
-        status='ready_dispatch'
-    ).count()
-    production_completion_rate = (completed_manufacturing / total_manufacturing * 100) if total_manufacturing > 0 else 0
+    manufacturing = (KPIQuery(Manufacturing, 'created_at', start_date, end_date)
+                     .count('total').count('completed', status='ready_dispatch').run())
     
     # Visit Progress
-    total_visits = Visit.objects.filter(scheduled_date__date__range=[start_date, end_date]).count()
-    completed_visits = Visit.objects.filter(
-        scheduled_date__date__range=[start_date, end_date],
-        status='completed'
-    ).count()
-    visit_completion_rate = (completed_visits / total_visits * 100) if total_visits > 0 else 0
+    visits_in_range = Visit.objects.filter(date_range(Visit, 'scheduled_date', start_date, end_date))
+    visits = KPIQuery(visits_in_range).count('total').count('completed', status='completed').run()
     
     # Lead Progress
-    total_leads = Lead.objects.filter(created_at__date__range=[start_date, end_date]).count()
-    converted_leads = Lead.objects.filter(
-        created_at__date__range=[start_date, end_date],
-        status='converted'
-    ).count()
-    lead_conversion_rate = (converted_leads / total_leads * 100) if total_leads > 0 else 0
+    leads = (KPIQuery(Lead, 'created_at', start_date, end_date)
+             .count('total').count('converted', status='converted').run())
     
     # Regional Performance
-    regional_performance = Visit.objects.filter(
-        scheduled_date__date__range=[start_date, end_date]
-    ).values('customer__region__name').annotate(
+    regional_performance = visits_in_range.values('customer__region__name').annotate(
         total_visits=Count('id'),
         completed_visits=Count('id', filter=Q(status='completed'))
     )
     
     # User Performance
-    user_performance = Visit.objects.filter(
-        scheduled_date__date__range=[start_date, end_date]
-    ).values('assigned_to__username').annotate(
+    user_performance = visits_in_range.values('assigned_to__username').annotate(
         total_visits=Count('id'),
         completed_visits=Count('id', filter=Q(status='completed'))
     )
@@ -653,18 +615,18 @@ def progress_tracking_dashboard(request):
     context = {
         'start_date': start_date,
         'end_date': end_date,
-        'total_quotations': total_quotations,
-        'accepted_quotations': accepted_quotations,
-        'conversion_rate': round(conversion_rate, 2),
-        'total_manufacturing': total_manufacturing,
-        'completed_manufacturing': completed_manufacturing,
-        'production_completion_rate': round(production_completion_rate, 2),
-        'total_visits': total_visits,
-        'completed_visits': completed_visits,
-        'visit_completion_rate': round(visit_completion_rate, 2),
-        'total_leads': total_leads,
-        'converted_leads': converted_leads,
-        'lead_conversion_rate': round(lead_conversion_rate, 2),
+        'total_quotations': quotations['total'],
+        'accepted_quotations': quotations['accepted'],
+        'conversion_rate': percentage(quotations['accepted'], quotations['total']),
+        'total_manufacturing': manufacturing['total'],
+        'completed_manufacturing': manufacturing['completed'],
+        'production_completion_rate': percentage(manufacturing['completed'], manufacturing['total']),
+        'total_visits': visits['total'],
+        'completed_visits': visits['completed'],
+        'visit_completion_rate': percentage(visits['completed'], visits['total']),
+        'total_leads': leads['total'],
+        'converted_leads': leads['converted'],
+        'lead_conversion_rate': percentage(leads['converted'], leads['total']),
         'regional_performance': regional_performance,
         'user_performance': user_performance,
     }
@@ -681,56 +643,65 @@ def performance_analytics_detailed(request):
     start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
     end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
     
-    # Sales Performance
-    sales_data = Quotation.objects.filter(
-        created_at__date__range=[start_date, end_date]
-    ).values('created_at__date').annotate(
-        total_quotations=Count('id'),
-        accepted_quotations=Count('id', filter=Q(status='accepted')),
-        total_value=Sum('total_amount'),
-        accepted_value=Sum('total_amount', filter=Q(status='accepted'))
-    ).order_by('created_at__date')
+    # Daily series come from the pre-aggregated fact tables, so the cost
+    # grows with the number of days rather than the number of source rows
+    sales_data = read_facts(
+        'quotation', start_date, end_date,
+        total_quotations=fact_count(),
+        accepted_quotations=fact_count('accepted'),
+        total_value=fact_amount(),
+        accepted_value=fact_amount('accepted'),
+    )
     
     # Production Performance
-    production_data = Manufacturing.objects.filter(
-        created_at__date__range=[start_date, end_date]
-    ).values('created_at__date').annotate(
-        total_batches=Count('id'),
-        completed_batches=Count('id', filter=Q(status='ready_dispatch'))
-    ).order_by('created_at__date')
+    production_data = read_facts(
+        'manufacturing', start_date, end_date,
+        total_batches=fact_count(),
+        completed_batches=fact_count('ready_dispatch'),
+    )
     
     # Visit Performance
-    visit_data = Visit.objects.filter(
-        scheduled_date__date__range=[start_date, end_date]
-    ).values('scheduled_date__date').annotate(
-        total_visits=Count('id'),
-        completed_visits=Count('id', filter=Q(status='completed'))
-    ).order_by('scheduled_date__date')
+    visit_data = read_facts(
+        'visit', start_date, end_date,
+        total_visits=fact_count(),
+        completed_visits=fact_count('completed'),
+    )
     
     # Lead Performance
-    lead_data = Lead.objects.filter(
-        created_at__date__range=[start_date, end_date]
-    ).values('created_at__date').annotate(
-        total_leads=Count('id'),
-        converted_leads=Count('id', filter=Q(status='converted'))
-    ).order_by('created_at__date')
+    lead_data = read_facts(
+        'lead', start_date, end_date,
+        total_leads=fact_count(),
+        converted_leads=fact_count('converted'),
+    )
     
     # Top Performing Users
-    top_users = Visit.objects.filter(
-        scheduled_date__date__range=[start_date, end_date]
-    ).values('assigned_to__username').annotate(
-        total_visits=Count('id'),
-        completed_visits=Count('id', filter=Q(status='completed'))
-    ).annotate(
+    top_users = list(read_facts(
+        'visit', start_date, end_date, group_by=('user_id',),
+        total_visits=fact_count(),
+        completed_visits=fact_count('completed'),
+    ).exclude(user_id=DailyFact.NO_USER).annotate(
         completion_rate=ExpressionWrapper(
             F('completed_visits') * 100.0 / F('total_visits'),
             output_field=FloatField()
         )
-    ).order_by('-completion_rate')[:10]
+    ).order_by('-completion_rate')[:10])
+    user_names = {
+        row['assigned_to_user_id']: row
+        for row in Visit.objects.filter(
+            assigned_to_user_id__in=[row['user_id'] for row in top_users]
+        ).values('assigned_to_user_id').annotate(
+            username=Max('assigned_to_username'),
+            full_name=Max('assigned_to_full_name'),
+        ).order_by()
+    }
+    for row in top_users:
+        names = user_names.get(row['user_id'], {})
+        row['username'] = names.get('username') or ''
+        row['full_name'] = names.get('full_name') or ''
     
     # Top Customers
     top_customers = Visit.objects.filter(
-        scheduled_date__date__range=[start_date, end_date]
+        date_range(Visit, 'scheduled_date', start_date, end_date)
     ).values('customer__name').annotate(
         total_visits=Count('id'),
         completed_visits=Count('id', filter=Q(status='completed'))
@@ -1224,17 +1195,8 @@ def customer_list(request):
     status_filter = request.GET.get('status', '')
     
     # Get all customers with locations
-    customers = Customer.objects.prefetch_related('locations').all()
-    
-    # Apply search filter
-    if search_query:
-        customers = customers.filter(
-            Q(name__icontains=search_query) |
-            Q(contact_person__icontains=search_query) |
-            Q(email__icontains=search_query) |
-            Q(phone__icontains=search_query) |
-            Q(locations__address__icontains=search_query)
-        ).distinct()
+    customers = Customer.objects.prefetch_related('locations').order_by('pk')
+    customers = filter_customers_by_permission(request, customers)
     
     # Apply region filter
     if region_filter:
@@ -1246,33 +1208,34 @@ def customer_list(request):
     elif status_filter == 'inactive':
         customers = customers.filter(customer_type='lapsed')
     
-    # Get customer statistics
-    customer_stats = {
-        'total_customers': Customer.objects.count(),
-        'active_customers': Customer.objects.filter(customer_type='existing').count(),
-        'customers_with_locations': Customer.objects.filter(locations__isnull=False).distinct().count(),
-        'new_customers_this_month': Customer.objects.filter(
-            created_at__month=datetime.now().month,
-            created_at__year=datetime.now().year
-        ).count(),
-    }
+    # Apply search (full-text index, run once for the counts and the page)
+    customers, ranked = search(customers, search_query)
+    
+    # Statistics over the same scoped, filtered customers as the list
+    today = timezone.localdate()
+    listed = customers.order_by()
+    customer_stats = listed.aggregate(
+        total_customers=Count('pk'),
+        active_customers=Count('pk', filter=Q(customer_type='existing')),
+        customers_with_locations=Count('pk', filter=Q(Exists(CustomerLocation.objects.filter(customer=OuterRef('pk'))))),
+        new_customers_this_month=Count('pk', filter=date_range(Customer, 'created_at', *month_bounds(today.year, today.month))),
+    )
     
-    # Get region-wise distribution
+    # Get region-wise distribution (one grouped query)
+    region_counts = dict(listed.values_list('region_id').annotate(count=Count('pk')))
+    regions = list(Region.objects.all())
     region_distribution = []
-    regions = Region.objects.all()
     for region in regions:
-        customer_count = customers.filter(region=region).count()
+        customer_count = region_counts.get(region.pk, 0)
         if customer_count > 0:
             region_distribution.append({
                 'region': region.name,
                 'count': customer_count,
-                'percentage': (customer_count / customer_stats['total_customers']) * 100 if customer_stats['total_customers'] > 0 else 0
+                'percentage': percentage(customer_count, customer_stats['total_customers']),
             })
     
-    # Pagination
-    paginator = Paginator(customers, 15)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Pagination, best matches first when searching
+    page_obj = ranked_page(customers, ranked, request.GET.get('page'), 15)
     
     context = {
         'page_obj': page_obj,
@@ -1437,9 +1400,7 @@ def lead_generation(request):
         messages.success(request, 'Lead generated successfully!')
         return redirect('marketing:lead_list')
     
-    customers = Customer.objects.all()
     context = {
-        'customers': customers,
         'lead_sources': Lead.SOURCE_CHOICES,
     }
     return render(request, 'marketing/lead_generation.html', context)
@@ -1520,6 +1481,7 @@ def visit_list(request):
     
     # Get all visits with participants
     visits = Visit.objects.select_related('customer', 'assigned_to').prefetch_related('participants__user').all()
+    visits = filter_visits_by_permission(request, visits)
     
     # Apply search filter
     if search_query:
@@ -1550,9 +1512,7 @@ def visit_list(request):
     }
     
     # Pagination
-    paginator = Paginator(visits, 15)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = KeysetPaginator(visits, 15).get_page(request.GET.get('page'))
     
     context = {
         'page_obj': page_obj,
@@ -1560,7 +1520,7 @@ def visit_list(request):
         'search_query': search_query,
         'date_filter': date_filter,
         'user_filter': user_filter,
-        'users': get_user_model().objects.filter(is_active=True),
+        'user_choice': selected_choice('users', user_filter),
     }
     return render(request, 'marketing/visit_list.html', context)
 
@@ -2452,15 +2412,6 @@ def qc_tracking(request):
     # Get QC records
     qc_records = QCTracking.objects.select_related('manufacturing__work_order__purchase_order__customer').order_by('-created_at')
     
-    # Search functionality
-    search_query = request.GET.get('search', '')
-    if search_query:
-        qc_records = qc_records.filter(
-            Q(qc_number__icontains=search_query) |
-            Q(manufacturing__batch_number__icontains=search_query) |
-            Q(manufacturing__work_order__purchase_order__customer__name__icontains=search_query)
-        )
-    
     # Filter by status
     status_filter = request.GET.get('status', '')
     if status_filter:
@@ -2471,6 +2422,10 @@ def qc_tracking(request):
     if inspection_filter:
         qc_records = qc_records.filter(inspection_type=inspection_filter)
     
+    # Search functionality (run once for the statistics and the page)
+    search_query = request.GET.get('search', '')
+    qc_records, ranked = search(qc_records, search_query)
+    
     # Calculate statistics
     total_qc = qc_records.count()
     pending_qc = qc_records.filter(status='pending').count()
@@ -2479,10 +2434,8 @@ def qc_tracking(request):
     failed_qc = qc_records.filter(status='failed').count()
     rework_qc = qc_records.filter(status='rework').count()
     
-    # Pagination
-    paginator = Paginator(qc_records, 20)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Pagination, best matches first when searching
+    page_obj = ranked_page(qc_records, ranked, request.GET.get('page'), 20)
     
     context = {
         'qc_records': page_obj,
@@ -2511,12 +2464,7 @@ def qc_export(request):
     
     # Apply same filters as main view
     search_query = request.GET.get('search', '')
-    if search_query:
-        qc_records = qc_records.filter(
-            Q(qc_number__icontains=search_query) |
-            Q(manufacturing__batch_number__icontains=search_query) |
-            Q(manufacturing__work_order__purchase_order__customer__name__icontains=search_query)
-        )
+    qc_records = search_filter(qc_records, search_query)
     
     status_filter = request.GET.get('status', '')
     if status_filter:
@@ -2816,63 +2764,25 @@ def daily_reports(request):
     # Get today's date
     today = datetime.now().date()
     
-    # Get daily statistics
+    # Get daily statistics (index-friendly day ranges, one aggregate per table)
     daily_stats = {
-        'new_customers': Customer.objects.filter(created_at__date=today).count(),
-        'new_leads': Lead.objects.filter(created_at__date=today).count(),
-        'new_quotations': Quotation.objects.filter(created_at__date=today).count(),
-        'new_purchase_orders': PurchaseOrder.objects.filter(received_date=today).count(),
-        'new_work_orders': WorkOrder.objects.filter(created_at__date=today).count(),
-        'completed_manufacturing': Manufacturing.objects.filter(status='completed', completion_date=today).count(),
-        'new_visits': Visit.objects.filter(scheduled_date__date=today).count(),
-        'pending_expenses': Expense.objects.filter(status='pending').count(),
+        **KPIQuery(Customer, 'created_at', today, today).count('new_customers').run(),
+        **KPIQuery(Lead, 'created_at', today, today).count('new_leads').run(),
+        **KPIQuery(Quotation, 'created_at', today, today).count('new_quotations').run(),
+        **KPIQuery(PurchaseOrder, 'received_date', today, today).count('new_purchase_orders').run(),
+        **KPIQuery(WorkOrder, 'created_at', today, today).count('new_work_orders').run(),
+        # Batches have no 'completed' status; a batch is done once it has an actual completion date
+        **KPIQuery(Manufacturing, 'actual_completion_date', today, today).count('completed_manufacturing').run(),
+        **KPIQuery(Visit, 'scheduled_date', today, today).count('new_visits').run(),
+        **KPIQuery(Expense).count('pending_expenses', status='pending').run(),
     }
     
-    # Get recent activities for today
-    recent_activities = []
-    
-    # Add recent customers
-    recent_customers = Customer.objects.filter(created_at__date=today)[:5]
-    for customer in recent_customers:
-        recent_activities.append({
-            'type': 'customer',
-            'title': f'New Customer: {customer.name}',
-            'description': f'Added by {customer.created_by.get_full_name() if customer.created_by else "System"}',
-            'time': customer.created_at,
-            'icon': 'users',
-            'color': 'blue'
-        })
-    
-    # Add recent leads
-    recent_leads = Lead.objects.filter(created_at__date=today)[:5]
-    for lead in recent_leads:
-        recent_activities.append({
-            'type': 'lead',
-            'title': f'New Lead: {lead.first_name} {lead.last_name}',
-            'description': f'From {lead.company} - {lead.get_source_display()}',
-            'time': lead.created_at,
-            'icon': 'user-plus',
-            'color': 'green'
-        })
-    
-    # Add recent quotations
-    recent_quotations = Quotation.objects.filter(created_at__date=today)[:5]
-    for quotation in recent_quotations:
-        recent_activities.append({
-            'type': 'quotation',
-            'title': f'New Quotation: {quotation.quotation_number}',
-            'description': f'For {quotation.customer.name} - ₹{quotation.total_amount}',
-            'time': quotation.created_at,
-            'icon': 'file-text',
-            'color': 'yellow'
-        })
-    
-    # Sort activities by time
-    recent_activities.sort(key=lambda x: x['time'], reverse=True)
+    # Today's activities, newest first from the activity feed
+    recent_activities, _ = read_feed(limit=10, since=day_start(today))
     
     context = {
         'daily_stats': daily_stats,
-        'recent_activities': recent_activities[:10],
+        'recent_activities': recent_activities,
         'today': today,
     }
     
@@ -2889,45 +2799,39 @@ def monthly_reports(request):
     current_month = now.month
     current_year = now.year
     
-    # Monthly statistics
-    monthly_stats = {
-        'total_customers': Customer.objects.filter(created_at__month=current_month, created_at__year=current_year).count(),
-        'total_leads': Lead.objects.filter(created_at__month=current_month, created_at__year=current_year).count(),
-        'total_quotations': Quotation.objects.filter(created_at__month=current_month, created_at__year=current_year).count(),
-        'total_purchase_orders': PurchaseOrder.objects.filter(received_date__month=current_month, received_date__year=current_year).count(),
-        'total_revenue': PurchaseOrder.objects.filter(
-            received_date__month=current_month, 
-            received_date__year=current_year,
-            status__in=['received', 'verified', 'approved', 'in_production', 'completed', 'dispatched', 'delivered']
-        ).aggregate(total=Sum('total_amount'))['total'] or 0,
-        'total_work_orders': WorkOrder.objects.filter(created_at__month=current_month, created_at__year=current_year).count(),
-        'completed_manufacturing': Manufacturing.objects.filter(
-            status='completed', 
-            completion_date__month=current_month, 
-            completion_date__year=current_year
-        ).count(),
-        'total_visits': Visit.objects.filter(scheduled_date__month=current_month, scheduled_date__year=current_year).count(),
-    }
+    month_start, month_end = month_bounds(current_year, current_month)
     
-    # Regional performance
-    regional_performance = []
-    regions = Region.objects.all()
-    for region in regions:
-        customer_count = Customer.objects.filter(region=region, created_at__month=current_month, created_at__year=current_year).count()
-        lead_count = Lead.objects.filter(created_at__month=current_month, created_at__year=current_year).count()  # Assuming leads are not region-specific
-        regional_performance.append({
-            'region': region,
-            'customers': customer_count,
-            'leads': lead_count,
-        })
+    # Monthly statistics (index-friendly month ranges, one aggregate per table)
+    monthly_stats = {
+        **KPIQuery(Customer, 'created_at', month_start, month_end).count('total_customers').run(),
+        **KPIQuery(Lead, 'created_at', month_start, month_end).count('total_leads').run(),
+        **KPIQuery(Quotation, 'created_at', month_start, month_end).count('total_quotations').run(),
+        **(KPIQuery(PurchaseOrder, 'received_date', month_start, month_end)
+           .count('total_purchase_orders')
+           .sum('total_revenue', 'total_amount', status__in=[
+               'received', 'verified', 'approved', 'in_production', 'completed', 'dispatched', 'delivered'
+           ])
+           .run()),
+        **KPIQuery(WorkOrder, 'created_at', month_start, month_end).count('total_work_orders').run(),
+        **KPIQuery(Manufacturing, 'actual_completion_date', month_start, month_end).count('completed_manufacturing').run(),
+        **KPIQuery(Visit, 'scheduled_date', month_start, month_end).count('total_visits').run(),
+    }
+    
+    # Regional performance (leads are not region-specific)
+    regions = Region.objects.annotate(
+        month_customers=Count('customer', filter=date_range(Region, 'customer__created_at', month_start, month_end))
+    )
+    regional_performance = [
+        {'region': region, 'customers': region.month_customers, 'leads': monthly_stats['total_leads']}
+        for region in regions
+    ]
     
     # Top performing customers
     top_customers = Customer.objects.annotate(
         po_count=Count('purchaseorder'),
         total_spent=Sum('purchaseorder__total_amount')
     ).filter(
-        purchaseorder__received_date__month=current_month,
-        purchaseorder__received_date__year=current_year
+        date_range(Customer, 'purchaseorder__received_date', month_start, month_end)
     ).order_by('-total_spent')[:5]
     
     context = {
@@ -2986,19 +2890,13 @@ def customer_reports(request):
         total_value=Sum('purchaseorder__total_amount')
     ).filter(total_value__isnull=False).order_by('-total_value')[:10]
     
-    # Customer growth trend (last 12 months)
-    growth_trend = []
-    for i in range(12):
-        month_date = today - timedelta(days=30*i)
-        month_customers = Customer.objects.filter(
-            created_at__month=month_date.month,
-            created_at__year=month_date.year
-        ).count()
-        growth_trend.append({
-            'month': month_date.strftime('%b %Y'),
-            'customers': month_customers
-        })
-    growth_trend.reverse()
+    # Customer growth trend (last 12 calendar months, one query)
+    first_month = months_back(today, 11)
+    growth_trend = [
+        {'month': point['label'], 'customers': point['customers']}
+        for point in time_series(Customer.objects.all(), 'created_at', 'month', first_month, today,
+                                 customers=Count('pk'))
+    ]
     
     context = {
         'customer_stats': customer_stats,
@@ -3030,15 +2928,19 @@ def performance_analytics(request):
     else:
         start_date = today - timedelta(days=365)
     
+    revenue_statuses = ['received', 'verified', 'approved', 'in_production', 'completed', 'dispatched', 'delivered']
+    
     # Sales performance
+    quotations = (KPIQuery(Quotation, 'created_at', start_date)
+                  .count('total_quotations')
+                  .count('accepted_quotations', status='accepted')
+                  .run())
     sales_performance = {
-        'total_quotations': Quotation.objects.filter(created_at__date__gte=start_date).count(),
-        'accepted_quotations': Quotation.objects.filter(status='accepted', created_at__date__gte=start_date).count(),
+        **quotations,
         'conversion_rate': 0,
-        'total_revenue': PurchaseOrder.objects.filter(
-            received_date__gte=start_date,
-            status__in=['received', 'verified', 'approved', 'in_production', 'completed', 'dispatched', 'delivered']
-        ).aggregate(total=Sum('total_amount'))['total'] or 0,
+        'total_revenue': (KPIQuery(PurchaseOrder, 'received_date', start_date)
+                          .sum('total', 'total_amount', status__in=revenue_statuses)
+                          .run()['total']),
         'avg_order_value': 0,
     }
     
@@ -3047,54 +2949,49 @@ def performance_analytics(request):
     
     # Production performance
     production_performance = {
-        'total_work_orders': WorkOrder.objects.filter(created_at__date__gte=start_date).count(),
-        'completed_work_orders': WorkOrder.objects.filter(status='completed', created_at__date__gte=start_date).count(),
+        **(KPIQuery(WorkOrder, 'created_at', start_date)
+           .count('total_work_orders')
+           .count('completed_work_orders', status='completed')
+           .run()),
         'on_time_delivery': 0,
         'avg_production_time': 0,
     }
     
     # Lead performance
     lead_performance = {
-        'total_leads': Lead.objects.filter(created_at__date__gte=start_date).count(),
-        'qualified_leads': Lead.objects.filter(status='qualified', created_at__date__gte=start_date).count(),
-        'converted_leads': Lead.objects.filter(status='converted', created_at__date__gte=start_date).count(),
+        **(KPIQuery(Lead, 'created_at', start_date)
+           .count('total_leads')
+           .count('qualified_leads', status='qualified')
+           .count('converted_leads', status='converted')
+           .run()),
         'lead_conversion_rate': 0,
     }
     
     if lead_performance['total_leads'] > 0:
         lead_performance['lead_conversion_rate'] = (lead_performance['converted_leads'] / lead_performance['total_leads']) * 100
     
-    # User performance
-    user_performance = []
-    users = get_user_model().objects.all()
-    for user in users:
-        user_stats = {
-            'user': user,
-            'customers_created': Customer.objects.filter(created_by=user, created_at__date__gte=start_date).count(),
-            'leads_created': Lead.objects.filter(assigned_to=user, created_at__date__gte=start_date).count(),
-            'quotations_created': Quotation.objects.filter(created_by=user, created_at__date__gte=start_date).count(),
-            'visits_conducted': Visit.objects.filter(assigned_to=user, scheduled_date__date__gte=start_date).count(),
-        }
-        user_performance.append(user_stats)
-    
-    # Performance trends (last 6 periods)
-    trends = []
-    for i in range(6):
-        period_start = start_date - timedelta(days=30*i)
-        period_end = period_start + timedelta(days=30)
-        
-        period_stats = {
-            'period': period_start.strftime('%b %Y'),
-            'quotations': Quotation.objects.filter(created_at__date__gte=period_start, created_at__date__lt=period_end).count(),
-            'orders': PurchaseOrder.objects.filter(received_date__gte=period_start, received_date__lt=period_end).count(),
-            'revenue': PurchaseOrder.objects.filter(
-                received_date__gte=period_start,
-                received_date__lt=period_end,
-                status__in=['received', 'verified', 'approved', 'in_production', 'completed', 'dispatched', 'delivered']
-            ).aggregate(total=Sum('total_amount'))['total'] or 0,
-        }
-        trends.append(period_stats)
-    trends.reverse()
+    # User performance (one grouped query per model plus the user list, whatever the headcount)
+    user_performance = (UserRollup(users=get_user_model().objects.all())
+                        .add('customers_created', Customer.objects.filter(date_range(Customer, 'created_at', start_date)), 'created_by')
+                        .add('leads_created', Lead.objects.filter(date_range(Lead, 'created_at', start_date)), 'assigned_to')
+                        .add('quotations_created', Quotation.objects.filter(date_range(Quotation, 'created_at', start_date)), 'created_by')
+                        .add('visits_conducted', Visit.objects.filter(date_range(Visit, 'scheduled_date', start_date)), 'assigned_to')
+                        .rows())
+    
+    # Performance trends (last 6 calendar months, one query per metric)
+    first_month = months_back(today, 5)
+    quotation_trend = time_series(Quotation.objects.all(), 'created_at', 'month', first_month, today,
+                                  quotations=Count('pk'))
+    order_trend = time_series(
+        PurchaseOrder.objects.all(), 'received_date', 'month', first_month, today,
+        orders=Count('pk'),
+        revenue=Sum('total_amount', filter=Q(status__in=revenue_statuses)),
+    )
+    trends = [
+        {'period': quotations['label'], 'quotations': quotations['quotations'],
+         'orders': orders['orders'], 'revenue': orders['revenue']}
+        for quotations, orders in zip(quotation_trend, order_trend)
+    ]
     
     context = {
         'sales_performance': sales_performance,
@@ -3511,20 +3408,9 @@ def lead_scoring(request):
     """Lead Scoring Interface"""
     leads = Lead.objects.all().order_by('-score')
     
-    # Search functionality
+    # Full-text search, best matches first; pagination
     search_query = request.GET.get('search', '')
-    if search_query:
-        leads = leads.filter(
-            Q(first_name__icontains=search_query) |
-            Q(last_name__icontains=search_query) |
-            Q(company__icontains=search_query) |
-            Q(email__icontains=search_query)
-        )
-    
-    # Pagination
-    paginator = Paginator(leads, 20)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = search_page(leads, search_query, request.GET.get('page'), 20)
     
     context = {
         'leads': page_obj,
@@ -3551,6 +3437,11 @@ def workorder_list(request):
     if status_filter:
         work_orders = work_orders.filter(status=status_filter)
     
+    # Filter by assigned user (Django User ID from the typeahead field)
+    assigned_filter = request.GET.get('assigned_to', '')
+    if assigned_filter:
+        work_orders = work_orders.filter(allocated_to_id=assigned_filter)
+    
     # Pagination
     paginator = Paginator(work_orders, 20)
     page_number = request.GET.get('page')
@@ -3560,6 +3451,8 @@ def workorder_list(request):
         'work_orders': page_obj,
         'search_query': search_query,
         'status_filter': status_filter,
+        'assigned_filter': assigned_filter,
+        'assigned_choice': selected_choice('users', assigned_filter),
     }
     return render(request, 'marketing/workorder_list.html', context)
 
@@ -3609,24 +3502,6 @@ def expense_reports(request):
     context = {}
     return render(request, 'marketing/expense_reports.html', context)
 
-@login_required
-def daily_reports(request):
-    """Daily Reports View"""
-    context = {}
-    return render(request, 'marketing/daily_reports.html', context)
-
-@login_required
-def monthly_reports(request):
-    """Monthly Reports View"""
-    context = {}
-    return render(request, 'marketing/monthly_reports.html', context)
-
-@login_required
-def performance_analytics(request):
-    """Performance Analytics View"""
-    context = {}
-    return render(request, 'marketing/performance_analytics.html', context)
-
 @login_required
 def export_data(request):
     """Export Data View"""
@@ -4691,34 +4566,27 @@ def ongoing_projects(request):
 @login_required
 def region_employee_overview(request):
     """Region wise team and target overview UI"""
-    # Determine user role
-    user_role = 'marketing_head'
-    if request.user.groups.filter(name__iexact='Regional Head').exists():
-        user_role = 'regional_head'
-    elif request.user.groups.filter(name__iexact='Marketing Head').exists():
-        user_role = 'marketing_head'
-    elif request.user.is_superuser:
-        user_role = 'marketing_head'
+    # Determine user role from the row scope (regional heads see their regions)
+    scope = get_row_scope(request)
+    user_role = 'regional_head' if scope.level == SCOPE_REGION else 'marketing_head'
 
     # Determine accessible regions
     regions_qs = Region.objects.select_related('manager').order_by('name')
     if user_role == 'regional_head':
-        regions_qs = regions_qs.filter(manager=request.user)
+        regions_qs = regions_qs.filter(manager_user_id=scope.user_id)
 
     today = timezone.now().date()
     last_day = calendar.monthrange(today.year, today.month)[1]
     default_deadline = today.replace(day=last_day)
 
+    # Totals per region and creator come from one cached grouped query
+    rollup = region_team_rollup()
     region_summaries = []
 
     for region in regions_qs:
         region_target = region.monthly_target or Decimal('0')
-
-        region_achievement = Quotation.objects.filter(
-            customer__region=region
-        ).aggregate(
-            total=Sum('total_amount')
-        )['total'] or Decimal('0')
+        region_rollup = rollup.get(region.id, {'total_sales': Decimal('0'), 'members': []})
+        region_achievement = region_rollup['total_sales']
 
         target_remaining = region_target - region_achievement
         if target_remaining < 0:
@@ -4728,26 +4596,13 @@ def region_employee_overview(request):
         if region_target and region_target > 0:
             progress_percent = float((region_achievement / region_target) * 100)
 
-        team_queryset = Quotation.objects.filter(
-            customer__region=region,
-            created_by__isnull=False
-        ).values(
-            'created_by',
-            'created_by__first_name',
-            'created_by__last_name',
-            'created_by__email'
-        ).annotate(
-            total_sales=Sum('total_amount'),
-            deal_count=Count('id'),
-            last_activity=Max('updated_at')
-        ).order_by('-total_sales')
-
+        team = region_rollup['members']
         team_members = []
-        team_size = team_queryset.count()
+        team_size = len(team)
         individual_target = region_target / team_size if team_size else Decimal('0')
 
-        for member in team_queryset:
-            achieved_amount = member['total_sales'] or Decimal('0')
+        for member in team:
+            achieved_amount = member['total_sales']
             member_remaining = individual_target - achieved_amount
             if member_remaining < 0:
                 member_remaining = Decimal('0')
@@ -4757,10 +4612,9 @@ def region_employee_overview(request):
                 member_progress = float((achieved_amount / individual_target) * 100)
 
             team_members.append({
-                'id': member['created_by'],
-                'name': (f"{member['created_by__first_name']} {member['created_by__last_name']}".strip()
-                         or 'Unnamed User'),
-                'email': member['created_by__email'],
+                'id': member['id'],
+                'name': member['name'],
+                'email': member['email'],
                 'role': 'Sales Executive',
                 'target': individual_target,
                 'achieved': achieved_amount,
@@ -4817,12 +4671,11 @@ def region_employee_overview(request):
 @login_required
 def region_targets(request):
     """Region-wise Targets with Machine-wise Sales"""
-    from django.db import models
-    
     # Get region-wise targets and sales data
     regions = Region.objects.all().order_by('name')
     
-    # Get machine-wise sales data by region
+    # Get machine-wise sales data by region (totals from the cached rollup)
+    rollup = region_team_rollup()
     machine_sales = []
     for region in regions:
         region_data = {
@@ -4831,15 +4684,9 @@ def region_targets(request):
         }
         
         # Get sales data for this region
-        region_quotations = Quotation.objects.filter(
-            customer__region=region
-        ).aggregate(
-            total_amount=models.Sum('total_amount'),
-            count=models.Count('id')
-        )
-        
-        region_data['total_sales'] = region_quotations['total_amount'] or 0
-        region_data['quotation_count'] = region_quotations['count'] or 0
+        region_quotations = rollup.get(region.id, {})
+        region_data['total_sales'] = region_quotations.get('total_sales') or 0
+        region_data['quotation_count'] = region_quotations.get('deal_count') or 0
         
         # Add machine-wise breakdown (placeholder - customize based on your needs)
         region_data['machines'] = [
@@ -4852,9 +4699,7 @@ def region_targets(request):
     
     # Get overall targets vs achievements
     total_target = 10000000  # Placeholder - you'll need to set actual targets
-    total_achieved = Quotation.objects.aggregate(
-        total=models.Sum('total_amount')
-    )['total'] or 0
+    total_achieved = sum(region['total_sales'] for region in rollup.values()) or 0
     
     achievement_percentage = (total_achieved / total_target * 100) if total_target > 0 else 0
     
@@ -4877,12 +4722,6 @@ def payment_followup_list(request):
     
     # Search functionality
     search = request.GET.get('search', '')
-    if search:
-        followups = followups.filter(
-            Q(purchase_order__po_number__icontains=search) |
-            Q(purchase_order__customer__name__icontains=search) |
-            Q(notes__icontains=search)
-        )
     
     # Filter by status
     status_filter = request.GET.get('status', '')
@@ -4905,10 +4744,8 @@ def payment_followup_list(request):
         'completed_followups': PaymentFollowUp.objects.filter(status='completed').count(),
     }
     
-    # Pagination
-    paginator = Paginator(followups, 15)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Full-text search, best matches first; pagination
+    page_obj = search_page(followups, search, request.GET.get('page'), 15)
     
     context = {
         'page_obj': page_obj,
@@ -5250,9 +5087,11 @@ def budget_dashboard(request):
     
     # Get budget statistics
     stats = {
-        'total_budgets': AnnualExhibitionBudget.objects.count(),
-        'approved_budgets': AnnualExhibitionBudget.objects.filter(status='approved').count(),
-        'pending_budgets': AnnualExhibitionBudget.objects.filter(status__in=['draft', 'submitted', 'under_review']).count(),
+        **(KPIQuery(AnnualExhibitionBudget)
+           .count('total_budgets')
+           .count('approved_budgets', status='approved')
+           .count('pending_budgets', status__in=['draft', 'submitted', 'under_review'])
+           .run()),
         'current_year_budget': current_budget,
     }
     
@@ -5262,7 +5101,7 @@ def budget_dashboard(request):
     # Get category-wise spending for current year
     category_spending = []
     if current_budget:
-        for allocation in current_budget.allocations.all():
+        for allocation in current_budget.allocations.select_related('category'):
             category_spending.append({
                 'category': allocation.category.name,
                 'allocated': allocation.allocated_amount,
@@ -5271,17 +5110,16 @@ def budget_dashboard(request):
                 'utilization': allocation.utilization_percentage
             })
     
-    # Get monthly spending trend for current year
+    # Get monthly spending trend for current year (one query)
     monthly_spending = []
     if current_budget:
-        exhibitions = Exhibition.objects.filter(annual_budget=current_budget)
-        for month in range(1, 13):
-            month_exhibitions = exhibitions.filter(start_date__month=month)
-            month_spending = sum(ex.total_expense for ex in month_exhibitions)
-            monthly_spending.append({
-                'month': month,
-                'spending': month_spending
-            })
+        year_start, _ = month_bounds(current_year, 1)
+        _, year_end = month_bounds(current_year, 12)
+        monthly_spending = [
+            {'month': point['period'].month, 'spending': point['spending']}
+            for point in time_series(Exhibition.objects.filter(annual_budget=current_budget), 'start_date', 'month',
+                                     year_start, year_end, spending=Sum('total_expense'))
+        ]
     
     context = {
         'stats': stats,
@@ -5435,15 +5273,7 @@ def inquiry_log_list(request):
     """List all inquiry logs with filtering and pagination"""
     inquiries = InquiryLog.objects.all().order_by('-enquiry_date', '-created_at')
     
-    # Search functionality
     search_query = request.GET.get('search', '')
-    if search_query:
-        inquiries = inquiries.filter(
-            Q(company_name__icontains=search_query) |
-            Q(enquiry_number__icontains=search_query) |
-            Q(contact_person__icontains=search_query) |
-            Q(location__icontains=search_query)
-        )
     
     # Filter by month
     month_filter = request.GET.get('month', '')
@@ -5460,10 +5290,11 @@ def inquiry_log_list(request):
     if category_filter:
         inquiries = inquiries.filter(offer_category=category_filter)
     
-    # Pagination
-    paginator = Paginator(inquiries, 20)  # Show 20 inquiries per page
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Full-text search, best matches first; show 20 inquiries per page
+    if search_query:
+        page_obj = search_page(inquiries, search_query, request.GET.get('page'), 20)
+    else:
+        page_obj = KeysetPaginator(inquiries, 20).get_page(request.GET.get('page'))
     
     # Statistics
     # Get user info from HRMS session
@@ -5645,18 +5476,18 @@ def inquiry_log_delete(request, pk):
 @login_required
 def mis_dashboard(request):
     """MIS Dashboard - Main overview of all sheets"""
-    # Get statistics for each sheet
-    follow_up_count = FollowUpStatus.objects.count()
-    project_today_count = ProjectToday.objects.count()
-    order_expected_count = OrderExpectedNextMonth.objects.count()
-    purchase_order_count = MISPurchaseOrder.objects.count()
-    new_data_count = NewData.objects.count()
-    new_data_details_count = NewDataDetails.objects.count()
-    od_plan_count = ODPlan.objects.count()
-    # Get user info from HRMS session
-# Removed - user_info not needed here
-
-    inquiry_log_count = InquiryLog.objects.count()
+    # Get statistics for each sheet (one read of the row counters)
+    sheets = (FollowUpStatus, ProjectToday, OrderExpectedNextMonth, MISPurchaseOrder,
+              NewData, NewDataDetails, ODPlan, InquiryLog)
+    counts = read_counts({rows_key(model): (ALL_USERS, model.objects.all()) for model in sheets})
+    follow_up_count = counts[rows_key(FollowUpStatus)]
+    project_today_count = counts[rows_key(ProjectToday)]
+    order_expected_count = counts[rows_key(OrderExpectedNextMonth)]
+    purchase_order_count = counts[rows_key(MISPurchaseOrder)]
+    new_data_count = counts[rows_key(NewData)]
+    new_data_details_count = counts[rows_key(NewDataDetails)]
+    od_plan_count = counts[rows_key(ODPlan)]
+    inquiry_log_count = counts[rows_key(InquiryLog)]
     
     # Recent activities
     recent_follow_ups = FollowUpStatus.objects.order_by('-created_at')[:5]
@@ -5704,9 +5535,7 @@ def follow_up_status_list(request):
         follow_ups = follow_ups.filter(follow_up_status=status_filter)
     
     # Pagination
-    paginator = Paginator(follow_ups, 20)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = KeysetPaginator(follow_ups, 20).get_page(request.GET.get('page'))
     
     # Statistics
     total_follow_ups = FollowUpStatus.objects.count()
@@ -5871,18 +5700,27 @@ def mis_sheets(request):
 @login_required
 def od_plan_dashboard(request):
     """OD Plan Dashboard - Main overview of all OD Plan activities"""
-    # Get statistics for each sheet
-    visit_reports_count = ODPlanVisitReport.objects.filter(created_by=request.user).count()
-    remarks_count = ODPlanRemarks.objects.filter(created_by=request.user).count()
+    user_id = get_user_info_dict(request)['user_id']
+    reports = owned_rows(ODPlanVisitReport, user_id)
+    remarks = owned_rows(ODPlanRemarks, user_id)
+    
+    # Statistics and status breakdown (one read of the row counters)
+    statuses = ('planned', 'completed', 'cancelled')
+    counts = read_counts({
+        rows_key(ODPlanVisitReport): (user_id, reports),
+        rows_key(ODPlanRemarks): (user_id, remarks),
+        **{rows_key(ODPlanVisitReport, status): (user_id, reports.filter(visit_status=status))
+           for status in statuses},
+    })
+    visit_reports_count = counts[rows_key(ODPlanVisitReport)]
+    remarks_count = counts[rows_key(ODPlanRemarks)]
+    planned_visits = counts[rows_key(ODPlanVisitReport, 'planned')]
+    completed_visits = counts[rows_key(ODPlanVisitReport, 'completed')]
+    cancelled_visits = counts[rows_key(ODPlanVisitReport, 'cancelled')]
     
     # Recent activities
-    recent_reports = ODPlanVisitReport.objects.filter(created_by=request.user).order_by('-created_at')[:5]
-    recent_remarks = ODPlanRemarks.objects.filter(created_by=request.user).order_by('-created_at')[:3]
-    
-    # Status breakdown
-    planned_visits = ODPlanVisitReport.objects.filter(created_by=request.user, visit_status='planned').count()
-    completed_visits = ODPlanVisitReport.objects.filter(created_by=request.user, visit_status='completed').count()
-    cancelled_visits = ODPlanVisitReport.objects.filter(created_by=request.user, visit_status='cancelled').count()
+    recent_reports = reports.order_by('-created_at')[:5]
+    recent_remarks = remarks.order_by('-created_at')[:3]
     
     context = {
         'visit_reports_count': visit_reports_count,
@@ -5923,7 +5761,7 @@ def od_plan_visit_report_list(request):
     region_filter = request.GET.get('region', '')
     status_filter = request.GET.get('status', '')
     
-    reports = ODPlanVisitReport.objects.filter(created_by=request.user)
+    reports = owned_rows(ODPlanVisitReport, get_user_info_dict(request)['user_id'])
     
     if search_query:
         reports = reports.filter(
@@ -5979,16 +5817,8 @@ def od_plan_visit_report_create(request):
             next_follow_up_visit=request.POST.get('next_follow_up_visit') or None,
             mail_status_about_visit=request.POST.get('mail_status_about_visit', 'not_sent'),
             comments=request.POST.get('comments'),
-            # Get user info from HRMS session
-
-
-            
-
-
-
-
-
         )
+        set_user_info_on_model(report, request)
         report.save()
         messages.success(request, 'OD Plan Visit Report created successfully!')
         return redirect('marketing:od_plan_visit_report_list')
@@ -6083,7 +5913,7 @@ def od_plan_visit_report_delete(request, pk):
 @login_required
 def od_plan_remarks_list(request):
     """List all OD Plan Remarks"""
-    remarks = ODPlanRemarks.objects.filter(created_by=request.user)
+    remarks = owned_rows(ODPlanRemarks, get_user_info_dict(request)['user_id'])
     
     # Pagination
     paginator = Paginator(remarks, 20)
@@ -6172,11 +6002,14 @@ def od_plan_remarks_delete(request, pk):
 @login_required
 def po_details_dashboard(request):
     """PO Details Dashboard - Main overview of all PO Details"""
+    user_id = get_user_info_dict(request)['user_id']
+    po_details = owned_rows(PODetails, user_id)
+    
     # Get statistics
-    po_details_count = PODetails.objects.filter(created_by=request.user).count()
+    po_details_count = read_counts({rows_key(PODetails): (user_id, po_details)})[rows_key(PODetails)]
     
     # Recent activities
-    recent_po_details = PODetails.objects.filter(created_by=request.user).order_by('-created_at')[:5]
+    recent_po_details = po_details.order_by('-created_at')[:5]
     
     context = {
         'po_details_count': po_details_count,
@@ -6203,7 +6036,7 @@ def po_details_list(request):
     search_query = request.GET.get('search', '')
     customer_filter = request.GET.get('customer', '')
     
-    po_details = PODetails.objects.filter(created_by=request.user)
+    po_details = owned_rows(PODetails, get_user_info_dict(request)['user_id'])
     
     if search_query:
         po_details = po_details.filter(
@@ -6364,7 +6197,7 @@ def po_status_list(request):
     search_query = request.GET.get('search', '')
     company_filter = request.GET.get('company', '')
     
-    po_statuses = POStatus.objects.filter(created_by=request.user)
+    po_statuses = owned_rows(POStatus, get_user_info_dict(request)['user_id'])
     
     if search_query:
         po_statuses = po_statuses.filter(
@@ -6377,9 +6210,7 @@ def po_status_list(request):
         po_statuses = po_statuses.filter(company__icontains=company_filter)
     
     # Pagination
-    paginator = Paginator(po_statuses, 20)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = KeysetPaginator(po_statuses, 20).get_page(request.GET.get('page'))
     
     context = {
         'page_obj': page_obj,
@@ -6407,9 +6238,6 @@ def po_status_create(request):
             coordinator=request.POST.get('coordinator'),
             po_date=request.POST.get('po_date'),
             po_value_without_gst=request.POST.get('po_value_without_gst'),
-    # Get user info from HRMS session
-# Removed - user_info not needed here
-
             gst=request.POST.get('gst'),
             po_acceptance_date=request.POST.get('po_acceptance_date') or None,
             wo_date=request.POST.get('wo_date') or None,
@@ -6443,16 +6271,8 @@ def po_status_create(request):
             payr05_received_percentage=request.POST.get('payr05_received_percentage') or None,
             payr05_received_amount=request.POST.get('payr05_received_amount') or None,
             payr05_received_date=request.POST.get('payr05_received_date') or None,
-            # Get user info from HRMS session
-
-
-            
-
-
-
-
-
         )
+        set_user_info_on_model(po_status, request)
         po_status.save()
         messages.success(request, 'PO Status created successfully!')
         return redirect('marketing:po_status_list')
@@ -6564,12 +6384,13 @@ def po_status_delete(request, pk):
 @login_required
 def po_status_dashboard(request):
     """PO Status Dashboard - Main overview of all PO Status"""
-
+    user_id = get_user_info_dict(request)['user_id']
+    
     # Get statistics
-    po_status_count = POStatus.objects.filter(created_by=request.user).count()
+    po_status_count = owner_counts(user_id, {'po_status_count': POStatus})['po_status_count']
     
     # Recent activities
-    recent_po_status = POStatus.objects.filter(created_by=request.user).order_by('-created_at')[:5]
+    recent_po_status = owned_rows(POStatus, user_id).order_by('-created_at')[:5]
     
     context = {
         'po_status_count': po_status_count,
@@ -6593,11 +6414,14 @@ def po_status_sheets(request):
 @login_required
 def work_order_format_dashboard(request):
     """Work Order Format Dashboard - Main overview of all Work Orders"""
+    user_id = get_user_info_dict(request)['user_id']
+    work_orders = owned_rows(WorkOrderFormat, user_id)
+    
     # Get statistics
-    work_order_count = WorkOrderFormat.objects.filter(created_by=request.user).count()
+    work_order_count = read_counts({rows_key(WorkOrderFormat): (user_id, work_orders)})[rows_key(WorkOrderFormat)]
     
     # Recent activities
-    recent_work_orders = WorkOrderFormat.objects.filter(created_by=request.user).order_by('-created_at')[:5]
+    recent_work_orders = work_orders.order_by('-created_at')[:5]
     
     context = {
         'work_order_count': work_order_count,
@@ -6628,7 +6452,7 @@ def work_order_format_list(request):
     search_query = request.GET.get('search', '')
     equipment_filter = request.GET.get('equipment', '')
     
-    work_orders = WorkOrderFormat.objects.filter(created_by=request.user)
+    work_orders = owned_rows(WorkOrderFormat, get_user_info_dict(request)['user_id'])
     
     if search_query:
         work_orders = work_orders.filter(
@@ -6641,12 +6465,10 @@ def work_order_format_list(request):
         work_orders = work_orders.filter(equipment_type__icontains=equipment_filter)
     
     # Pagination
-    paginator = Paginator(work_orders, 20)
-    page_number = request.GET.get('page')
     # Get user info from HRMS session
 # Removed - user_info not needed here
 
-    page_obj = paginator.get_page(page_number)
+    page_obj = KeysetPaginator(work_orders, 20).get_page(request.GET.get('page'))
     
     context = {
         'page_obj': page_obj,
@@ -6662,9 +6484,6 @@ def work_order_format_create(request):
     """Create new Work Order Format entry"""
     if request.method == 'POST':
         work_order = WorkOrderFormat(
-    # Get user info from HRMS session
-# Removed - user_info not needed here
-
             date=request.POST.get('date'),
             work_order_no=request.POST.get('work_order_no'),
             equipment_no=request.POST.get('equipment_no'),
@@ -6710,16 +6529,8 @@ def work_order_format_create(request):
             advance_percentage=request.POST.get('advance_percentage'),
             against_pi_percentage=request.POST.get('against_pi_percentage'),
             after_material_percentage=request.POST.get('after_material_percentage'),
-            # Get user info from HRMS session
-
-
-            
-
-
-
-
-
         )
+        set_user_info_on_model(work_order, request)
         work_order.save()
         messages.success(request, 'Work Order created successfully!')
         return redirect('marketing:work_order_format_list')
@@ -6838,26 +6649,48 @@ def work_order_format_delete(request, pk):
 @login_required
 def wsr_dashboard(request):
     """WSR Dashboard - Main overview of all Weekly Status Reports"""
-    # Get statistics
-    weekly_summary_count = WeeklySummary.objects.filter(created_by=request.user).count()
-    hot_orders_count = HotOrders.objects.filter(created_by=request.user).count()
-    calling_details_count = CallingDetails.objects.filter(created_by=request.user).count()
-    dsr_count = DSR.objects.filter(created_by=request.user).count()
-    
-    # Recent activities
-    recent_weekly_summaries = WeeklySummary.objects.filter(created_by=request.user).order_by('-created_at')[:5]
-    
-    context = {
-        'weekly_summary_count': weekly_summary_count,
-        'hot_orders_count': hot_orders_count,
-        'calling_details_count': calling_details_count,
-        'dsr_count': dsr_count,
-        'recent_weekly_summaries': recent_weekly_summaries,
-    }
+    context = wsr_summary(get_user_info_dict(request)['user_id'])
     
     return render(request, 'marketing/wsr_dashboard.html', context)
 
 
+@login_required
+@declare_permissions(*source_permissions())
+def typeahead_lookup(request, source):
+    """Choices matching the typed text for a typeahead field (JSON)"""
+    try:
+        permissions = source_permissions(source)
+    except KeyError:
+        raise Http404(f"Unknown typeahead source: {source}")
+    if not any(request.perms.has(code) for code in permissions):
+        return JsonResponse({'success': False, 'error': 'Permission denied'}, status=403)
+    results = typeahead_match(source, request.GET.get('q', ''), request.GET, scope=get_row_scope(request))
+    return JsonResponse({'success': True, 'results': results})
+
+
+@login_required
+def wsr_summary_api(request):
+    """WSR counts and recent weekly summaries for the current user (JSON)"""
+    summary = wsr_summary(get_user_info_dict(request)['user_id'])
+    recent = summary.pop('recent_weekly_summaries')
+    return JsonResponse({
+        'success': True,
+        'counts': summary,
+        'recent_weekly_summaries': [
+            {
+                'id': row.id,
+                'week_no': row.week_no,
+                'region': row.get_region_display(),
+                'product_line': row.get_product_line_display(),
+                'quotes_total': row.quotes_total,
+                'po_received': row.po_received,
+                'created_at': row.created_at.isoformat(),
+            }
+            for row in recent
+        ],
+    })
+
+
 @login_required
 def wsr_sheets(request):
     """WSR Sheets - Tabbed interface for all 8 sheets"""
@@ -6886,7 +6719,17 @@ def regional_performance_details(request):
 @login_required
 def recent_activities_details(request):
     """Recent Activities Details View"""
-    return render(request, 'marketing/recent_activities_details.html')
+    type_filter = request.GET.get('type', '')
+    types = ACTIVITY_FILTERS.get(type_filter)
+    activities, next_cursor = read_feed(cursor=request.GET.get('cursor'), types=types)
+    
+    context = {
+        'activities': activities,
+        'next_cursor': next_cursor,
+        'type_filter': type_filter if types else '',
+        'type_choices': [(key, key.title()) for key in ACTIVITY_FILTERS],
+    }
+    return render(request, 'marketing/recent_activities_details.html', context)
 
 @login_required
 def alerts_notifications_details(request):
@@ -111,10 +111,52 @@ MEDIA_ROOT = BASE_DIR / 'media'
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Caches
+# HRMS permission snapshots and user info are shared by all gunicorn workers;
+# point HRMS_RBAC_CACHE_BACKEND/LOCATION at memcached or redis where available
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'hrms_rbac': {
+        'BACKEND': os.getenv('HRMS_RBAC_CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.getenv('HRMS_RBAC_CACHE_LOCATION', '/tmp/marketing_hrms_rbac_cache'),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    # Computed report data (see marketing_app.report_cache); also shared
+    'reports': {
+        'BACKEND': os.getenv('REPORT_CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.getenv('REPORT_CACHE_LOCATION', '/tmp/marketing_report_cache'),
+        'OPTIONS': {'MAX_ENTRIES': 1000},
+    },
+}
+REPORT_CACHE_ALIAS = 'reports'
+REPORT_CACHE_TIMEOUT = 300
+
+# Full-text list search (see marketing_app.search_index): ranked matches kept per query
+SEARCH_MAX_RESULTS = 1000
+
+# Keyset list pagination (see marketing_app.keyset_pagination): list totals are counted up to this many rows
+KEYSET_COUNT_LIMIT = 1000
+
+# Typeahead fields (see marketing_app.typeahead): choices per lookup, cache lifetime in seconds
+TYPEAHEAD_LIMIT = 10
+TYPEAHEAD_CACHE_TIMEOUT = 60
+
 # Session Configuration for HRMS RBAC
-SESSION_ENGINE = 'django.contrib.sessions.backends.db'
+# Sessions only hold the HRMS token and a compact principal record, so reads
+# come from the shared cache and writes happen on change, not on every request.
+# 'django.contrib.sessions.backends.signed_cookies' also works (no server-side
+# storage at all) but exposes the token to the client in signed plaintext.
+SESSION_ENGINE = os.getenv('SESSION_ENGINE', 'django.contrib.sessions.backends.cached_db')
+# Must be shared by all workers, or a logout in one worker leaves the
+# session cached in the others
+SESSION_CACHE_ALIAS = 'hrms_rbac'
 SESSION_COOKIE_AGE = 86400  # 24 hours
-SESSION_SAVE_EVERY_REQUEST = True
+# Expiry still slides: HRMSRBACMiddleware re-saves the session at most once
+# per HRMS_SESSION_REFRESH_INTERVAL seconds
+SESSION_SAVE_EVERY_REQUEST = False
+HRMS_SESSION_REFRESH_INTERVAL = 900
 SESSION_EXPIRE_AT_BROWSER_CLOSE = False
 SESSION_COOKIE_SECURE = False  # Set to True in production with HTTPS
 SESSION_COOKIE_HTTPONLY = True
@@ -132,9 +174,33 @@ LOGOUT_REDIRECT_URL = '/hrms-login/'
 # HRMS RBAC API Configuration
 # Can be overridden with environment variable HRMS_RBAC_API_URL
 HRMS_RBAC_API_URL = os.getenv('HRMS_RBAC_API_URL', 'https://hrms.aureolegroup.com/api/rbac')
+# Seconds a user's permission snapshot is trusted before being re-fetched from HRMS
+HRMS_RBAC_PERMISSION_TTL = int(os.getenv('HRMS_RBAC_PERMISSION_TTL', '300'))
+# Pooled HTTP transport for HRMS calls (per worker process)
+HRMS_RBAC_CONNECT_TIMEOUT = float(os.getenv('HRMS_RBAC_CONNECT_TIMEOUT', '3.05'))
+HRMS_RBAC_READ_TIMEOUT = float(os.getenv('HRMS_RBAC_READ_TIMEOUT', '10'))
+HRMS_RBAC_POOL_MAXSIZE = int(os.getenv('HRMS_RBAC_POOL_MAXSIZE', '10'))
+HRMS_RBAC_MAX_RETRIES = int(os.getenv('HRMS_RBAC_MAX_RETRIES', '2'))  # Idempotent calls only
+HRMS_RBAC_RETRY_BACKOFF = float(os.getenv('HRMS_RBAC_RETRY_BACKOFF', '0.2'))
+# Circuit breaker: open after N consecutive HRMS failures, fail fast for the cool-down
+HRMS_RBAC_BREAKER_THRESHOLD = int(os.getenv('HRMS_RBAC_BREAKER_THRESHOLD', '5'))
+HRMS_RBAC_BREAKER_COOLDOWN = int(os.getenv('HRMS_RBAC_BREAKER_COOLDOWN', '30'))
+# Extra seconds a stale permission snapshot may be used while HRMS is down
+HRMS_RBAC_STALE_GRACE = int(os.getenv('HRMS_RBAC_STALE_GRACE', '900'))
+# Cache alias for shared permission snapshots (see marketing_app.hrms_cache)
+HRMS_RBAC_CACHE_ALIAS = 'hrms_rbac'
+# Cache hit/miss counts are batched per worker and flushed every N lookups
+HRMS_RBAC_STATS_FLUSH_EVERY = int(os.getenv('HRMS_RBAC_STATS_FLUSH_EVERY', '100'))
+# Restrict list rows by marketing.data.view_all / view_region (see permission_filters).
+# Enable only once HRMS grants those codes; until then everyone sees all rows.
+HRMS_RBAC_ROW_SCOPE = os.getenv('HRMS_RBAC_ROW_SCOPE', 'False') == 'True'
+# Shared secret HRMS sends in X-HRMS-Webhook-Secret when a user's roles change
+HRMS_RBAC_WEBHOOK_SECRET = os.getenv('HRMS_RBAC_WEBHOOK_SECRET', '')
 HRMS_RBAC_EXEMPT_URLS = [
     '/hrms-login/',
     '/hrms-logout/',
+    '/hrms-health/',
+    '/hrms-webhook/',
     '/static/',
     '/media/',
     '/admin/',
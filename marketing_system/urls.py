@@ -6,7 +6,10 @@ from django.urls import path, include
 from django.contrib.auth import views as auth_views
 from django.conf import settings
 from django.conf.urls.static import static
-from marketing_app.hrms_auth_views import hrms_login, hrms_logout, user_profile
+from marketing_app.hrms_auth_views import (
+    hrms_login, hrms_logout, user_profile, hrms_health,
+    hrms_role_changed_webhook,
+)
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -14,6 +17,8 @@ urlpatterns = [
     path('hrms-login/', hrms_login, name='hrms_login'),
     path('hrms-logout/', hrms_logout, name='hrms_logout'),
     path('profile/', user_profile, name='user_profile'),
+    path('hrms-health/', hrms_health, name='hrms_health'),
+    path('hrms-webhook/role-changed/', hrms_role_changed_webhook, name='hrms_role_changed_webhook'),
     # Legacy login (redirects to HRMS login)
     path('login/', auth_views.LoginView.as_view(template_name='marketing/login.html'), name='login'),
     path('logout/', auth_views.LogoutView.as_view(), name='logout'),
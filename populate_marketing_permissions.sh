@@ -22,7 +22,57 @@ fi
 
 # Run the management command
 echo "Running populate_marketing_permissions command..."
-python manage.py populate_marketing_permissions
+python manage.py populate_marketing_permissions || exit 1
+
+# Row-scope codes used by the marketing lists (marketing_app.permission_filters)
+echo "Ensuring data scope permissions..."
+python manage.py shell <<'EOF'
+import os
+import sys
+from django.apps import apps
+from django.core.exceptions import FieldDoesNotExist
+
+# HRMS app holding Permission, Role and RolePermission (override with HRMS_PERMISSIONS_APP)
+APP_LABEL = os.environ.get('HRMS_PERMISSIONS_APP', 'employees')
+REQUIRED_FIELDS = {
+    'Permission': ('code', 'name', 'category'),
+    'Role': ('role_type', 'is_active'),
+    'RolePermission': ('role', 'permission', 'granted'),
+}
+
+
+def fail(message):
+    print(f"Error: {message}", file=sys.stderr)
+    sys.exit(1)
+
+
+models = {}
+for model_name, fields in REQUIRED_FIELDS.items():
+    try:
+        model = apps.get_model(APP_LABEL, model_name)
+    except LookupError:
+        fail(f"model {APP_LABEL}.{model_name} not found; set HRMS_PERMISSIONS_APP to the HRMS app label")
+    for field in fields:
+        try:
+            model._meta.get_field(field)
+        except FieldDoesNotExist:
+            fail(f"{APP_LABEL}.{model_name} has no '{field}' field")
+    models[model_name] = model
+Permission, Role, RolePermission = models['Permission'], models['Role'], models['RolePermission']
+
+SCOPE_PERMISSIONS = {
+    'marketing.data.view_all': ('View all marketing data', ('admin', 'hr')),
+    'marketing.data.view_region': ('View marketing data of managed regions', ('manager',)),
+}
+for code, (name, role_types) in SCOPE_PERMISSIONS.items():
+    permission, _ = Permission.objects.update_or_create(code=code, defaults={'name': name, 'category': 'marketing'})
+    roles = list(Role.objects.filter(role_type__in=role_types, is_active=True))
+    if not roles:
+        fail(f"no active {'/'.join(role_types)} role to grant {code} to")
+    for role in roles:
+        RolePermission.objects.update_or_create(role=role, permission=permission, defaults={'granted': True})
+    print(f"  {code} -> {', '.join(str(role) for role in roles)}")
+EOF
 
 if [ $? -eq 0 ]; then
     echo ""
@@ -34,6 +84,7 @@ if [ $? -eq 0 ]; then
     echo "1. Review the permissions in HRMS Admin panel"
     echo "2. Assign permissions to specific roles as needed"
     echo "3. Assign roles to users"
+    echo "4. Set HRMS_RBAC_ROW_SCOPE=True in the marketing app to enforce data scope"
     echo ""
 else
     echo ""